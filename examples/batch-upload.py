@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
 # This script uploads all transcript files it can find (and corresponsing media),
-# deleting pre-existing versions first, to the LaBB-CAT server below:
+# updating pre-existing versions, to the LaBB-CAT server below.
+#
+# Uploaded transcripts are recorded in a manifest file in the transcript directory, so
+# the script can be re-run to resume an interrupted upload, or to upload only the
+# transcripts that have changed since the last upload.
 #
 # Dependencies:
 #  - nzilbb-labbcat - run the following shell command: `pip install nzilbb-labbcat`
@@ -12,49 +16,13 @@ import os
 import progressbar
 import sys
 
-# the following are specified by command-line arguments:
-ext = "trs"                                   # transcript file extension to look for
-url = "http://localhost:8080/labbcat"         # LaBB-CAT "home" URL
-username = "labbcat"                          # LaBB-CAT username
-password = "labbcat"                          # LaBB-CAT password
-corpus = "corpus"                             # corpus to upload into
-transcript_type = "interview"                 # transcript type to use
-store = None
-transcript_files = []
-
-def delete_transcript(transcript):
-    transcript_name = os.path.basename(transcript)
-    try:
-        store.deleteTranscript(transcript_name)
-    except labbcat.ResponseException as x:
-        pass
-
-def upload_transcript(transcript):
-    possible_media = [
-        transcript.replace(ext,".wav"),
-        transcript.replace(ext,".mp4"),
-        transcript.replace(ext,".mp3")]
-    media = None
-    for m in possible_media:
-        if os.path.isfile(m):
-            media = m
-    store.newTranscript(transcript, media, None, transcript_type, corpus, None) 
-
 def main(argv):
-    global ext
-    global url
-    global username
-    global password
-    global corpus
-    global transcript_type
-    global store
-    global transcript_files
-    
+
     print("Batch upload...");
     if len(argv) < 6:
         print("This script uploads all transcript files it can find (and corresponsing media),")
-        print("deleting pre-existing versions first, to a given LaBB-CAT server.")
-        print("usage: " + argv[0] + " dir ext corpus type url [ username password]")
+        print("updating pre-existing versions, to a given LaBB-CAT server.")
+        print("usage: " + argv[0] + " dir ext corpus type url [ username password [workers]]")
         print(" where:")
         print("  dir = the directory/folder under which transcript files are to be found")
         print("  ext = the extension of the transcripts - e.g. trs or eaf")
@@ -63,6 +31,7 @@ def main(argv):
         print("  url = the 'home' URL of the LaBB-CAT server")
         print("  username = (optional) the LaBB-CAT username")
         print("  password = (optional) the LaBB-CAT password")
+        print("  workers = (optional) the number of transcripts to upload at once (default 4)")
     else:
         dir = argv[1]
         ext = "." + argv[2]
@@ -74,23 +43,40 @@ def main(argv):
         if len(argv) > 7:
             username = argv[6]
             password = argv[7]
+        max_workers = 4
+        if len(argv) > 8:
+            max_workers = int(argv[8])
         print("Looking for transcripts under "+dir+" ...")
+        transcript_files = []
         for (dirpath, dirnames, filenames) in os.walk(dir):
             for f in filenames:
                 if f.endswith(ext):
                     path = os.path.join(dirpath, f)
                     print("Found " + path);
                     transcript_files.insert(0, path)
-    
+
         print("Uploading "+str(len(transcript_files))+" transcripts to "+url+" ...")
         store = labbcat.LabbcatEdit(url, username, password)
-        bar = progressbar.ProgressBar(len(transcript_files)).start()
-        for t, transcript in enumerate(transcript_files):
-            delete_transcript(transcript)
-            upload_transcript(transcript)
-            bar.update(t)
 
-        bar.finish()
+        bar = None
+        def progress(done, total):
+            nonlocal bar
+            if bar == None: bar = progressbar.ProgressBar(total).start()
+            bar.update(done)
+
+        try:
+            result = store.uploadTranscripts(
+                transcript_files, transcript_type, corpus,
+                manifest=os.path.join(dir, ".manifest.jsonl"), maxWorkers=max_workers,
+                progress=progress)
+        except KeyboardInterrupt:
+            print("\nInterrupted - run again to resume.")
+            return
+        if bar != None: bar.finish()
+        print(str(len(result["uploaded"]))+" transcripts uploaded, "
+              +str(len(result["skipped"]))+" unchanged.")
+        for transcript, error in result["errors"].items():
+            print("Could not upload "+transcript+": "+str(error))
         print("Upload complete.")
 
 if __name__ == "__main__":
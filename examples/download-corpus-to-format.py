@@ -1,6 +1,10 @@
-#!/usr/bin/python3 
+#!/usr/bin/python3
 # Script that extracts given subcorpus transcripts from LaBB-CAT, to a given format.
 #
+# Downloaded transcripts are recorded in a manifest, and files whose content hasn't
+# changed since they were downloaded aren't rewritten, so the script can be re-run to
+# resume an interrupted download, or to update a previous download incrementally.
+#
 # Author: Robert Fromont
 # Date: May 2023
 # Dependencies:
@@ -12,11 +16,11 @@ import progressbar
 import sys
 
 def main(argv):
-    
+
     print("Download media and transcripts...")
     if len(argv) < 7:
         print("This script given subcorpus transcripts from LaBB-CAT server, to a given format")
-        print("usage: " + argv[0] + " corpus format dir url username password [start-at]")
+        print("usage: " + argv[0] + " corpus format dir url username password [workers]")
         print(" where:")
         print("  corpus = the (sub)corpus of the desired transcripts (listed on the 'corpora' page)")
         print("  format = the content-type for the transcripts e.g. text/praat-textgrid")
@@ -24,7 +28,7 @@ def main(argv):
         print("  url = the 'home' URL of the LaBB-CAT server")
         print("  username = the LaBB-CAT username")
         print("  password = the LaBB-CAT password")
-        print("  start-at = (optional) the first transcript to download (for resuming a previous download)")
+        print("  workers = (optional) the number of transcripts to convert at once (default 4)")
     else:
         subcorpus = argv[1]
         mimeType = argv[2]
@@ -32,36 +36,33 @@ def main(argv):
         url = argv[4]
         username = argv[5]
         password = argv[6]
-        firstTranscript = None
+        maxWorkers = 4
         if len(argv) > 7:
-            firstTranscript = argv[7]
+            maxWorkers = int(argv[7])
         print("Connecting to "+url+" ...")
         corpus = labbcat.LabbcatView(url, username, password)
         print("Listing transcript IDs in "+subcorpus+" ...")
         transcriptIds = corpus.getTranscriptIdsInCorpus(subcorpus)
-        if firstTranscript is not None:
-            try:
-                startIndex = transcriptIds.index(firstTranscript)
-                transcriptIds = transcriptIds[startIndex:]
-                print("Download "+str(len(transcriptIds))+" transcripts from "+subcorpus+" starting from "+firstTranscript)
-            except:
-                print("'"+firstTranscript+"' is not in " + subcorpus)
-                exit(0)
-        else:
-            print("Download "+str(len(transcriptIds))+" transcripts from "+subcorpus)
+        print("Download "+str(len(transcriptIds))+" transcripts from "+subcorpus)
+
+        bar = None
+        def progress(done, total):
+            nonlocal bar
+            if bar == None: bar = progressbar.ProgressBar(total).start()
+            bar.update(done)
 
-        bar = progressbar.ProgressBar(len(transcriptIds)).start()
-        
-        for p, transcriptId in enumerate(transcriptIds):
-            try:
-                corpus.formatTranscript(transcriptId, ["utterance"], mimeType, dir=dir)
-                bar.update(p)
-            except KeyboardInterrupt:
-                break
-            except:                
-                bar.update(p)
-        
-        bar.finish()
+        try:
+            result = corpus.exportTranscripts(
+                transcriptIds, ["utterance"], mimeType, dir, maxWorkers=maxWorkers,
+                progress=progress)
+        except KeyboardInterrupt:
+            print("\nInterrupted - run again to resume.")
+            return
+        if bar != None: bar.finish()
+        print(str(len(result["exported"]))+" transcripts downloaded, "
+              +str(len(result["skipped"]) + len(result["unchanged"]))+" unchanged.")
+        for transcriptId, error in result["errors"].items():
+            print("Could not download "+transcriptId+": "+str(error))
         print("Download complete.")
 
 if __name__ == "__main__":
@@ -1,3 +1,6 @@
+import re
+from functools import lru_cache
+
 def expressionFromAttributeValue(attribute, values, negate=False):
     """ Generates a query expression for matching a transcript/participant attribute.
     
@@ -180,3 +183,216 @@ def expressionFromCorpora(corpora, negate=False):
     :rtype: str
     """
     return expressionFromAttributeValues("corpus", corpora, negate)
+
+_TOKEN = re.compile(r"""\s*(?:
+  (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")
+  |(?P<number>-?\d+(?:\.\d+)?)
+  |(?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  |(?P<operator>&&|\|\||==|<>|!=|[!()\[\],.]))""", re.VERBOSE)
+
+def _tokenize(expression):
+    """ Splits an expression into a list of (type, value) tokens. """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match == None:
+            raise ValueError(
+                "Unsupported expression syntax at " + str(position) + ": " + expression)
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "number":
+            value = float(value)
+        tokens.append((kind, value))
+        position = match.end()
+    return(tokens)
+
+class _Parser:
+    """ A recursive-descent parser that compiles an expression into a Python function of
+    (id, attributes). """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def fail(self, message):
+        raise ValueError(message + ": " + self.expression)
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return(self.tokens[self.position][1])
+        return(None)
+
+    def next(self):
+        if self.position >= len(self.tokens): self.fail("Unexpected end of expression")
+        token = self.tokens[self.position]
+        self.position = self.position + 1
+        return(token)
+
+    def expect(self, value):
+        kind, token = self.next()
+        if kind != "operator" or token != value: self.fail("Expected " + value)
+
+    def parse(self):
+        function = self.disjunction()
+        if self.position < len(self.tokens): self.fail("Unexpected " + str(self.peek()))
+        return(function)
+
+    def disjunction(self):
+        operands = [ self.conjunction() ]
+        while self.peek() == "||":
+            self.next()
+            operands.append(self.conjunction())
+        if len(operands) == 1: return(operands[0])
+        return(lambda id, attributes: any(o(id, attributes) for o in operands))
+
+    def conjunction(self):
+        operands = [ self.negation() ]
+        while self.peek() == "&&":
+            self.next()
+            operands.append(self.negation())
+        if len(operands) == 1: return(operands[0])
+        return(lambda id, attributes: all(o(id, attributes) for o in operands))
+
+    def negation(self):
+        if self.peek() == "!":
+            self.next()
+            operand = self.negation()
+            return(lambda id, attributes: not operand(id, attributes))
+        return(self.comparison())
+
+    def comparison(self):
+        left = self.postfix()
+        if self.peek() == "==":
+            self.next()
+            right = self.postfix()
+            return(lambda id, attributes: left(id, attributes) == right(id, attributes))
+        if self.peek() in ["<>", "!="]:
+            self.next()
+            right = self.postfix()
+            return(lambda id, attributes: left(id, attributes) != right(id, attributes))
+        return(left)
+
+    def postfix(self):
+        operand = self.primary()
+        while self.peek() == ".":
+            self.next()
+            kind, member = self.next()
+            if member == "label":
+                pass # first(...) already evaluates to the label
+            elif member in ["includes", "includesAny"]:
+                self.expect("(")
+                argument = self.disjunction()
+                self.expect(")")
+                if member == "includes":
+                    operand = (lambda o, a: lambda id, attributes:
+                               a(id, attributes) in o(id, attributes))(operand, argument)
+                else:
+                    operand = (lambda o, a: lambda id, attributes:
+                               any(v in o(id, attributes) for v in a(id, attributes))
+                               )(operand, argument)
+            else:
+                self.fail("Unsupported member ." + str(member))
+        return(operand)
+
+    def primary(self):
+        kind, token = self.next()
+        if kind == "string" or kind == "number":
+            return(lambda id, attributes: token)
+        if kind == "name":
+            if token == "id":
+                return(lambda id, attributes: id)
+            if token == "true" or token == "false":
+                return(lambda id, attributes: token == "true")
+            if token in ["first", "labels"]:
+                self.expect("(")
+                kind, layerId = self.next()
+                if kind != "string": self.fail("Expected layer ID")
+                self.expect(")")
+                if token == "labels":
+                    return(lambda id, attributes: attributes.get(layerId) or [])
+                # first(...) is only meaningful with .label, so it evaluates to the label
+                if self.peek() != ".": self.fail("Expected .label after first(...)")
+                return(lambda id, attributes: (attributes.get(layerId) or [ None ])[0])
+            self.fail("Unsupported function or identifier " + token)
+        if token == "(":
+            function = self.disjunction()
+            self.expect(")")
+            return(function)
+        if token == "[":
+            items = []
+            while self.peek() != "]":
+                items.append(self.disjunction())
+                if self.peek() == ",": self.next()
+                elif self.peek() != "]": self.fail("Expected , or ]")
+            self.next()
+            return(lambda id, attributes: [ item(id, attributes) for item in items ])
+        self.fail("Unexpected " + str(token))
+
+@lru_cache(maxsize=256)
+def compileExpression(expression):
+    """ Compiles a query expression into a Python function, so it can be evaluated
+    locally instead of by the server.
+    
+    Only the subset of the query language generated by
+    `expressionFromAttributeValue() <#labbcat.expressionFromAttributeValue>`_,
+    `expressionFromAttributeValues() <#labbcat.expressionFromAttributeValues>`_,
+    `expressionFromIds() <#labbcat.expressionFromIds>`_,
+    `expressionFromTranscriptTypes() <#labbcat.expressionFromTranscriptTypes>`_, and
+    `expressionFromCorpora() <#labbcat.expressionFromCorpora>`_ is supported, i.e.
+    ``id``, ``first('layer').label``, ``labels('layer')``, ``[...]`` lists,
+    ``.includes(...)``, ``.includesAny(...)``, ``==``, ``<>``, ``!``, ``&&``, ``||``, and
+    parentheses. Other expressions (e.g. regular expressions) raise a ValueError, so the
+    caller can fall back to evaluating them on the server.
+
+    Compiled expressions are cached, so compiling the same expression again is cheap.
+
+    Example::
+    
+        match = labbcat.compileExpression(labbcat.expressionFromCorpora(["CC", "MU"]))
+        match("AP511_MikeThorpe.eaf", { "corpus" : [ "MU" ] }) # True
+    
+    :param expression: The expression to compile.
+    :type expression: str
+    
+    :returns: A function that takes a transcript or participant ID, and a dictionary of
+              its attribute values (lists of labels, keyed by layer ID), and returns
+              True if they match the expression, or False otherwise.
+    :rtype: function
+    """
+    function = _Parser(expression).parse()
+    return(lambda id, attributes: bool(function(id, attributes)))
+
+def filterByExpression(expression, records):
+    """ Evaluates a query expression locally, against transcript or participant attribute
+    values that have already been retrieved, instead of calling
+    `getMatchingTranscriptIds() <#labbcat.LabbcatView.getMatchingTranscriptIds>`_ or
+    `getMatchingParticipantIds() <#labbcat.LabbcatView.getMatchingParticipantIds>`_.
+    
+    See `compileExpression() <#labbcat.compileExpression>`_ for the supported expressions.
+
+    Example::
+    
+        attributes = {
+            "AP511_MikeThorpe.eaf" : { "corpus" : [ "MU" ], "transcript_type" : [ "interview" ] },
+            "BR2044_OllyOhlson.eaf" : { "corpus" : [ "QB" ], "transcript_type" : [ "wordlist" ] } }
+        ids = labbcat.filterByExpression(
+            labbcat.expressionFromTranscriptTypes("wordlist"), attributes)
+        # ["BR2044_OllyOhlson.eaf"]
+    
+    :param expression: The expression to match.
+    :type expression: str
+    
+    :param records: A dictionary of attribute values (lists of labels, keyed by layer ID),
+                    keyed by transcript or participant ID.
+    :type records: dict
+    
+    :returns: The IDs of the records that match the expression, in the order of *records*.
+    :rtype: list of str
+    """
+    match = compileExpression(expression)
+    return([ id for id, attributes in records.items() if match(id, attributes) ])
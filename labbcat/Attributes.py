@@ -0,0 +1,40 @@
+import csv
+import hashlib
+import json
+import os
+
+def _attributeLayerIds(layers, parentId):
+    """ Lists the IDs of the attribute layers in *layers* (as returned by getLayers), i.e.
+    the unaligned children of *parentId*, which is "graph" for transcript attributes, or
+    "participant" for participant attributes. The transcript and participant layers
+    themselves are not included. """
+    return([ layer["id"] for layer in layers
+             if layer.get("parentId") == parentId and layer.get("alignment") == 0
+             and layer["id"] not in ["transcript", "participant"] ])
+
+def _readAttributes(fileName):
+    """ Reads a CSV file of attribute values, as returned by getTranscriptAttributes or
+    getParticipantAttributes, with an ID in the first column, and deletes it. Returns a
+    dictionary of ID -> list of (layerId, label) tuples, omitting empty values. """
+    values = {}
+    try:
+        with open(fileName, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            for row in reader:
+                if len(row) == 0: continue
+                values[row[0]] = [ (header[c], row[c]) for c in range(1, len(row))
+                                   if c < len(header) and row[c] != "" ]
+    finally:
+        os.remove(fileName)
+    return(values)
+
+def _signature(values):
+    """ Returns a hash of a list of (layerId, label) tuples, as returned by _readAttributes,
+    for detecting changes to a transcript or participant.
+
+    *NB* the signature changes only when the given attribute values do, so it detects
+    changes to the transcript or participant itself only as well as those attributes
+    reflect them; e.g. editing a transcript's annotations doesn't change its signature
+    unless it also changes one of the attributes. """
+    return(hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest())
@@ -0,0 +1,177 @@
+import mmap
+import struct
+
+# numpy is an optional dependency, only required for converting samples
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# WAV format codes
+_PCM = 1
+_FLOAT = 3
+_EXTENSIBLE = 0xFFFE
+
+def _readHeader(buffer):
+    """ Parses the header of a WAV file from the given buffer (bytes, mmap, etc.)
+
+    Returns a dict with the entries "format", "channels", "sampleRate", "bitsPerSample",
+    "blockAlign", "dataOffset" (the position of the first sample), and "dataLength"
+    (the number of bytes of sample data). """
+    if len(buffer) < 12 or buffer[0:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    header = None
+    position = 12
+    while position + 8 <= len(buffer):
+        chunkId = bytes(buffer[position:position+4])
+        chunkSize = struct.unpack("<I", buffer[position+4:position+8])[0]
+        body = position + 8
+        if chunkId == b"fmt ":
+            audioFormat, channels, sampleRate, byteRate, blockAlign, bitsPerSample \
+                = struct.unpack("<HHIIHH", buffer[body:body+16])
+            if audioFormat == _EXTENSIBLE and chunkSize >= 26:
+                # the real format is the first two bytes of the sub-format GUID
+                audioFormat = struct.unpack("<H", buffer[body+24:body+26])[0]
+            header = {
+                "format" : audioFormat,
+                "channels" : channels,
+                "sampleRate" : sampleRate,
+                "bitsPerSample" : bitsPerSample,
+                "blockAlign" : blockAlign
+            }
+        elif chunkId == b"data":
+            if header == None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            header["dataOffset"] = body
+            # streamed WAVs may have an unknown (0 or too large) length
+            header["dataLength"] = min(chunkSize, len(buffer) - body) if chunkSize > 0 \
+                else len(buffer) - body
+            header["dataLength"] -= header["dataLength"] % header["blockAlign"]
+            return(header)
+        position = body + chunkSize + (chunkSize % 2) # chunks are word-aligned
+    raise ValueError("WAV file has no data")
+
+def _wavHeader(header, dataLength):
+    """ Generates the bytes of a canonical WAV header for the given format. """
+    byteRate = header["sampleRate"] * header["blockAlign"]
+    return(b"RIFF" + struct.pack("<I", 36 + dataLength) + b"WAVE"
+           + b"fmt " + struct.pack(
+               "<IHHIIHH", 16, header["format"], header["channels"], header["sampleRate"],
+               byteRate, header["blockAlign"], header["bitsPerSample"])
+           + b"data" + struct.pack("<I", dataLength))
+
+def _decode(data, header):
+    """ Converts raw sample data into an array of floats with one row per channel,
+    scaled to the range -1..1 as Praat does. Requires numpy. """
+    width = header["bitsPerSample"] // 8
+    if header["format"] == _FLOAT:
+        samples = numpy.frombuffer(data, dtype="<f"+str(width)).astype(numpy.float64)
+    elif width == 1: # 8-bit samples are unsigned
+        samples = (numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.float64) - 128) / 128
+    elif width == 3: # 24-bit samples must be unpacked
+        raw = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 3)
+        samples = (raw[:,0].astype(numpy.int32)
+                   | (raw[:,1].astype(numpy.int32) << 8)
+                   | (raw[:,2].astype(numpy.int8).astype(numpy.int32) << 16))
+        samples = samples.astype(numpy.float64) / 8388608
+    else:
+        samples = numpy.frombuffer(data, dtype="<i"+str(width)).astype(numpy.float64) \
+            / 2**(8*width-1)
+    return(samples.reshape(-1, header["channels"]).T)
+
+def _encode(samples, header):
+    """ Converts an array of floats with one row per channel back into raw sample data in
+    the format of the given header. Requires numpy. """
+    width = header["bitsPerSample"] // 8
+    interleaved = samples.T.reshape(-1)
+    if header["format"] == _FLOAT:
+        return(interleaved.astype("<f"+str(width)).tobytes())
+    scale = 2**(8*width-1)
+    values = numpy.clip(numpy.round(interleaved * scale), -scale, scale - 1).astype(numpy.int64)
+    if width == 1:
+        return((values + 128).astype(numpy.uint8).tobytes())
+    if width == 3:
+        values = values.astype("<i4").view(numpy.uint8).reshape(-1, 4)[:,:3]
+        return(values.tobytes())
+    return(values.astype("<i"+str(width)).tobytes())
+
+def _resample(samples, fromRate, toRate):
+    """ Band-limited resampling of an array of samples (one row per channel), using the
+    FFT of the whole signal. Requires numpy. """
+    count = samples.shape[1]
+    newCount = int(round(count * toRate / fromRate))
+    if newCount == count or count == 0:
+        return(samples)
+    spectrum = numpy.fft.rfft(samples, axis=1)
+    # truncating/zero-padding the spectrum changes the sample rate
+    return(numpy.fft.irfft(spectrum, newCount, axis=1) * (newCount / count))
+
+def _wavArray(buffer, normalize=True):
+    """ Converts the content of a WAV file (bytes, mmap, etc.) into a tuple: 
+    (samples, sampleRate), where samples is an array with one row per channel. 
+
+    If normalize is True, samples are floats scaled to the range -1..1. Otherwise, samples
+    are in their stored format, and for 8, 16, and 32 bit samples, the array is a view of
+    the buffer itself, so no samples are copied. Requires numpy. """
+    header = _readHeader(buffer)
+    start = header["dataOffset"]
+    if normalize:
+        samples = _decode(buffer[start:start + header["dataLength"]], header)
+    else:
+        width = header["bitsPerSample"] // 8
+        if header["format"] == _FLOAT:
+            dtype = "<f"+str(width)
+        elif width == 1:
+            dtype = numpy.uint8
+        elif width == 3: # no 24-bit type, so samples are unpacked into 32-bit integers
+            raw = numpy.frombuffer(
+                buffer, dtype=numpy.uint8, count=header["dataLength"], offset=start)
+            samples = numpy.zeros((len(raw)//3, 4), dtype=numpy.uint8)
+            samples[:,1:] = raw.reshape(-1, 3)
+            return(samples.view("<i4").reshape(-1, header["channels"]).T >> 8,
+                   header["sampleRate"])
+        else:
+            dtype = "<i"+str(width)
+        samples = numpy.frombuffer(
+            buffer, dtype=dtype, count=header["dataLength"] // width, offset=start)
+        samples = samples.reshape(-1, header["channels"]).T
+    return(samples, header["sampleRate"])
+
+def _readWav(fileName):
+    """ Reads a whole WAV file, returning a tuple: (samples, sampleRate), where samples
+    is an array of floats with one row per channel. Requires numpy. """
+    with open(fileName, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return(_wavArray(buffer))
+
+def _sliceWav(source, intervals, sampleRate=None):
+    """ Cuts fragments out of a WAV file, without reading the whole file into memory.
+
+    source is the name of the WAV file, and intervals is a list of tuples, each being
+    (startOffset, endOffset, destinationFileName). The boundaries are rounded to the
+    nearest sample. If sampleRate is specified and is different from the source's sample
+    rate, fragments are resampled, which requires numpy. """
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            header = _readHeader(buffer)
+            rate = header["sampleRate"]
+            blockAlign = header["blockAlign"]
+            sampleCount = header["dataLength"] // blockAlign
+            outputHeader = dict(header)
+            if header["format"] not in [_PCM, _FLOAT]:
+                raise ValueError("Unsupported WAV format: " + str(header["format"]))
+            if sampleRate != None and sampleRate != rate:
+                if numpy is None:
+                    raise ImportError("Local sample rate conversion requires numpy")
+                outputHeader["sampleRate"] = sampleRate
+            for startOffset, endOffset, destination in intervals:
+                first = min(max(int(round(startOffset * rate)), 0), sampleCount)
+                last = min(max(int(round(endOffset * rate)), first), sampleCount)
+                start = header["dataOffset"] + first * blockAlign
+                data = buffer[start:start + (last - first) * blockAlign]
+                if outputHeader["sampleRate"] != rate:
+                    data = _encode(
+                        _resample(_decode(data, header), rate, sampleRate), outputHeader)
+                with open(destination, "wb") as fragment:
+                    fragment.write(_wavHeader(outputHeader, len(data)))
+                    fragment.write(data)
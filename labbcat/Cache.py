@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+class Cache:
+    """ An in-memory cache of values that are expensive to get from the server, with a
+    maximum number of entries and, optionally, a maximum age for each entry.
+
+    When the cache is full, the least recently used entry is discarded to make room for
+    new ones. Entries older than *ttl* seconds are treated as missing, so changes made on
+    the server by other users are picked up eventually.
+
+    The cache can be safely shared by several threads.
+
+    Constructor arguments:
+
+    :param maxEntries: The maximum number of entries to keep.
+    :type maxEntries: int
+
+    :param ttl: The number of seconds for which entries are valid, or None for entries to
+     remain valid until they are evicted or invalidated.
+    :type ttl: float
+
+    Attributes:
+        hits: The number of times *get* has found a valid entry.
+        misses: The number of times *get* has not found a valid entry.
+
+    Example::
+
+        import labbcat
+
+        corpus = labbcat.LabbcatView("https://labbcat.canterbury.ac.nz", "demo", "demo")
+        # cache attributes of up to 50,000 participants/transcripts for 10 minutes
+        corpus.attributeCache = labbcat.Cache(maxEntries=50000, ttl=600)
+    """
+
+    def __init__(self, maxEntries=10000, ttl=300):
+        """ Constructor. """
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expiry time, value), least recent first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return(len(self._entries))
+
+    def get(self, key, default=None):
+        """ Gets a value, marking it as recently used.
+
+        :param key: The key of the value.
+        :type key: hashable
+
+        :param default: The value to return if there's no valid entry for *key*.
+
+        :returns: The value, or *default* if it's not in the cache or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry != None and (entry[0] == None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits = self.hits + 1
+                return(entry[1])
+            if entry != None: # expired
+                del self._entries[key]
+            self.misses = self.misses + 1
+            return(default)
+
+    def put(self, key, value):
+        """ Adds or replaces a value, evicting the least recently used value if the cache
+        is full.
+
+        :param key: The key of the value.
+        :type key: hashable
+
+        :param value: The value.
+        """
+        expiry = None if self.ttl == None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+
+    def remove(self, key):
+        """ Removes a value, if it's in the cache.
+
+        :param key: The key of the value.
+        :type key: hashable
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, predicate):
+        """ Removes all values whose keys match the given condition; e.g. all values
+        relating to a participant whose attributes have changed.
+
+        :param predicate: A function that takes a key, and returns True if the value for
+         that key should be removed.
+        :type predicate: function
+
+        :returns: The number of values removed.
+        :rtype: int
+        """
+        with self._lock:
+            keys = [ key for key in self._entries if predicate(key) ]
+            for key in keys:
+                del self._entries[key]
+            return(len(keys))
+
+    def clear(self):
+        """ Removes all values. """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,452 @@
+import json
+import sqlite3
+import time
+import zlib
+from labbcat import Attributes
+from labbcat.AGQL import filterByExpression
+from labbcat.Graph import Graph
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS setting (
+  name TEXT PRIMARY KEY,
+  value TEXT);
+CREATE TABLE IF NOT EXISTS transcript (
+  id TEXT PRIMARY KEY,
+  signature TEXT NOT NULL,
+  synced REAL NOT NULL,
+  graph BLOB);
+CREATE TABLE IF NOT EXISTS transcript_attribute (
+  transcript_id TEXT NOT NULL,
+  layer_id TEXT NOT NULL,
+  ordinal INTEGER NOT NULL,
+  label TEXT);
+CREATE INDEX IF NOT EXISTS transcript_attribute_transcript
+  ON transcript_attribute (transcript_id);
+CREATE INDEX IF NOT EXISTS transcript_attribute_layer_label
+  ON transcript_attribute (layer_id, label);
+CREATE TABLE IF NOT EXISTS annotation (
+  transcript_id TEXT NOT NULL,
+  layer_id TEXT NOT NULL,
+  ordinal INTEGER NOT NULL,
+  id TEXT NOT NULL,
+  label TEXT,
+  parent_id TEXT,
+  start REAL,
+  end REAL,
+  confidence INTEGER);
+CREATE INDEX IF NOT EXISTS annotation_transcript_layer
+  ON annotation (transcript_id, layer_id, ordinal);
+CREATE INDEX IF NOT EXISTS annotation_layer_label
+  ON annotation (layer_id, label);
+CREATE TABLE IF NOT EXISTS participant (
+  id TEXT PRIMARY KEY,
+  signature TEXT NOT NULL,
+  synced REAL NOT NULL,
+  record TEXT);
+CREATE TABLE IF NOT EXISTS participant_attribute (
+  participant_id TEXT NOT NULL,
+  layer_id TEXT NOT NULL,
+  ordinal INTEGER NOT NULL,
+  label TEXT);
+CREATE INDEX IF NOT EXISTS participant_attribute_participant
+  ON participant_attribute (participant_id);
+CREATE INDEX IF NOT EXISTS participant_attribute_layer_label
+  ON participant_attribute (layer_id, label);
+"""
+
+class CorpusMirror:
+    """ A local copy of a LaBB-CAT corpus in an SQLite database, for running analyses
+    offline, without loading the server with the same requests again and again.
+
+    *sync* copies transcripts (including their annotations on the given layers),
+    transcript attributes, participants, and participant attributes from the server into
+    the database. The first sync copies everything; later syncs only get transcripts and
+    participants that are new, or whose attribute values have changed since the last
+    sync, and remove those that have been deleted from the server. Changes to
+    annotations that don't also change a transcript attribute (e.g. the transcript's
+    last-modified date, if the server has such an attribute) are not detected; such
+    transcripts can be refreshed using *sync(full=True)*.
+
+    Once synced, the mirror can be read using its getter functions, which are named like
+    the corresponding LabbcatView functions, or directly with SQL via the *connection*
+    attribute. The database has the following tables:
+
+    - *transcript* (id, signature, synced, graph) - graph is the transcript as returned
+      by getTranscript, as zlib-compressed JSON.
+    - *transcript_attribute* (transcript_id, layer_id, ordinal, label)
+    - *annotation* (transcript_id, layer_id, ordinal, id, label, parent_id, start, end,
+      confidence) - start and end are offsets in seconds, or NULL if not known.
+    - *participant* (id, signature, synced, record) - record is the participant as
+      returned by getParticipant, as JSON.
+    - *participant_attribute* (participant_id, layer_id, ordinal, label)
+
+    Constructor arguments:
+
+    :param corpus: The corpus to mirror.
+    :type corpus: LabbcatView
+
+    :param fileName: The SQLite database file, which is created if it doesn't exist.
+    :type fileName: str
+
+    :param layerIds: The IDs of the layers whose annotations are mirrored, or None for
+     transcript and participant attributes only. If this is different from the previous
+     sync, all transcripts are refreshed.
+    :type layerIds: list of str
+
+    :param transcriptAttributes: The IDs of the transcript attribute layers to mirror,
+     which are also used to detect changed transcripts, or None for all transcript
+     attributes.
+    :type transcriptAttributes: list of str
+
+    :param participantAttributes: The IDs of the participant attribute layers to mirror,
+     which are also used to detect changed participants, or None for all participant
+     attributes.
+    :type participantAttributes: list of str
+
+    Attributes:
+        connection: The sqlite3 connection to the database.
+
+    Example::
+
+        import labbcat
+
+        corpus = labbcat.LabbcatView("https://labbcat.canterbury.ac.nz", "demo", "demo")
+        with labbcat.CorpusMirror(corpus, "demo.db", ["word", "segment"]) as mirror:
+            # the first sync copies the whole corpus, later ones only what has changed
+            mirror.sync(maxWorkers=8)
+
+            # word frequencies, computed offline
+            for label, count in mirror.connection.execute(
+                    "SELECT label, COUNT(*) FROM annotation WHERE layer_id = 'word'"
+                    + " GROUP BY label ORDER BY 2 DESC LIMIT 10"):
+                print(label + " " + str(count))
+    """
+
+    def __init__(self, corpus, fileName, layerIds=None, transcriptAttributes=None, participantAttributes=None):
+        """ Constructor. """
+        self.corpus = corpus
+        self.fileName = fileName
+        self.layerIds = layerIds
+        self.transcriptAttributes = transcriptAttributes
+        self.participantAttributes = participantAttributes
+        self.connection = sqlite3.connect(fileName)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exceptionType, exception, traceback):
+        self.close()
+
+    def close(self):
+        """ Closes the database. """
+        self.connection.close()
+
+    def sync(self, maxWorkers=4, full=False, progress=None, retries=2):
+        """ Updates the mirror from the server.
+
+        :param maxWorkers: The maximum number of transcripts or participants to request at
+         once.
+        :type maxWorkers: int
+
+        :param full: Whether to refresh all transcripts and participants, whether or not
+         their attributes have changed.
+        :type full: boolean
+
+        :param progress: A function to call after each transcript or participant is
+         refreshed, with the number refreshed so far and the number to refresh.
+        :type progress: function
+
+        :param retries: The number of times to retry getting a transcript or participant
+         after a transient error.
+        :type retries: int
+
+        :returns: A dictionary with the following entries:
+
+         - "added" : the IDs of new transcripts and participants,
+         - "updated" : the IDs of refreshed transcripts and participants,
+         - "removed" : the IDs of deleted transcripts and participants,
+         - "unchanged" : the number of transcripts and participants that didn't need
+           refreshing, and
+         - "errors" : a dictionary of errors, keyed by the ID of the transcript or
+           participant that couldn't be retrieved, which will be tried again at the next
+           sync.
+        :rtype: dict
+        """
+        result = { "added" : [], "updated" : [], "removed" : [], "unchanged" : 0,
+                   "errors" : {} }
+        transcriptAttributes = self.transcriptAttributes
+        participantAttributes = self.participantAttributes
+        if transcriptAttributes == None or participantAttributes == None:
+            layers = self.corpus.getLayers()
+            if transcriptAttributes == None:
+                transcriptAttributes = Attributes._attributeLayerIds(layers, "graph")
+            if participantAttributes == None:
+                participantAttributes = Attributes._attributeLayerIds(layers, "participant")
+
+        # if the layers to mirror have changed, everything must be refreshed
+        settings = json.dumps([ self.layerIds, transcriptAttributes, participantAttributes ])
+        row = self.connection.execute(
+            "SELECT value FROM setting WHERE name = 'layers'").fetchone()
+        if row == None or row[0] != settings: full = True
+
+        # which transcripts and participants have changed?
+        transcriptIds = self.corpus.getTranscriptIds()
+        transcriptValues = {}
+        if len(transcriptIds) > 0:
+            transcriptValues = Attributes._readAttributes(
+                self.corpus._getTranscriptAttributes(
+                    transcriptIds, transcriptAttributes, useCache=False))
+        participantIds = self.corpus.getParticipantIds()
+        participantValues = {}
+        if len(participantIds) > 0 and len(participantAttributes) > 0:
+            participantValues = Attributes._readAttributes(
+                self.corpus._getParticipantAttributes(
+                    participantIds, participantAttributes, useCache=False))
+        transcriptsToGet = self._changes(
+            "transcript", transcriptIds, transcriptValues, full, result)
+        participantsToGet = self._changes(
+            "participant", participantIds, participantValues, full, result)
+        total = len(transcriptsToGet) + len(participantsToGet)
+        done = 0
+
+        for id, transcript, error in self.corpus.getTranscripts(
+                list(transcriptsToGet.keys()), self.layerIds, maxWorkers, False, retries):
+            if error != None:
+                result["errors"][id] = error
+            else:
+                with self.connection:
+                    new = self._saveTranscript(
+                        id, transcriptsToGet[id], transcriptValues.get(id, []), transcript)
+                result["added" if new else "updated"].append(id)
+            done = done + 1
+            if progress != None: progress(done, total)
+
+        participantIds = list(participantsToGet.keys())
+        for index, participant, error in self.corpus._mapConcurrently(
+                lambda id: self.corpus._getParticipant(id, useCache=False),
+                participantIds, maxWorkers, False, retries):
+            id = participantIds[index]
+            if error != None:
+                result["errors"][id] = error
+            else:
+                with self.connection:
+                    new = self._saveParticipant(
+                        id, participantsToGet[id], participantValues.get(id, []),
+                        participant)
+                result["added" if new else "updated"].append(id)
+            done = done + 1
+            if progress != None: progress(done, total)
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO setting (name, value) VALUES ('layers', ?)",
+                (settings,))
+        return(result)
+
+    def _changes(self, table, ids, values, full, result):
+        """ Compares the server's IDs and attribute values with those in the database,
+        removing deleted records. Returns a dictionary of ID -> signature for records that
+        need to be retrieved. """
+        signatures = dict(self.connection.execute("SELECT id, signature FROM " + table))
+        toGet = {}
+        for id in ids:
+            signature = Attributes._signature(values.get(id, []))
+            if full or signatures.get(id) != signature:
+                toGet[id] = signature
+            else:
+                result["unchanged"] = result["unchanged"] + 1
+        removed = set(signatures.keys()) - set(ids)
+        if len(removed) > 0:
+            with self.connection:
+                for id in removed:
+                    self._delete(table, id)
+            result["removed"].extend(sorted(removed))
+        return(toGet)
+
+    def _delete(self, table, id):
+        """ Removes a transcript or participant and all its data. """
+        self.connection.execute(
+            "DELETE FROM " + table + "_attribute WHERE " + table + "_id = ?", (id,))
+        if table == "transcript":
+            self.connection.execute("DELETE FROM annotation WHERE transcript_id = ?", (id,))
+        self.connection.execute("DELETE FROM " + table + " WHERE id = ?", (id,))
+
+    def _save(self, table, id, signature, attributes, data):
+        """ Replaces a transcript or participant record and its attributes. Returns True if
+        there was no previous version of the record. """
+        new = self.connection.execute(
+            "SELECT id FROM " + table + " WHERE id = ?", (id,)).fetchone() == None
+        self._delete(table, id)
+        self.connection.execute(
+            "INSERT INTO " + table + " VALUES (?, ?, ?, ?)",
+            (id, signature, time.time(), data))
+        ordinals = {}
+        for layerId, label in attributes:
+            ordinals[layerId] = ordinals.get(layerId, 0) + 1
+            self.connection.execute(
+                "INSERT INTO " + table + "_attribute VALUES (?, ?, ?, ?)",
+                (id, layerId, ordinals[layerId], label))
+        return(new)
+
+    def _saveTranscript(self, id, signature, attributes, transcript):
+        """ Saves a transcript, its attributes, and its annotations. """
+        new = self._save("transcript", id, signature, attributes,
+                   zlib.compress(json.dumps(transcript).encode("utf-8")))
+        graph = Graph(transcript)
+        for layerId, layer in graph.layers.items():
+            if self.layerIds != None and layerId not in self.layerIds: continue
+            parentLayer = graph.layers.get(layer.parentId)
+            starts = graph.startOffsets(layerId)
+            ends = graph.endOffsets(layerId)
+            self.connection.executemany(
+                "INSERT INTO annotation VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((id, layerId, row + 1, layer.ids[row], layer.labels[row],
+                  parentLayer.ids[layer.parents[row]] if parentLayer != None else None,
+                  starts[row] if starts[row] == starts[row] else None, # not NaN
+                  ends[row] if ends[row] == ends[row] else None,
+                  layer.confidences[row] if layer.confidences[row] >= 0 else None)
+                 for row in range(len(layer))))
+        return(new)
+
+    def _saveParticipant(self, id, signature, attributes, participant):
+        """ Saves a participant and its attributes. """
+        return(self._save("participant", id, signature, attributes, json.dumps(participant)))
+
+    def getTranscriptIds(self):
+        """ Gets a list of mirrored transcript IDs.
+
+        :returns: A list of transcript IDs.
+        :rtype: list
+        """
+        return([ row[0] for row in self.connection.execute(
+            "SELECT id FROM transcript ORDER BY id") ])
+
+    def getTranscript(self, id):
+        """ Gets a mirrored transcript.
+
+        :param id: The transcript ID.
+        :type id: str
+
+        :returns: The transcript, as returned by LabbcatView.getTranscript when it was
+         synced, or None if it's not in the mirror.
+        :rtype: dictionary
+        """
+        row = self.connection.execute(
+            "SELECT graph FROM transcript WHERE id = ?", (id,)).fetchone()
+        if row == None: return(None)
+        return(json.loads(zlib.decompress(row[0]).decode("utf-8")))
+
+    def getTranscriptAttributes(self, id):
+        """ Gets the mirrored attribute values of a transcript.
+
+        :param id: The transcript ID.
+        :type id: str
+
+        :returns: A dictionary of lists of labels, keyed by attribute layer ID.
+        :rtype: dictionary
+        """
+        return(self._attributes("transcript", id))
+
+    def getMatchingTranscriptIds(self, expression):
+        """ Gets the IDs of mirrored transcripts whose attributes match an expression,
+        evaluated locally.
+
+        Only expressions like those generated by the expressionFrom... functions are
+        supported; see `compileExpression() <#labbcat.compileExpression>`_.
+
+        :param expression: The expression to match.
+        :type expression: str
+
+        :returns: A list of matching transcript IDs.
+        :rtype: list of str
+        """
+        return(filterByExpression(expression, self._allAttributes("transcript")))
+
+    def getAnnotations(self, id, layerId):
+        """ Gets the mirrored annotations of a transcript on a given layer.
+
+        :param id: The transcript ID.
+        :type id: str
+
+        :param layerId: The layer ID.
+        :type layerId: str
+
+        :returns: A list of annotations, in transcript order, each being a dictionary with
+         entries "id", "label", "parentId", "start", "end", and "confidence".
+        :rtype: list of dictionaries
+        """
+        return([ { "id" : row[0], "label" : row[1], "parentId" : row[2],
+                   "start" : row[3], "end" : row[4], "confidence" : row[5] }
+                 for row in self.connection.execute(
+                         "SELECT id, label, parent_id, start, end, confidence"
+                         + " FROM annotation WHERE transcript_id = ? AND layer_id = ?"
+                         + " ORDER BY ordinal", (id, layerId)) ])
+
+    def getParticipantIds(self):
+        """ Gets a list of mirrored participant IDs.
+
+        :returns: A list of participant IDs.
+        :rtype: list
+        """
+        return([ row[0] for row in self.connection.execute(
+            "SELECT id FROM participant ORDER BY id") ])
+
+    def getParticipant(self, id):
+        """ Gets a mirrored participant record.
+
+        :param id: The participant ID.
+        :type id: str
+
+        :returns: The participant, as returned by LabbcatView.getParticipant when it was
+         synced, or None if it's not in the mirror.
+        :rtype: dictionary
+        """
+        row = self.connection.execute(
+            "SELECT record FROM participant WHERE id = ?", (id,)).fetchone()
+        if row == None: return(None)
+        return(json.loads(row[0]))
+
+    def getMatchingParticipantIds(self, expression):
+        """ Gets the IDs of mirrored participants whose attributes match an expression,
+        evaluated locally.
+
+        Only expressions like those generated by the expressionFrom... functions are
+        supported; see `compileExpression() <#labbcat.compileExpression>`_.
+
+        :param expression: The expression to match.
+        :type expression: str
+
+        :returns: A list of matching participant IDs.
+        :rtype: list of str
+        """
+        return(filterByExpression(expression, self._allAttributes("participant")))
+
+    def getParticipantAttributes(self, id):
+        """ Gets the mirrored attribute values of a participant.
+
+        :param id: The participant ID.
+        :type id: str
+
+        :returns: A dictionary of lists of labels, keyed by attribute layer ID.
+        :rtype: dictionary
+        """
+        return(self._attributes("participant", id))
+
+    def _attributes(self, table, id):
+        attributes = {}
+        for layerId, label in self.connection.execute(
+                "SELECT layer_id, label FROM " + table + "_attribute WHERE " + table
+                + "_id = ? ORDER BY layer_id, ordinal", (id,)):
+            attributes.setdefault(layerId, []).append(label)
+        return(attributes)
+
+    def _allAttributes(self, table):
+        """ The attributes of all transcripts or participants, keyed by ID. """
+        records = { row[0] : {} for row in self.connection.execute(
+            "SELECT id FROM " + table + " ORDER BY id") }
+        for id, layerId, label in self.connection.execute(
+                "SELECT " + table + "_id, layer_id, label FROM " + table + "_attribute"
+                + " ORDER BY " + table + "_id, layer_id, ordinal"):
+            records[id].setdefault(layerId, []).append(label)
+        return(records)
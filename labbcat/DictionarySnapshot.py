@@ -0,0 +1,414 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from functools import lru_cache
+
+_MAGIC = b"LBCATDS2"
+# magic, slot count, key count, metadata length, slot table position
+_HEADER = struct.Struct("<8sQQIQ")
+_SLOT = struct.Struct("<QQ") # key hash, record offset (0 for an empty slot)
+# a record is this header, then the key, then the length of each entry in characters, then
+# all the entries as one string
+_RECORD = struct.Struct("<III") # key length in bytes, entry count, entries length in bytes
+
+@lru_cache(maxsize=64)
+def _lengths(count):
+    return(struct.Struct("<" + str(count) + "I"))
+
+class DictionarySnapshot:
+    """ A local copy of entries from a dictionary on the server, for looking up large
+    numbers of keys quickly, without any requests to the server.
+
+    The snapshot is stored in a file containing a hash table, which is memory-mapped
+    rather than loaded, so opening even a very large snapshot is instant, and lookups are
+    as fast as reading the entry from memory.
+
+    LaBB-CAT doesn't provide a way of listing all the keys in a dictionary, so the
+    snapshot is built by looking up a given list of keys (e.g. all the word types in the
+    corpus, or all the words in a lexicon file) with *build*. Keys that weren't included
+    can be added later with *refresh*.
+
+    When entries are changed using the *corpus* (with
+    `addDictionaryEntry() <#labbcat.LabbcatEdit.addDictionaryEntry>`_,
+    `removeDictionaryEntry() <#labbcat.LabbcatEdit.removeDictionaryEntry>`_,
+    `loadLexicon() <#labbcat.LabbcatAdmin.loadLexicon>`_, etc.) the changed keys are
+    looked up again the next time the snapshot is used, and only those keys are updated
+    in the file. Changes made on the server by others are not detected; they can be
+    picked up by calling *refresh* with the keys concerned, or *build* to start again.
+
+    Constructor arguments:
+
+    :param corpus: The corpus the dictionary belongs to, or None to use an existing
+     snapshot without updating it.
+    :type corpus: LabbcatView
+
+    :param managerId: The layer manager ID of the dictionary, as returned by
+     `getDictionaries() <#labbcat.LabbcatView.getDictionaries>`_.
+    :type managerId: str
+
+    :param dictionaryId: The ID of the dictionary, as returned by
+     `getDictionaries() <#labbcat.LabbcatView.getDictionaries>`_.
+    :type dictionaryId: str
+
+    :param fileName: The snapshot file, which is opened if it already exists.
+    :type fileName: str
+
+    Example::
+
+        import labbcat
+
+        corpus = labbcat.LabbcatView("https://labbcat.canterbury.ac.nz", "demo", "demo")
+        snapshot = labbcat.DictionarySnapshot(
+            corpus, "CELEX-EN", "Phonology (wordform)", "celex-phonology.snapshot")
+        if len(snapshot) == 0:
+            wordTypes = [ word["label"] for word in corpus.getMatchingAnnotations(
+                "layer.id == 'orthography'") ]
+            snapshot.build(wordTypes)
+
+        pronunciations = snapshot.lookup(["the", "quick", "brown", "fox"])
+    """
+
+    def __init__(self, corpus, managerId, dictionaryId, fileName):
+        """ Constructor. """
+        self.corpus = corpus
+        self.managerId = managerId
+        self.dictionaryId = dictionaryId
+        self.fileName = fileName
+        self._lock = threading.RLock()
+        self._pending = set() # keys changed since they were looked up
+        self._stale = False # whether the whole dictionary has changed
+        self._file = None
+        # (map, slot table position, slot count), which is replaced as a whole, so that
+        # lookups (which don't lock) always see a consistent table; a superseded map is
+        # unmapped when the last lookup using it drops its reference
+        self._view = None
+        self._keyCount = 0
+        self._compactSize = 0 # the size of the file when it was written without updates
+        if os.path.exists(fileName):
+            self._open()
+            if self._metadata.get("managerId") != managerId \
+               or self._metadata.get("dictionaryId") != dictionaryId:
+                self.close()
+                raise ValueError(
+                    fileName + " is a snapshot of " + str(self._metadata.get("managerId"))
+                    + "/" + str(self._metadata.get("dictionaryId")) + ", not "
+                    + str(managerId) + "/" + str(dictionaryId))
+        if corpus != None:
+            corpus._dictionaryListeners.append(self._dictionaryChanged)
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exceptionType, exception, traceback):
+        self.close()
+
+    def __len__(self):
+        return(self._keyCount)
+
+    def __contains__(self, key):
+        return(self.get(key) != None)
+
+    def close(self):
+        """ Closes the snapshot file. """
+        if self.corpus != None and self._dictionaryChanged in self.corpus._dictionaryListeners:
+            self.corpus._dictionaryListeners.remove(self._dictionaryChanged)
+        with self._lock:
+            self._closeFile()
+
+    def build(self, keys, chunkSize=10000, maxWorkers=4):
+        """ Creates the snapshot, replacing any previous contents, by looking up the given
+        keys.
+
+        :param keys: The keys to look up. Keys with no entries are included, so that
+         lookups can distinguish keys with no entries from keys that aren't in the snapshot.
+        :type keys: list of str
+
+        :param chunkSize: The maximum number of keys to look up in one request.
+        :type chunkSize: int
+
+        :param maxWorkers: The maximum number of requests to make at once.
+        :type maxWorkers: int
+        """
+        with self._lock:
+            self._replace(self._lookup(keys, chunkSize, maxWorkers))
+            self._pending = set()
+            self._stale = False
+
+    def refresh(self, keys=None, chunkSize=10000, maxWorkers=4):
+        """ Looks up the given keys again, adding or updating them in the snapshot.
+
+        :param keys: The keys to look up, or None for keys that have been changed using
+         the *corpus* since they were last looked up.
+        :type keys: list of str
+
+        :param chunkSize: The maximum number of keys to look up in one request.
+        :type chunkSize: int
+
+        :param maxWorkers: The maximum number of requests to make at once.
+        :type maxWorkers: int
+        """
+        with self._lock:
+            pending = self._pending
+            stale = self._stale
+            if keys == None:
+                keys = list(self.keys()) if stale else list(pending)
+            self._pending = set()
+            self._stale = False
+            try:
+                if len(keys) == 0: return
+                updates = self._lookup(keys, chunkSize, maxWorkers)
+                newKeys = sum(1 for key in updates if self._find(key.encode("utf-8"))[1] == 0)
+                slotCount = 0 if self._view == None else self._view[2]
+                if (self._keyCount + newKeys) * 4 > slotCount * 3 \
+                   or len(updates) * 2 > self._keyCount \
+                   or os.path.getsize(self.fileName) > self._compactSize * 2:
+                    # the table is getting full, most entries are changing, or most of the
+                    # file is superseded records and tables
+                    items = dict(self.items())
+                    items.update(updates)
+                    self._replace(items)
+                else:
+                    self._update(updates)
+            except:
+                # try again next time
+                self._pending.update(pending)
+                self._stale = self._stale or stale
+                raise
+
+    def get(self, key, default=None):
+        """ Gets the entries for a key.
+
+        :param key: The key (word) to look up.
+        :type key: str
+
+        :param default: The value to return if the key isn't in the snapshot.
+
+        :returns: A list of entries (which may be empty), or *default* if the key isn't in
+         the snapshot.
+        :rtype: list of str
+        """
+        if self._pending or self._stale: self.refresh()
+        view = self._view
+        if view is None: return(default)
+        data, table, slotCount = view
+        # this is _find inlined, as lookups need to be as fast as possible
+        keyBytes = key.encode("utf-8")
+        hash = zlib.crc32(keyBytes)
+        mask = slotCount - 1
+        unpack = _SLOT.unpack_from
+        slot = hash & mask
+        while True:
+            slotHash, offset = unpack(data, table + (slot << 4))
+            if offset == 0: return(default)
+            if slotHash == hash:
+                keyLength, count, textLength = _RECORD.unpack_from(data, offset)
+                position = offset + 12 + keyLength
+                if data[offset + 12 : position] == keyBytes:
+                    if count == 0: return([])
+                    text = data[position + 4 * count
+                                : position + 4 * count + textLength].decode("utf-8")
+                    if count == 1: return([ text ])
+                    return(self._split(text, _lengths(count).unpack_from(data, position)))
+            slot = (slot + 1) & mask
+
+    def lookup(self, keys):
+        """ Looks up several keys.
+
+        :param keys: The keys (words) to look up.
+        :type keys: list of str
+
+        :returns: A dictionary of lists, like the result of
+         `getDictionaryEntries() <#labbcat.LabbcatView.getDictionaryEntries>`_, with the
+         entries of each given key that's in the snapshot. Keys that aren't in the
+         snapshot are not included.
+        :rtype: dict of lists
+        """
+        dictionary = {}
+        for key in keys:
+            entries = self.get(key)
+            if entries != None: dictionary[key] = entries
+        return(dictionary)
+
+    def keys(self):
+        """ Iterates through the keys in the snapshot, in no particular order. """
+        for key, entries in self.items():
+            yield(key)
+
+    def items(self):
+        """ Iterates through the keys and their entries, in no particular order.
+
+        :returns: An iterator of (key, entries) tuples.
+        :rtype: iterator
+        """
+        view = self._view
+        if view == None: return
+        data, table, slotCount = view
+        for slot in range(slotCount):
+            offset = _SLOT.unpack_from(data, table + slot * _SLOT.size)[1]
+            if offset != 0:
+                yield((self._key(data, offset).decode("utf-8"), self._entries(data, offset)))
+
+    def _dictionaryChanged(self, managerId, dictionaryId, key):
+        """ Called by the corpus when dictionary entries are changed. """
+        if (managerId == None or managerId == self.managerId) \
+           and (dictionaryId == None or dictionaryId == self.dictionaryId):
+            with self._lock:
+                if key == None:
+                    self._stale = True
+                else:
+                    self._pending.add(key)
+
+    def _lookup(self, keys, chunkSize, maxWorkers):
+        """ Looks up keys on the server, returning a dict of key -> entries that includes
+        all the given keys. """
+        if self.corpus == None:
+            raise ValueError("No corpus to look up keys in: " + self.fileName)
+        keys = list(keys)
+        entries = self.corpus.getDictionaryEntries(
+            self.managerId, self.dictionaryId, keys, chunkSize=chunkSize,
+            maxWorkers=maxWorkers)
+        items = dict((key, []) for key in keys)
+        items.update(entries)
+        return(items)
+
+    def _find(self, keyBytes, data=None, slots=None, base=None, slotCount=None):
+        """ Finds the slot for a key, in the table of *slotCount* slots in *slots* at
+        position *base*, with records in *data*, or in the current table by default.
+        Returns (slot index, record offset), where the offset is 0 if the key isn't there,
+        in which case the slot is where the key would go. """
+        if data == None:
+            if self._view == None: return((0, 0))
+            data, base, slotCount = self._view
+            slots = data
+        hash = zlib.crc32(keyBytes)
+        mask = slotCount - 1
+        slot = hash & mask
+        while True:
+            slotHash, offset = _SLOT.unpack_from(slots, base + slot * _SLOT.size)
+            if offset == 0 or (slotHash == hash and self._key(data, offset) == keyBytes):
+                return((slot, offset))
+            slot = (slot + 1) & mask
+
+    def _key(self, data, offset):
+        length = _RECORD.unpack_from(data, offset)[0]
+        return(data[offset + 12 : offset + 12 + length])
+
+    def _entries(self, data, offset):
+        keyLength, count, textLength = _RECORD.unpack_from(data, offset)
+        position = offset + 12 + keyLength
+        if count == 0: return([])
+        text = data[position + 4 * count : position + 4 * count + textLength].decode("utf-8")
+        if count == 1: return([ text ])
+        return(self._split(text, _lengths(count).unpack_from(data, position)))
+
+    def _split(self, text, lengths):
+        """ Splits concatenated entries given their lengths. """
+        entries = []
+        start = 0
+        for length in lengths:
+            entries.append(text[start : start + length])
+            start = start + length
+        return(entries)
+
+    def _record(self, key, entries):
+        """ Encodes a key (as bytes) and its entries as a record. """
+        text = "".join(entries).encode("utf-8")
+        return(_RECORD.pack(len(key), len(entries), len(text)) + key
+               + _lengths(len(entries)).pack(*[ len(entry) for entry in entries ]) + text)
+
+    def _open(self):
+        self._file = open(self.fileName, "r+b")
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, slotCount, keyCount, self._metadataLength, table = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            data.close()
+            self._closeFile()
+            raise ValueError("Not a dictionary snapshot: " + self.fileName)
+        self._metadata = json.loads(
+            data[_HEADER.size : _HEADER.size + self._metadataLength].decode("utf-8"))
+        self._keyCount = keyCount
+        self._compactSize = len(data)
+        self._view = (data, table, slotCount)
+
+    def _closeFile(self):
+        if self._view != None: self._view[0].close()
+        self._view = None
+        if self._file != None: self._file.close()
+        self._file = None
+
+    def _replace(self, items):
+        """ Rewrites the snapshot file with the given dict of key -> entries. """
+        metadata = json.dumps({
+            "managerId" : self.managerId, "dictionaryId" : self.dictionaryId }).encode("utf-8")
+        table = (_HEADER.size + len(metadata) + 7) // 8 * 8
+        slotCount = 16
+        while slotCount < len(items) * 2: slotCount = slotCount * 2 # at most half full
+        slots = bytearray(slotCount * _SLOT.size)
+        mask = slotCount - 1
+        temporaryFile = self.fileName + ".part"
+        with open(temporaryFile, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, slotCount, len(items), len(metadata), table))
+            f.write(metadata)
+            f.write(b"\0" * (table - _HEADER.size - len(metadata)))
+            f.write(slots) # placeholder until records are written
+            offset = table + len(slots)
+            for key, entries in items.items():
+                key = key.encode("utf-8")
+                hash = zlib.crc32(key)
+                slot = hash & mask
+                while _SLOT.unpack_from(slots, slot * _SLOT.size)[1] != 0:
+                    slot = (slot + 1) & mask
+                _SLOT.pack_into(slots, slot * _SLOT.size, hash, offset)
+                record = self._record(key, entries)
+                f.write(record)
+                offset = offset + len(record)
+            f.seek(table)
+            f.write(slots)
+        # the current map isn't closed, as lookups in other threads may still be using it
+        if self._file != None: self._file.close()
+        os.replace(temporaryFile, self.fileName)
+        self._open()
+
+    def _update(self, updates):
+        """ Adds or replaces the given dict of key -> entries, by appending their records
+        and an updated copy of the slot table to the file, and then switching to the new
+        table with a single write of the header. The current table is never changed, so
+        lookups in other threads (or processes) can't see a partly updated table, and if
+        the update is interrupted, the file is left as it was. """
+        data, table, slotCount = self._view
+        f = self._file
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        offsets = {}
+        for key, entries in updates.items():
+            key = key.encode("utf-8")
+            record = self._record(key, entries)
+            f.write(record)
+            offsets[key] = offset
+            offset = offset + len(record)
+        f.flush()
+        # a map that includes the new records, for comparing keys
+        records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            slots = bytearray(data[table : table + slotCount * _SLOT.size])
+            keyCount = self._keyCount
+            for key, offset in offsets.items():
+                slot, existing = self._find(key, records, slots, 0, slotCount)
+                if existing == 0: keyCount = keyCount + 1
+                _SLOT.pack_into(slots, slot * _SLOT.size, zlib.crc32(key), offset)
+        finally:
+            records.close()
+        padding = -f.tell() % 8
+        f.write(b"\0" * padding)
+        newTable = f.tell()
+        f.write(slots)
+        f.flush()
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, slotCount, keyCount, self._metadataLength, newTable))
+        f.flush()
+        # the old map is left to lookups that may still be using it
+        self._view = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), newTable, slotCount)
+        self._keyCount = keyCount
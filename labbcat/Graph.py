@@ -0,0 +1,269 @@
+from array import array
+from bisect import bisect_left
+from labbcat.TimeIndex import TimeIndex
+
+class Layer:
+    """ The annotations on one layer of a Graph, stored as parallel arrays, with one row per
+    annotation. Rows are in the order the annotations appear in the transcript, and the
+    children of each annotation are in contiguous rows of the child layer.
+
+    Attributes:
+        id: The layer ID.
+        parentId: The ID of the parent layer, or None for top-level layers.
+        childIds: The IDs of child layers.
+        ids: A list of annotation IDs.
+        labels: A list of annotation labels.
+        starts: An array of start anchor rows, or -1 where there's no start anchor.
+        ends: An array of end anchor rows, or -1 where there's no end anchor.
+        confidences: An array of label confidence ratings, or -1 where there's no rating.
+        parents: An array of parent annotation rows in the parent layer, or -1 for
+         top-level layers.
+    """
+
+    def __init__(self, id, parentId):
+        """ Constructor. """
+        self.id = id
+        self.parentId = parentId
+        self.childIds = []
+        self.ids = []
+        self.labels = []
+        self.starts = array("l")
+        self.ends = array("l")
+        self.confidences = array("h")
+        self.parents = array("l")
+        self.rows = {} # annotation ID -> row
+        self._childRows = {} # child layer ID -> array of first child row for each row
+
+    def __len__(self):
+        return(len(self.ids))
+
+    def row(self, annotationId):
+        """ Gets the row of the given annotation, or None if it's not on this layer. """
+        return(self.rows.get(annotationId))
+
+class Graph:
+    """ A compact, indexed representation of an annotation graph, built from a transcript
+    returned by `getTranscript() <#labbcat.LabbcatView.getTranscript>`_.
+
+    The nested dictionaries that getTranscript returns are convenient for small amounts of
+    data, but traversing them, and resolving start/end anchor IDs through dictionary
+    lookups, is slow for large transcripts. A Graph stores the same annotations in
+    arrays instead; anchors are rows in an array of offsets, each layer is a set of
+    parallel arrays (see Layer), and parent/child relationships are arrays of row
+    numbers, so finding an annotation's offsets, parent, or children doesn't involve
+    searching.
+
+    Constructor arguments:
+
+    :param transcript: A transcript returned by getTranscript().
+    :type transcript: dict
+
+    Attributes:
+        id: The transcript ID.
+        schema: The layer schema of the transcript, if any.
+        anchorIds: A list of anchor IDs.
+        offsets: An array of anchor offsets, with NaN for anchors with no offset.
+        layers: A dictionary of Layer objects, keyed by layer ID.
+
+    Example::
+
+        import labbcat
+
+        corpus = labbcat.LabbcatView("https://labbcat.canterbury.ac.nz", "demo", "demo")
+        graph = labbcat.Graph(corpus.getTranscript("AP511_MikeThorpe.eaf", ["word"]))
+
+        # the duration of each word
+        words = graph.layers["word"]
+        for row in range(len(words)):
+            print(words.labels[row] + " " + str(graph.endOffset("word", row)
+                                               - graph.startOffset("word", row)))
+
+        # the words in the first turn
+        for row in graph.children("turn", 0, "word"):
+            print(words.labels[row])
+    """
+
+    def __init__(self, transcript):
+        """ Constructor. """
+        self.id = transcript.get("id")
+        self.schema = transcript.get("schema")
+        self.anchorIds = []
+        self.offsets = array("d")
+        self.anchorRows = {} # anchor ID -> row
+        nan = float("nan")
+        for anchorId, anchor in transcript.get("anchors", {}).items():
+            self.anchorRows[anchorId] = len(self.anchorIds)
+            self.anchorIds.append(anchorId)
+            offset = anchor.get("offset") if isinstance(anchor, dict) else anchor
+            self.offsets.append(nan if offset == None else float(offset))
+        self.layers = {}
+        self._timeIndices = {} # layer ID -> TimeIndex
+
+        # a single depth-first pass adds each annotation to its layer's arrays
+        anchorRows = self.anchorRows
+        stack = [ (transcript, None, -1) ] # (annotation, layer, row)
+        while len(stack) > 0:
+            annotation, layer, row = stack.pop()
+            children = []
+            for key, value in annotation.items():
+                if key == "anchors" or key == "schema" or not isinstance(value, list) \
+                   or len(value) == 0 or not isinstance(value[0], dict):
+                    continue
+                childLayer = self.layers.get(key)
+                if childLayer == None:
+                    childLayer = Layer(key, None if layer == None else layer.id)
+                    self.layers[key] = childLayer
+                    if layer != None: layer.childIds.append(key)
+                for child in value:
+                    childRow = len(childLayer.ids)
+                    childLayer.rows[child["id"]] = childRow
+                    childLayer.ids.append(child["id"])
+                    childLayer.labels.append(child.get("label"))
+                    childLayer.starts.append(anchorRows.get(child.get("startId"), -1))
+                    childLayer.ends.append(anchorRows.get(child.get("endId"), -1))
+                    confidence = child.get("confidence")
+                    childLayer.confidences.append(-1 if confidence == None else int(confidence))
+                    childLayer.parents.append(row)
+                    children.append((child, childLayer, childRow))
+            # pushed in reverse, so that annotations are visited in order
+            stack.extend(reversed(children))
+
+    def _layer(self, layerId):
+        layer = self.layers.get(layerId)
+        if layer == None:
+            raise KeyError("No such layer: " + str(layerId))
+        return(layer)
+
+    def annotation(self, layerId, row):
+        """ Gets an annotation as a dictionary like those returned by getTranscript (but
+        without child annotations), with "start" and "end" entries for its offsets.
+
+        :param layerId: The layer ID.
+        :type layerId: str
+
+        :param row: The row of the annotation in the layer.
+        :type row: int
+
+        :returns: The annotation.
+        :rtype: dict
+        """
+        layer = self._layer(layerId)
+        annotation = { "id" : layer.ids[row], "label" : layer.labels[row] }
+        if layer.starts[row] >= 0:
+            annotation["startId"] = self.anchorIds[layer.starts[row]]
+        if layer.ends[row] >= 0:
+            annotation["endId"] = self.anchorIds[layer.ends[row]]
+        if layer.confidences[row] >= 0:
+            annotation["confidence"] = layer.confidences[row]
+        annotation["start"] = self.startOffset(layerId, row)
+        annotation["end"] = self.endOffset(layerId, row)
+        return(annotation)
+
+    def find(self, annotationId):
+        """ Finds an annotation given its ID.
+
+        :param annotationId: The annotation ID.
+        :type annotationId: str
+
+        :returns: A tuple: (layerId, row), or None if there's no such annotation.
+        :rtype: tuple
+        """
+        for layer in self.layers.values():
+            row = layer.rows.get(annotationId)
+            if row != None: return((layer.id, row))
+        return(None)
+
+    def startOffset(self, layerId, row):
+        """ Gets the start offset of an annotation.
+
+        :returns: The offset, or None if the annotation has no start offset.
+        :rtype: float
+        """
+        anchor = self._layer(layerId).starts[row]
+        if anchor < 0 or self.offsets[anchor] != self.offsets[anchor]: # NaN
+            return(None)
+        return(self.offsets[anchor])
+
+    def endOffset(self, layerId, row):
+        """ Gets the end offset of an annotation.
+
+        :returns: The offset, or None if the annotation has no end offset.
+        :rtype: float
+        """
+        anchor = self._layer(layerId).ends[row]
+        if anchor < 0 or self.offsets[anchor] != self.offsets[anchor]: # NaN
+            return(None)
+        return(self.offsets[anchor])
+
+    def startOffsets(self, layerId):
+        """ Gets the start offsets of all annotations on a layer.
+
+        :returns: An array of offsets, with NaN for annotations with no start offset.
+        :rtype: array
+        """
+        nan = float("nan")
+        offsets = self.offsets
+        return(array("d", (offsets[a] if a >= 0 else nan for a in self._layer(layerId).starts)))
+
+    def endOffsets(self, layerId):
+        """ Gets the end offsets of all annotations on a layer.
+
+        :returns: An array of offsets, with NaN for annotations with no end offset.
+        :rtype: array
+        """
+        nan = float("nan")
+        offsets = self.offsets
+        return(array("d", (offsets[a] if a >= 0 else nan for a in self._layer(layerId).ends)))
+
+    def timeIndex(self, layerId):
+        """ Gets an index of the annotations on a layer by time, for finding annotations
+        in a given time window efficiently. The index is built the first time it's needed.
+
+        :param layerId: The layer ID.
+        :type layerId: str
+
+        :returns: The index.
+        :rtype: TimeIndex
+        """
+        index = self._timeIndices.get(layerId)
+        if index == None:
+            index = TimeIndex(self, layerId)
+            self._timeIndices[layerId] = index
+        return(index)
+
+    def parent(self, layerId, row):
+        """ Gets the parent of an annotation.
+
+        :returns: A tuple: (parentLayerId, parentRow), or None for top-level annotations.
+        :rtype: tuple
+        """
+        layer = self._layer(layerId)
+        if layer.parents[row] < 0: return(None)
+        return((layer.parentId, layer.parents[row]))
+
+    def children(self, layerId, row, childLayerId):
+        """ Gets the children of an annotation on a given child layer.
+
+        :param layerId: The layer ID of the parent annotation.
+        :type layerId: str
+
+        :param row: The row of the parent annotation.
+        :type row: int
+
+        :param childLayerId: The ID of the child layer.
+        :type childLayerId: str
+
+        :returns: The rows of the child annotations in the child layer.
+        :rtype: range
+        """
+        layer = self._layer(layerId)
+        childLayer = self._layer(childLayerId)
+        if childLayer.parentId != layerId:
+            raise KeyError(childLayerId + " is not a child layer of " + layerId)
+        firstRows = layer._childRows.get(childLayerId)
+        if firstRows == None:
+            # children are contiguous and in parent order, so parents is sorted
+            parents = childLayer.parents
+            firstRows = array("l", (bisect_left(parents, r) for r in range(len(layer) + 1)))
+            layer._childRows[childLayerId] = firstRows
+        return(range(firstRows[row], firstRows[row + 1]))
@@ -0,0 +1,30 @@
+def _coalesce(transcriptIds, startOffsets, endOffsets, gap=0.0):
+    """ Plans the retrieval of a list of intervals, by merging intervals in the same
+    transcript that overlap, or are separated by no more than *gap* seconds, into spans.
+
+    Intervals with a transcript ID, start offset, or end offset of None are omitted.
+
+    Returns a list of spans, each being a tuple: (transcriptId, startOffset, endOffset,
+    indices), where indices lists the positions of the intervals the span covers. Spans
+    are ordered by the position of their first interval. """
+    intervals = {} # transcriptId -> list of interval indices
+    for i in range(len(transcriptIds)):
+        if transcriptIds[i] == None or startOffsets[i] == None or endOffsets[i] == None:
+            continue
+        intervals.setdefault(transcriptIds[i], []).append(i)
+
+    spans = []
+    for transcriptId, indices in intervals.items():
+        span = None
+        for i in sorted(indices, key=lambda i: (float(startOffsets[i]), float(endOffsets[i]))):
+            start = float(startOffsets[i])
+            end = float(endOffsets[i])
+            if span != None and start <= span[2] + gap:
+                span[2] = max(span[2], end)
+                span[3].append(i)
+            else:
+                span = [ transcriptId, start, end, [ i ] ]
+                spans.append(span)
+    spans.sort(key=lambda span: min(span[3]))
+    return([ (transcriptId, start, end, sorted(indices))
+             for transcriptId, start, end, indices in spans ])
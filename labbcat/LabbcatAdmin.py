@@ -975,6 +975,7 @@ class LabbcatAdmin(LabbcatEdit):
                 if self.verbose: print("Finished.")
         finally:
             f.close()
+            self._dictionaryChanged() # lexicon dictionaries could be from any manager
     
 
     def deleteLexicon(self, lexicon):
@@ -993,6 +994,7 @@ class LabbcatAdmin(LabbcatEdit):
         resp = self._getRequestRaw(
             self._labbcatUrl(
                 "edit/annotator/ext/FlatLexiconTagger/deleteLexicon?"+lexicon), {})
+        self._dictionaryChanged() # lexicon dictionaries could be from any manager
         if resp.status_code != 200:
             raise ResponseException("Error: " + str(resp.status_code) + ": " + resp.text)
         else:
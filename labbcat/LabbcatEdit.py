@@ -1,5 +1,7 @@
+import hashlib
 import os
 from labbcat.LabbcatView import LabbcatView
+from labbcat.Manifest import Manifest
 from labbcat.ResponseException import ResponseException
 
 class LabbcatEdit(LabbcatView):
@@ -26,13 +28,32 @@ class LabbcatEdit(LabbcatView):
     def _storeEditUrl(self, resource):
         return self.labbcatUrl + "api/edit/store/" + resource
 
+    def _participantsChanged(self, ids):
+        """ Removes cached information about the given participants from attributeCache. """
+        ids = set(ids)
+        self._invalidateAttributes(
+            lambda key: key[0] in ("participant", "participantAttributes")
+            and key[1] in ids)
+    
+    def _transcriptsChanged(self, ids):
+        """ Removes cached information about the given transcripts from attributeCache. As
+        uploading a transcript can add participants or change their attributes, cached
+        participant information is removed too. """
+        ids = set(ids)
+        self._invalidateAttributes(
+            lambda key: key[0] in ("participant", "participantAttributes")
+            or (key[0] == "transcriptAttributes" and key[1] in ids))
+
     def deleteTranscript(self, id):
         """ Deletes the given transcript, and all associated files.
         
         :param id: The ID transcript to delete.
         :type id: str
         """
-        return(self._postRequest(self._storeEditUrl("deleteTranscript"), {"id":id}))
+        try:
+            return(self._postRequest(self._storeEditUrl("deleteTranscript"), {"id":id}))
+        finally:
+            self._transcriptsChanged([id])
 
     def transcriptUpload(self, transcript, media, merge, trackSuffix=None):
         """ Upload a transcript file and associated media files, as the first stage in adding or
@@ -139,7 +160,11 @@ class LabbcatEdit(LabbcatView):
         
         :rtype: dict
         """
-        return(self._putRequest(self._labbcatUrl("api/edit/transcript/upload/"+id), parameters))
+        response = self._putRequest(
+            self._labbcatUrl("api/edit/transcript/upload/"+id), parameters)
+        if response != None:
+            self._transcriptsChanged(response.get("transcripts") or [])
+        return(response)
         
     def transcriptUploadDelete(self, id):
         """ Cancel a transcript upload started by a previous call to        
@@ -180,17 +205,10 @@ class LabbcatEdit(LabbcatView):
         """
         try:
             response = self.transcriptUpload(transcript, media, False, trackSuffix)
-            id = response["id"]
-            parameters = response["parameters"]
-            
-            # set parameters with default values
-            parameterValues = {}
-            for parameter in parameters:
-                parameterValues[parameter["name"]] = parameter["value"]
-            response = self.transcriptUploadParameters(id, parameterValues)
-            return(response["transcripts"])
-        
         except ResponseException as x:
+            if x.response == None \
+               or (x.response.code != 404 and x.response.httpStatus != 404):
+                raise x
             # fall back to old API
             params = {
                 "todo" : "new",
@@ -205,13 +223,14 @@ class LabbcatEdit(LabbcatView):
             files["uploadfile1_0"] = (transcriptName, f)
         
             if media != None:
-                if mediaSuffix == None: mediaSuffix = ""
+                if trackSuffix == None: trackSuffix = ""
                 mediaName = os.path.basename(media)
-                files["uploadmedia"+mediaSuffix+"1"] = (mediaName, open(media, 'rb'))
+                files["uploadmedia"+trackSuffix+"1"] = (mediaName, open(media, 'rb'))
             
             try:
                 model = self._postMultipartRequest(
                     self._labbcatUrl("edit/transcript/new"), params, files)
+                self._transcriptsChanged([transcriptName])
                 if not "result" in model:
                     raise ResponseException("Malformed response model, no result: " + str(model))
                 else:
@@ -219,6 +238,31 @@ class LabbcatEdit(LabbcatView):
             finally:
                 f.close()
         
+        id = response["id"]
+        try:
+            parameters = response["parameters"]
+            
+            # set parameters with default values, except those we've been given
+            given = {
+                "labbcat_transcript_type" : transcriptType,
+                "labbcat_corpus" : corpus,
+                "labbcat_episode" : episode }
+            parameterValues = {}
+            for parameter in parameters:
+                if given.get(parameter["name"]) != None:
+                    parameterValues[parameter["name"]] = given[parameter["name"]]
+                else:
+                    parameterValues[parameter["name"]] = parameter["value"]
+            response = self.transcriptUploadParameters(id, parameterValues)
+            return(response["transcripts"])
+        except Exception:
+            # don't leave the uploaded files pending on the server
+            try:
+                self.transcriptUploadDelete(id)
+            except Exception as x:
+                if self.verbose: print("Could not delete upload " + str(id) + ": " + str(x))
+            raise
+        
     def updateTranscript(self, transcript, suppressGeneration=False):
         """ Uploads a new version of an existing transcript.
         
@@ -265,6 +309,7 @@ class LabbcatEdit(LabbcatView):
             try:
                 model = self._postMultipartRequest(
                     self._labbcatUrl("edit/transcript/new"), params, files)
+                self._transcriptsChanged([transcriptName])
                 if not "result" in model:
                     raise ResponseException("Malformed response model, no result: " + str(model))
                 else:
@@ -272,6 +317,195 @@ class LabbcatEdit(LabbcatView):
             finally:
                 f.close()
     
+    def uploadTranscripts(self, transcripts, transcriptType, corpus, episode=None, mediaExtensions=(".wav", ".mp4", ".mp3"), manifest=None, replace=True, waitForTasks=False, maxWorkers=4, retries=2, full=False, progress=None):
+        """ Uploads many new transcripts, incrementally.
+        
+        This is like calling `newTranscript() <#labbcat.LabbcatEdit.newTranscript>`_ for
+        each transcript, except that:
+        
+        - up to *maxWorkers* transcripts are uploaded at once,
+        - uploads that fail with a transient error (e.g. a dropped connection) are retried,
+        - each uploaded transcript is recorded in a `Manifest <#labbcat.Manifest>`_, along
+          with the SHA-256 hash of the transcript file, and the size and modification time
+          of its media, so that an interrupted upload can be resumed where it left off, and
+        - transcripts already in the manifest whose files haven't changed since they were
+          uploaded are skipped, so the same directory can be uploaded again after changes
+          (e.g. corrections to some transcripts) and only the changed transcripts are
+          uploaded.
+        
+        Errors uploading one transcript don't stop the others from being uploaded; they
+        are returned, and the transcript is tried again the next time.
+        
+        Example::
+        
+            import glob
+            
+            result = corpus.uploadTranscripts(
+                glob.glob("transcripts/*.eaf"), "interview", "QB", maxWorkers=8)
+            for fileName, error in result["errors"].items():
+                print(fileName + ": " + str(error))
+        
+        :param transcripts: The paths of the transcript files to upload.
+        :type transcripts: list of str
+        
+        :param transcriptType: The transcript type.
+        :type transcriptType: str
+        
+        :param corpus: The corpus for the transcripts.
+        :type corpus: str
+        
+        :param episode: The episode the transcripts belong to, or None for the default.
+        :type episode: str
+        
+        :param mediaExtensions: The media file extensions to look for. Each transcript is
+         uploaded with the first media file found in the same directory that has the same
+         name as the transcript and one of these extensions.
+        :type mediaExtensions: list of str
+        
+        :param manifest: The manifest recording uploaded transcripts, or the name of its
+         file. If None, a file called .manifest.jsonl in the directory containing the
+         transcripts is used.
+        :type manifest: Manifest or str
+        
+        :param replace: Whether to replace existing versions of the transcripts. If True,
+         a transcript that's already in the corpus is updated with
+         `updateTranscript() <#labbcat.LabbcatEdit.updateTranscript>`_ (and its media saved
+         with `saveMedia() <#labbcat.LabbcatEdit.saveMedia>`_ if it has changed), so the
+         existing version is kept if the upload fails. Updating can't change a transcript's
+         corpus, episode, or type, so if the existing version has a different one, the
+         transcript isn't updated, and an error is returned instead. If False, uploading a
+         transcript that already exists fails.
+        :type replace: boolean
+        
+        :param waitForTasks: Whether to wait for the server to finish processing each
+         transcript (e.g. generating annotation layers) before uploading the next one, so
+         that the server isn't processing more than *maxWorkers* transcripts at once.
+        :type waitForTasks: boolean
+        
+        :param maxWorkers: The maximum number of transcripts to upload at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry a transcript after a transient error.
+        :type retries: int
+        
+        :param full: Whether to upload transcripts even if they don't seem to have changed.
+        :type full: boolean
+        
+        :param progress: A function to call after each transcript is uploaded (or fails),
+         with the number uploaded so far and the number to upload.
+        :type progress: function
+        
+        :returns: A dictionary with the following entries:
+        
+         - "uploaded" : a dictionary of uploaded transcripts, keyed by file path, whose
+           values are the transcript IDs and task threadIds returned by
+           `newTranscript() <#labbcat.LabbcatEdit.newTranscript>`_ or
+           `updateTranscript() <#labbcat.LabbcatEdit.updateTranscript>`_,
+         - "skipped" : the paths of transcripts that weren't uploaded because they hadn't
+           changed, and 
+         - "errors" : a dictionary of errors, keyed by the path of the transcript that
+           couldn't be uploaded, which will be tried again next time. If a transcript was
+           uploaded, but waiting for its tasks failed, it's included in both "uploaded" and
+           "errors", and isn't uploaded again.
+        :rtype: dict
+        """
+        transcripts = list(transcripts)
+        result = { "uploaded" : {}, "skipped" : [], "errors" : {} }
+        if len(transcripts) == 0: return(result)
+        if not isinstance(manifest, Manifest):
+            if manifest == None:
+                manifest = os.path.join(os.path.commonpath(
+                    [ os.path.dirname(os.path.abspath(t)) for t in transcripts ]),
+                                        ".manifest.jsonl")
+            manifest = Manifest(manifest)
+        settings = { "transcriptType" : transcriptType, "corpus" : corpus, "episode" : episode }
+        
+        toUpload = []
+        signatures = {}
+        for transcript in transcripts:
+            try:
+                media = self._transcriptMedia(transcript, mediaExtensions)
+                with open(transcript, "rb") as f:
+                    signature = {
+                        "transcript" : hashlib.sha256(f.read()).hexdigest(),
+                        "media" : None if media == None else [
+                            os.path.basename(media), os.path.getsize(media),
+                            os.path.getmtime(media) ] }
+            except OSError as x:
+                result["errors"][transcript] = x
+                continue
+            entry = manifest.get(os.path.basename(transcript))
+            if not full and entry != None and entry.get("signature") == signature \
+               and entry.get("settings") == settings:
+                result["skipped"].append(transcript)
+            else:
+                signatures[transcript] = signature
+                toUpload.append((transcript, media, entry))
+        
+        uploaded = {} # transcript -> tasks, so that a retry only waits for the tasks
+        def upload(transcriptMediaAndEntry):
+            transcript, media, entry = transcriptMediaAndEntry
+            id = os.path.basename(transcript)
+            tasks = uploaded.get(transcript)
+            if tasks == None:
+                if replace and self.countMatchingTranscriptIds(
+                        "id == '" + id.replace("'","\\'") + "'") > 0:
+                    if entry == None or entry.get("settings") != settings:
+                        self._checkTranscriptSettings(id, transcriptType, corpus, episode)
+                    # update the existing version in place, so that if the upload fails,
+                    # the existing version is still there
+                    tasks = self.updateTranscript(transcript)
+                    # media is only uploaded to an existing transcript if it has changed
+                    if media != None and (entry == None or (entry.get("signature") or {})
+                                          .get("media") != signatures[transcript]["media"]):
+                        self.saveMedia(id, media, "")
+                else:
+                    tasks = self.newTranscript(
+                        transcript, media, None, transcriptType, corpus, episode)
+                # recorded before waiting, so that it's not uploaded again if waiting fails
+                manifest.put(id, {
+                    "signature" : signatures[transcript], "settings" : settings,
+                    "tasks" : tasks })
+                uploaded[transcript] = tasks
+            if waitForTasks:
+                for threadId in tasks.values():
+                    self.waitForTask(threadId)
+                    self.releaseTask(threadId)
+            return(tasks)
+        
+        done = 0
+        for index, tasks, exception in self._mapConcurrently(
+                upload, toUpload, maxWorkers, False, retries):
+            transcript = toUpload[index][0]
+            if transcript in uploaded:
+                result["uploaded"][transcript] = uploaded[transcript]
+            if exception != None:
+                result["errors"][transcript] = exception
+            done = done + 1
+            if progress != None: progress(done, len(toUpload))
+        return(result)
+    
+    def _checkTranscriptSettings(self, id, transcriptType, corpus, episode):
+        """ Raises a ResponseException if the given existing transcript's type, corpus, or
+        episode (if not None) is different from the given one, as updating the transcript
+        wouldn't change them. """
+        columns = self._getTranscriptAttributes(
+            [id], ["transcript_type", "corpus", "episode"], asColumns=True, useCache=False)
+        for layerId, value in (("transcript_type", transcriptType), ("corpus", corpus),
+                               ("episode", episode)):
+            existing = columns.get(layerId) or [ None ]
+            if value != None and str(existing[0]) != str(value):
+                raise ResponseException(
+                    id + " already exists with " + layerId + " " + str(existing[0])
+                    + ", which can't be changed to " + str(value) + " by updating it")
+    
+    def _transcriptMedia(self, transcript, mediaExtensions):
+        """ Finds the media file for the given transcript file, or None if there is none. """
+        base = os.path.splitext(transcript)[0]
+        for extension in mediaExtensions or []:
+            if os.path.isfile(base + extension): return(base + extension)
+        return(None)
+    
     def updateFragment(self, fragment):
         """ Update a transcript fragment.
 
@@ -396,7 +630,10 @@ class LabbcatEdit(LabbcatView):
         """
         attributes['id'] = id
         attributes['label'] = label
-        return(self._postRequest(self._storeEditUrl("saveParticipant"), attributes))
+        try:
+            return(self._postRequest(self._storeEditUrl("saveParticipant"), attributes))
+        finally:
+            self._participantsChanged([id, label])
     
     def deleteParticipant(self, id):
         """ Deletes the given participant, and all associated meta-data.
@@ -404,7 +641,10 @@ class LabbcatEdit(LabbcatView):
         :param id: The ID participant to delete.
         :type id: str
         """
-        return(self._postRequest(self._storeEditUrl("deleteParticipant"), {"id":id}))
+        try:
+            return(self._postRequest(self._storeEditUrl("deleteParticipant"), {"id":id}))
+        finally:
+            self._participantsChanged([id])
     
     def generateLayerUtterances(self, matchIds, layerId, collectionName=None):
         """ Generates a layer for a given set of utterances.
@@ -508,6 +748,8 @@ class LabbcatEdit(LabbcatView):
             return(None)
         except ResponseException as x:
             return(x.message)
+        finally:
+            self._dictionaryChanged(key=key)
 
     def removeLayerDictionaryEntry(self, layerId, key, entry=None):
         """ Removes an entry from a layer dictionary.
@@ -533,6 +775,8 @@ class LabbcatEdit(LabbcatView):
             return(None)
         except ResponseException as x:
             return(x.message)
+        finally:
+            self._dictionaryChanged(key=key)
 
     def addDictionaryEntry(self, managerId, dictionaryId, key, entry):
         """ Adds an entry to a dictionary.
@@ -566,6 +810,8 @@ class LabbcatEdit(LabbcatView):
             return(None)
         except ResponseException as x:
             return(x.message)
+        finally:
+            self._dictionaryChanged(managerId, dictionaryId, key)
 
     def removeDictionaryEntry(self, managerId, dictionaryId, key, entry=None):
         """ Removes an entry from a dictionary.
@@ -599,6 +845,8 @@ class LabbcatEdit(LabbcatView):
             return(None)
         except ResponseException as x:
             return(x.message)
+        finally:
+            self._dictionaryChanged(managerId, dictionaryId, key)
     
     def annotatorExt(self, annotatorId, resource, parameters=None):
         """ Retrieve annotator's "ext" resource.
@@ -1,15 +1,32 @@
 import csv
+import codecs
+import copy
+import hashlib
+import io
 import json
+import mimetypes
 import os
 import re
 import requests
+import shutil
 import tempfile
+import threading
 import time
-from zipfile import ZipFile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from labbcat import AGQL
+from labbcat import Attributes
+from labbcat import Audio
+from labbcat import Intervals
+from labbcat import ZipStream
+from labbcat.Manifest import Manifest
 from labbcat.Response import Response
 from labbcat.ResponseException import ResponseException
 from labbcat import __version__
 
+# number formats for typed columns - numbers with leading zeros (e.g. "007") are strings
+_INTEGER = re.compile(r"-?(0|[1-9][0-9]*)")
+_NUMBER = re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]*)?([eE][-+]?[0-9]+)?|-?\.[0-9]+")
+
 class LabbcatView:
     """ API for querying a `LaBB--CAT <https://labbcat.canterbury.ac.nz/>`_ annotation graph
     store; a database of linguistic transcripts represented using 
@@ -31,6 +48,13 @@ class LabbcatView:
     
     Attributes:
         language: The language code for server message localization, e.g. "es-AR"
+        mediaCache: An optional MediaCache for getMedia to keep downloaded media in, 
+        or None (the default) to download media every time.
+        attributeCache: An optional Cache for getParticipant, getParticipantAttributes and
+        getTranscriptAttributes (given a list of IDs) to keep results in, or None (the
+        default) to get them from the server every time.
+        dictionaryCache: An optional Cache for getDictionaryEntries to keep entries in, or
+        None (the default) to look up entries on the server every time.
     
     Example:: 
         
@@ -68,7 +92,14 @@ class LabbcatView:
         self.verbose = False
         self.language = "en"
         self.labbcatVersion = None
+        self.mediaCache = None
+        self.attributeCache = None
+        self._attributeGeneration = 0 # incremented whenever attributeCache is invalidated
+        self._attributeLock = threading.Lock()
+        self.dictionaryCache = None
+        self._dictionaryListeners = [] # functions to call when dictionaries change
         self.session = requests.Session() # Session manages cookies for us
+        self._poolSize = requests.adapters.DEFAULT_POOLSIZE
 
         # probe the server to determine the version and auth method
         response = Response(
@@ -203,7 +234,26 @@ class LabbcatView:
         # ensure status was ok
         response.raise_for_status();
         
-        # figure out the content type
+        if fileName == None:
+            if dir == None:
+                # save to temporary file
+                fd, fileName = tempfile.mkstemp(
+                    self._responseExtension(response), "labbcat-py-")
+                if self.verbose: print("file: " + fileName)
+                with open(fileName, "wb") as file:
+                    file.write(response.content)
+                    os.close(fd)
+            else:
+                # save into the given directory...
+                fileName = self._responseFileName(response, url, dir)
+        if self.verbose: print("file: " + fileName)
+        with open(fileName, "wb") as file:
+            file.write(response.content)
+            
+        return(fileName)
+         
+    def _responseExtension(self, response):
+        """ Determines a file name extension for the content type of the given response. """
         contentType = response.headers['Content-Type'];
         if self.verbose: print("Content-Type: " + contentType)
         extension = ".bin"
@@ -216,47 +266,389 @@ class LabbcatView:
         elif contentType.startswith("audio/x-wav"): extension = ".wav"
         elif contentType.startswith("audio/mpeg"): extension = ".mp3"
         elif contentType.startswith("video/mpeg"): extension = ".mp4"
-
+        return(extension)
+    
+    def _responseFileName(self, response, url, dir):
+        """ Determines the name of a file in *dir* to save the given response to, using the
+        name given by the server, if any. """
+        fileName = None
+        contentDisposition = None
+        if "content-disposition" in response.headers:
+            contentDisposition = response.headers["content-disposition"];
+            if self.verbose: print("contentDisposition: " + contentDisposition)
+            if contentDisposition != None:                
+                # something like attachment; filename=blah.wav
+                equals = contentDisposition.find("=")
+                if equals >= 0:
+                    fileName = contentDisposition[equals + 1:]
+                    if self.verbose: print("fileName: " + fileName)
+                    if fileName == "":
+                        fileName = None
+                    else:
+                        fileName = os.path.join(dir, fileName)
         if fileName == None:
-            if dir == None:
-                # save to temporary file
-                fd, fileName = tempfile.mkstemp(extension, "labbcat-py-")
-                if self.verbose: print("file: " + fileName)
-                with open(fileName, "wb") as file:
-                    file.write(response.content)
-                    os.close(fd)
+            extension = self._responseExtension(response)
+            lastSlash = url.rfind('/')
+            if lastSlash >= 0:
+                fileName = url[lastSlash + 1:]
+                if not fileName.endswith(extension): fileName = fileName + extension
+                fileName = os.path.join(dir, fileName)
             else:
-                # save into the given directory...
-                # use the name given by the server, if any
-                contentDisposition = None
-                if "content-disposition" in response.headers:
-                    contentDisposition = response.headers["content-disposition"];
-                    if self.verbose: print("contentDisposition: " + contentDisposition)
-                    if contentDisposition != None:                
-                        # something like attachment; filename=blah.wav
-                        equals = contentDisposition.find("=")
-                        if equals >= 0:
-                            fileName = contentDisposition[equals + 1:]
-                            if self.verbose: print("fileName: " + fileName)
-                            if fileName == "":
-                                fileName = None
-                            else:
-                                fileName = os.path.join(dir, fileName)
-                if fileName == None:
-                    lastSlash = url.rfind('/')
-                    if lastSlash >= 0:
-                        fileName = url[lastSlash + 1:]
-                        if not fileName.endswith(extension): fileName = fileName + extension
-                        fileName = os.path.join(dir, fileName)
-                    else:
-                        fd, fileName = tempfile.mkstemp(extension, "labbcat-py-", dir)
-                        os.close(fd)
-        if self.verbose: print("file: " + fileName)
-        with open(fileName, "wb") as file:
-            file.write(response.content)
-            
+                fd, fileName = tempfile.mkstemp(extension, "labbcat-py-", dir)
+                os.close(fd)
         return(fileName)
          
+    def _getRequestToFile(self, url, fileName, headers={}, retries=3):
+        """ Streams the content of a GET request into the given file, so that large files
+        are not held in memory. The file is only written if the response status is 200.
+        Returns the response.
+
+        Content is first written to a .part file (see _partFiles). If the connection
+        drops, the download is retried up to *retries* times, resuming from where it
+        stopped with a Range request if the server supports it. A .part file left by an
+        earlier interrupted download of the same URL is resumed in the same way. Resuming
+        is only attempted if the server identified the content with a strong ETag or
+        Last-Modified header, which is sent as If-Range, so that a file that has changed on
+        the server is downloaded again from the start, rather than spliced. """
+        if self.verbose: print("_getRequestToFile " + url + " -> " + fileName)
+        if self.username == None:
+            auth = None
+        else:
+            auth = (self.username, self.password)
+        partFile, stateFile = self._partFiles(url, fileName)
+        
+        attempt = 0
+        while True:
+            requestHeaders = dict(headers, **{
+                "Accept-Language":self.language,
+                "user-agent": "labbcat-py/"+__version__
+            })
+            resumeFrom = 0
+            state = None
+            if os.path.exists(partFile) and os.path.exists(stateFile):
+                with open(stateFile, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("url") != url: # not the same content, so start again
+                    if self.verbose: print("not resuming download of " + str(state.get("url")))
+                    os.remove(partFile)
+                    os.remove(stateFile)
+                    state = None
+            if state != None:
+                validator = state["validator"]
+                resumeFrom = os.path.getsize(partFile)
+                requestHeaders["Range"] = "bytes=" + str(resumeFrom) + "-"
+                requestHeaders["If-Range"] = validator
+                if self.verbose: print("resuming from byte " + str(resumeFrom))
+            try:
+                with self.session.get(
+                        url=url, auth=auth, stream=True, headers=requestHeaders) as response:
+                    if response.status_code == 416: # Range Not Satisfiable
+                        # the .part file might have been complete
+                        contentRange = response.headers.get("Content-Range", "")
+                        if contentRange == "bytes */" + str(resumeFrom):
+                            os.replace(partFile, fileName)
+                            os.remove(stateFile)
+                            return(response)
+                        # otherwise start again
+                        os.remove(partFile)
+                        os.remove(stateFile)
+                        continue
+                    # ensure status was ok
+                    response.raise_for_status();
+                    if response.status_code == 206: # the rest of the file
+                        if not response.headers.get("Content-Range", "").startswith(
+                                "bytes " + str(resumeFrom) + "-"):
+                            # not the range we asked for, so start again
+                            os.remove(partFile)
+                            os.remove(stateFile)
+                            continue
+                        mode = "ab"
+                    elif response.status_code == 200: # the whole file
+                        mode = "wb"
+                        # record how to resume the download, if possible
+                        validator = response.headers.get("ETag")
+                        if validator == None or validator.startswith("W/"):
+                            # only strong ETags can be used for If-Range
+                            validator = response.headers.get("Last-Modified")
+                        if validator != None:
+                            with open(stateFile, "w", encoding="utf-8") as f:
+                                json.dump({ "validator" : validator, "url" : url }, f)
+                        elif os.path.exists(stateFile):
+                            os.remove(stateFile)
+                    else: # e.g. 304 Not Modified
+                        return(response)
+                    with open(partFile, mode) as file:
+                        for chunk in response.iter_content(64*1024):
+                            file.write(chunk)
+                os.replace(partFile, fileName)
+                if os.path.exists(stateFile): os.remove(stateFile)
+                return(response)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError) as x:
+                attempt = attempt + 1
+                if attempt > retries: raise
+                if self.verbose: print("_getRequestToFile retrying after: " + str(x))
+                if not os.path.exists(stateFile) and os.path.exists(partFile):
+                    # can't resume, so start again
+                    os.remove(partFile)
+         
+    def _partFiles(self, url, fileName):
+        """ Returns the names of the files used by _getRequestToFile for a partial download
+        of *url* into *fileName*: (partFile, stateFile), where stateFile records the URL
+        and If-Range validator of partFile. The names include a hash of the whole URL, so
+        that downloads of different content (e.g. different fragments of the same media)
+        into the same file name don't share a partial download. """
+        urlHash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        partFile = fileName + "." + urlHash + ".part"
+        return((partFile, partFile + ".json"))
+    
+    def _postRequestEntries(self, url, params):
+        """ Streams the response of a POST request, yielding (name, bytes) tuples. If the
+        response is a zip file, it's extracted as it's received, with one tuple per file in
+        it. Otherwise, there's one tuple for the whole response. """
+        if self.verbose: print("_postRequestEntries " + url + " : " + str(params))
+        if self.username == None:
+            auth = None
+        else:
+            auth = (self.username, self.password)
+        
+        with self.session.post(
+                url=url, data=params, auth=auth, stream=True, headers={
+                    "Accept":"application/json",
+                    "Accept-Language":self.language,
+                    "user-agent": "labbcat-py/"+__version__
+                }) as response:
+            # ensure status was ok
+            response.raise_for_status();
+            name = os.path.basename(self._responseFileName(response, url, ""))
+            if name.endswith(".zip") \
+               or response.headers.get("Content-Type", "").startswith("application/zip"):
+                response.raw.decode_content = True # in case of Content-Encoding
+                for entry in ZipStream._zipEntries(response.raw):
+                    yield(entry)
+            else:
+                yield((name, response.content))
+         
+    def _postRequestToFiles(self, url, params, dir):
+        """ Like _postRequestToFile, but if the response is a zip file, the files in it are
+        extracted into *dir* as it's received, instead of saving the zip file itself. 
+        Returns a list of file names. """
+        fileNames = []
+        for name, content in self._postRequestEntries(url, params):
+            fileName = ZipStream._safePath(dir, name)
+            os.makedirs(os.path.dirname(fileName), exist_ok=True)
+            with open(fileName + ".part", "wb") as file:
+                file.write(content)
+            os.replace(fileName + ".part", fileName)
+            fileNames.append(fileName)
+        return(fileNames)
+         
+    def _postRequestToBytes(self, url, params):
+        """ Like _postRequestToFile, but returns the content of the response in memory. """
+        if self.verbose: print("_postRequestToBytes " + url + " : " + str(params))
+        if self.username == None:
+            auth = None
+        else:
+            auth = (self.username, self.password)
+        
+        response = self.session.post(
+            url=url, data=params, auth=auth, headers={
+                "Accept":"application/json",
+                    "Accept-Language":self.language,
+                    "user-agent": "labbcat-py/"+__version__
+                })
+        # ensure status was ok
+        response.raise_for_status();
+        if self.verbose: print("Content-Type: " + response.headers['Content-Type'])
+        return(response.content)
+         
+    def _postRequestToColumns(self, url, params):
+        """ Like _postRequestToFile, but parses the CSV response as it's received, instead
+        of saving it. Returns a dictionary of column values, keyed by column name (see
+        _typedColumn). """
+        header, rows = self._postRequestToRows(url, params)
+        return(self._columnsFromRows(header, rows))
+    
+    def _postRequestToRows(self, url, params):
+        """ Like _postRequestToFile, but parses the CSV response as it's received, instead
+        of saving it. Returns a tuple: (header, rows), where header is a list of column
+        names, and rows is a list of lists of values. """
+        if self.verbose: print("_postRequestToRows " + url + " : " + str(params))
+        if self.username == None:
+            auth = None
+        else:
+            auth = (self.username, self.password)
+        
+        with self.session.post(
+                url=url, data=params, auth=auth, stream=True, headers={
+                    "Accept":"application/json",
+                    "Accept-Language":self.language,
+                    "user-agent": "labbcat-py/"+__version__
+                }) as response:
+            # ensure status was ok
+            response.raise_for_status();
+            reader = csv.reader(self._responseLines(response))
+            header = next(reader, [])
+            rows = [ row for row in reader if len(row) > 0 ]
+        return((header, rows))
+    
+    def _columnsFromRows(self, header, rows):
+        """ Converts CSV rows to a dictionary of typed columns, keyed by column name. """
+        columns = [ [] for name in header ]
+        for row in rows:
+            for c in range(len(header)):
+                columns[c].append(row[c] if c < len(row) else "")
+        result = {}
+        for c in range(len(header)):
+            name = header[c]
+            n = 1
+            while name in result: # repeated column names are made unique
+                n = n + 1
+                name = header[c] + "." + str(n)
+            # the first column is IDs, which are always strings
+            result[name] = columns[c] if c == 0 else self._typedColumn(columns[c])
+        return(result)
+    
+    def _responseLines(self, response):
+        """ Yields the lines of a streamed text response as they're received, including
+        their line endings, so that csv can parse values that span lines. """
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+        pending = ""
+        for chunk in response.iter_content(65536):
+            pending = pending + decoder.decode(chunk)
+            end = pending.rfind("\n")
+            if end >= 0:
+                for line in pending[:end].split("\n"):
+                    yield(line + "\n")
+                pending = pending[end+1:]
+        pending = pending + decoder.decode(b"", True)
+        if pending != "": yield(pending)
+    
+    def _chunkedRows(self, getRows, ids, chunkSize, maxWorkers):
+        """ Gets CSV rows for a long list of IDs in chunks of *chunkSize* IDs, with up to
+        *maxWorkers* requests at once, where getRows(ids) returns (header, rows) for a chunk.
+        Returns the rows merged in ID order (see _mergeRows). """
+        if chunkSize == None: chunkSize = max(len(ids), 1)
+        chunks = [ ids[i:i+chunkSize] for i in range(0, len(ids), chunkSize) ]
+        parts = []
+        for index, part, exception in self._mapConcurrently(
+                getRows, chunks, maxWorkers, True, 2):
+            if exception != None: raise exception
+            parts.append(part)
+        return(self._mergeRows(parts))
+    
+    def _cachedRows(self, kind, ids, layerIds, getRows):
+        """ Gets the attribute rows for the given IDs from attributeCache, using
+        getRows(ids) to get (header, rows) for IDs that aren't cached, and caching the
+        results, keyed by (kind, id, layerIds). Returns the rows merged in ID order (see
+        _mergeRows). """
+        cache = self.attributeCache
+        generation = self._attributeGeneration
+        layerKey = tuple(layerIds)
+        entries = {} # id -> (header, rows)
+        missing = []
+        for id in ids:
+            entry = cache.get((kind, id, layerKey))
+            if entry == None:
+                if id not in entries: missing.append(id)
+                entries[id] = None
+            else:
+                entries[id] = entry
+        unmatched = [] # rows that can't be attributed to a requested ID
+        if len(missing) > 0:
+            header, rows = getRows(missing)
+            found = {}
+            for row in rows:
+                if len(row) > 0 and row[0] in entries and row[0] not in found:
+                    found[row[0]] = row
+                else:
+                    unmatched.append((header, [row]))
+            for id in missing:
+                # if the server identified participants/transcripts some other way (e.g.
+                # by database ID) we can't tell which IDs have no row, so they're not cached
+                if id in found or len(unmatched) == 0:
+                    entry = (header, [found[id]] if id in found else [])
+                    self._cacheAttributes((kind, id, layerKey), entry, generation)
+                    entries[id] = entry
+        parts = []
+        added = set()
+        for id in ids:
+            if entries[id] != None and id not in added:
+                parts.append(entries[id])
+                added.add(id)
+        return(self._mergeRows(parts + unmatched))
+    
+    def _cacheAttributes(self, key, value, generation):
+        """ Adds a value to attributeCache, unless the cache has been invalidated since
+        *generation* (the value of _attributeGeneration when the value was requested), in
+        which case the value may predate a change, and is discarded. """
+        with self._attributeLock:
+            if generation == self._attributeGeneration:
+                self.attributeCache.put(key, value)
+    
+    def _invalidateAttributes(self, predicate):
+        """ Removes entries whose key matches *predicate* from attributeCache, and
+        prevents values requested before now from being added to it. """
+        with self._attributeLock:
+            self._attributeGeneration = self._attributeGeneration + 1
+            if self.attributeCache != None:
+                self.attributeCache.invalidate(predicate)
+    
+    def _mergeRows(self, parts):
+        """ Merges a list of (header, rows) tuples into a single (header, rows) tuple. """
+        # parts may have different columns (e.g. if an attribute with several values has
+        # more values in one part than another), so columns are matched by name and by
+        # which occurrence of the name they are
+        keys = [] # (name, occurrence) of each merged column
+        positions = {} # (name, occurrence) -> merged column position
+        partPositions = [] # for each part, the merged position of each of its columns
+        for header, rows in parts:
+            occurrences = {}
+            partPosition = []
+            for name in header:
+                occurrences[name] = occurrences.get(name, 0) + 1
+                key = (name, occurrences[name])
+                if key not in positions:
+                    positions[key] = len(keys)
+                    keys.append(key)
+                partPosition.append(positions[key])
+            partPositions.append(partPosition)
+        header = [ name for name, occurrence in keys ]
+        rows = []
+        for (partHeader, partRows), partPosition in zip(parts, partPositions):
+            for partRow in partRows:
+                row = [ "" ] * len(header)
+                for c in range(min(len(partRow), len(partPosition))):
+                    row[partPosition[c]] = partRow[c]
+                rows.append(row)
+        return((header, rows))
+    
+    def _rowsResult(self, header, rows, asColumns, csvFileName=None):
+        """ Returns CSV rows as a dictionary of columns if *asColumns* is True, or otherwise
+        saves them to a CSV file (*csvFileName* or a temporary file), and returns its name. """
+        if asColumns:
+            return(self._columnsFromRows(header, rows))
+        if csvFileName == None:
+            fd, csvFileName = tempfile.mkstemp(".csv", "labbcat-py-")
+            os.close(fd)
+        with open(csvFileName, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return(csvFileName)
+    
+    def _typedColumn(self, values):
+        """ Converts a list of strings to a list of ints, if they're all integers (or
+        empty), or otherwise to floats if they're all numbers (or empty), with None for
+        empty values. Otherwise the strings are returned unchanged. """
+        nonEmpty = [ value for value in values if value != "" ]
+        if len(nonEmpty) == 0: return(values)
+        if all(_INTEGER.fullmatch(value) for value in nonEmpty):
+            return([ int(value) if value != "" else None for value in values ])
+        if all(_NUMBER.fullmatch(value) for value in nonEmpty):
+            return([ float(value) if value != "" else None for value in values ])
+        return(values)
+         
     def _postMultipartRequest(self, url, params, files):
         if self.verbose: print("_postMultipartRequest " + url + " : " + str(params) + " - " + str(files))
         if self.username == None:
@@ -302,6 +694,111 @@ class LabbcatView:
             fd.close()
         
         return(resp)
+
+    def _isTransient(self, exception):
+        """ Determines whether the given exception represents a failure that might not
+        happen again if the request is retried; e.g. a dropped connection or a server
+        that's temporarily overloaded. """
+        if isinstance(exception, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError)):
+            return(True)
+        status = 0
+        if isinstance(exception, requests.exceptions.HTTPError) \
+           and exception.response is not None:
+            status = exception.response.status_code
+        elif isinstance(exception, ResponseException) and exception.response != None:
+            status = exception.response.httpStatus
+        return(status == 429 or status >= 500)
+    
+    def _retrying(self, function, retries):
+        """ Wraps the given function so that if it fails with a transient error, it's
+        retried up to *retries* times, waiting a little longer each time. """
+        if retries == None or retries <= 0: return(function)
+        def retryingFunction(item):
+            attempt = 0
+            while True:
+                try:
+                    return(function(item))
+                except Exception as x:
+                    if attempt >= retries or not self._isTransient(x): raise
+                    if self.verbose: print("retrying after: " + str(x))
+                    time.sleep(0.5 * 2**attempt)
+                    attempt = attempt + 1
+        return(retryingFunction)
+    
+    def _mapConcurrently(self, function, items, maxWorkers=1, ordered=True, retries=0):
+        """ Applies the given function to each of the given items, using up to maxWorkers
+        threads, so that requests can be made concurrently.
+
+        Items are consumed lazily, and at most 2 x maxWorkers are in progress (or awaiting
+        their turn to be yielded) at any time, so items can be an arbitrarily long iterator.
+        If maxWorkers is 1 (or None), items are processed one at a time in the calling thread.
+        If the function fails with a transient error (see _isTransient), it's retried up
+        to *retries* times.
+        
+        Yields a tuple for each item: (index of the item, result, exception), where
+        exception is None if the function succeeded, or the exception it raised otherwise,
+        in which case result is None. If ordered is True, tuples are yielded in item order,
+        otherwise they're yielded in the order they finish.
+        """
+        function = self._retrying(function, retries)
+        if maxWorkers == None or maxWorkers <= 1:
+            for index, item in enumerate(items):
+                try:
+                    result = function(item)
+                except KeyboardInterrupt:
+                    raise
+                except Exception as x:
+                    yield (index, None, x)
+                else:
+                    yield (index, result, None)
+            return
+
+        # ensure there are enough pooled connections for all the threads
+        if maxWorkers > self._poolSize:
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=maxWorkers)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self._poolSize = maxWorkers
+        
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            running = {} # future -> item index
+            finished = {} # item index -> (result, exception), waiting to be yielded in order
+            nextIndex = 0 # the next item index to yield, if ordered
+            itemCount = 0
+            exhausted = False
+            try:
+                while True:
+                    # keep the workers busy, without getting too far ahead
+                    while not exhausted and len(running) + len(finished) < maxWorkers * 2:
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        running[executor.submit(function, item)] = itemCount
+                        itemCount = itemCount + 1
+                    if len(running) == 0: break
+                    
+                    done, notDone = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = running.pop(future)
+                        exception = future.exception()
+                        result = None if exception != None else future.result()
+                        if ordered:
+                            finished[index] = (result, exception)
+                        else:
+                            yield (index, result, exception)
+                    while nextIndex in finished:
+                        result, exception = finished.pop(nextIndex)
+                        yield (nextIndex, result, exception)
+                        nextIndex = nextIndex + 1
+            finally:
+                # if we've been interrupted, don't start anything else
+                for future in running:
+                    future.cancel()
          
     def versionInfo(self):
         """ Gets version information of all components of LaBB-CAT.
@@ -377,6 +874,20 @@ class LabbcatView:
             was not found. 
         :rtype: dictionary
         """
+        return(self._getParticipant(id))
+    
+    def _getParticipant(self, id, useCache=True):
+        """ Implements getParticipant. If *useCache* is False, attributeCache isn't used,
+        so that the participant is always up to date, e.g. for detecting changes. """
+        if useCache and self.attributeCache != None:
+            key = ("participant", id)
+            participant = self.attributeCache.get(key, self.attributeCache)
+            if participant is self.attributeCache: # not cached
+                generation = self._attributeGeneration
+                participant = self._getRequest(self._storeQueryUrl("getParticipant"), {"id":id})
+                self._cacheAttributes(key, participant, generation)
+            # a copy, so that callers can't change the cached participant
+            return(copy.deepcopy(participant))
         return(self._getRequest(self._storeQueryUrl("getParticipant"), {"id":id}))
         
     def countMatchingParticipantIds(self, expression):
@@ -462,6 +973,44 @@ class LabbcatView:
             {"expression":expression,
              "pageLength":pageLength, "pageNumber":pageNumber}))
         
+    def iterateMatchingParticipantIds(self, expression, pageLength=1000, maxWorkers=2, retries=2):
+        """ Iterates through the IDs of participants that match a particular pattern,
+        requesting them a page at a time.
+        
+        This is like `getMatchingParticipantIds() <#labbcat.LabbcatView.getMatchingParticipantIds>`_,
+        except that
+        `countMatchingParticipantIds() <#labbcat.LabbcatView.countMatchingParticipantIds>`_
+        is used to work out how many pages there are, and then up to *maxWorkers* pages are
+        requested at once, and IDs are yielded in order as they arrive, with only a few
+        pages held in memory at any time.
+        
+        Example:: 
+        
+            for participantId in corpus.iterateMatchingParticipantIds(
+                    labbcat.expressionFromCorpora("QB")):
+                print(participantId)
+        
+        :param expression: An expression that determines which participants match.
+        :type expression: str
+        
+        :param pageLength: The number of IDs to request at a time.
+        :type pageLength: int
+        
+        :param maxWorkers: The maximum number of pages to request at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry getting a page after a transient error.
+        :type retries: int
+
+        :returns: An iterator of participant IDs.
+        :rtype: iterator of str
+        """
+        count = self.countMatchingParticipantIds(expression)
+        return(self._iteratePages(
+            lambda pageNumber: self.getMatchingParticipantIds(
+                expression, pageLength, pageNumber),
+            count, pageLength, maxWorkers, retries))
+        
     def getTranscriptIds(self):
         """ Gets a list of transcript IDs.         
 
@@ -601,6 +1150,49 @@ class LabbcatView:
               "pageLength":pageLength, "pageNumber":pageNumber,
               "order":order}))
         
+    def iterateMatchingTranscriptIds(self, expression, order=None, pageLength=1000, maxWorkers=2, retries=2):
+        """ Iterates through the IDs of transcripts that match a particular pattern,
+        requesting them a page at a time.
+        
+        This is like `getMatchingTranscriptIds() <#labbcat.LabbcatView.getMatchingTranscriptIds>`_,
+        except that
+        `countMatchingTranscriptIds() <#labbcat.LabbcatView.countMatchingTranscriptIds>`_
+        is used to work out how many pages there are, and then up to *maxWorkers* pages are
+        requested at once, and IDs are yielded in order as they arrive, with only a few
+        pages held in memory at any time.
+        
+        Example:: 
+        
+            for transcriptId in corpus.iterateMatchingTranscriptIds(
+                    labbcat.expressionFromTranscriptTypes("interview")):
+                transcript = corpus.getTranscript(transcriptId, ["word"])
+        
+        :param expression: An expression that determines which transcripts match.        
+        :type expression: str
+        
+        :param order: The ordering for the list of IDs, a string containing a
+            comma-separated list of expressions, which may be appended by " ASC" or " DESC",
+            or null for transcript ID order.
+        :type order: str
+        
+        :param pageLength: The number of IDs to request at a time.
+        :type pageLength: int
+        
+        :param maxWorkers: The maximum number of pages to request at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry getting a page after a transient error.
+        :type retries: int
+
+        :returns: An iterator of transcript IDs.
+        :rtype: iterator of str
+        """
+        count = self.countMatchingTranscriptIds(expression)
+        return(self._iteratePages(
+            lambda pageNumber: self.getMatchingTranscriptIds(
+                expression, pageLength, pageNumber, order),
+            count, pageLength, maxWorkers, retries))
+        
     def countMatchingAnnotations(self, expression):
         """ Counts the number of annotations that match a particular pattern. 
         
@@ -656,6 +1248,60 @@ class LabbcatView:
             { "expression":expression,
               "pageLength":pageLength, "pageNumber":pageNumber }))
         
+    def iterateMatchingAnnotations(self, expression, pageLength=1000, maxWorkers=2, retries=2):
+        """ Iterates through the annotations that match a particular pattern, requesting
+        them a page at a time.
+        
+        This is like `getMatchingAnnotations() <#labbcat.LabbcatView.getMatchingAnnotations>`_,
+        except that
+        `countMatchingAnnotations() <#labbcat.LabbcatView.countMatchingAnnotations>`_
+        is used to work out how many pages there are, and then up to *maxWorkers* pages are
+        requested at once, and annotations are yielded in order as they arrive, with only a
+        few pages held in memory at any time, so even very large result sets can be
+        processed in constant memory.
+        
+        *NB* all expressions must match by either id or layer.id.
+        
+        Example:: 
+        
+            for annotation in corpus.iterateMatchingAnnotations(
+                    "layer.id == 'orthography' && label == 'the'"):
+                print(annotation["id"])
+        
+        :param expression: An expression that determines which annotations match.
+        :type expression: str
+        
+        :param pageLength: The number of annotations to request at a time.
+        :type pageLength: int
+        
+        :param maxWorkers: The maximum number of pages to request at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry getting a page after a transient error.
+        :type retries: int
+
+        :returns: An iterator of matching annotations.
+        :rtype: iterator of dictionaries
+        """
+        count = self.countMatchingAnnotations(expression)
+        return(self._iteratePages(
+            lambda pageNumber: self.getMatchingAnnotations(expression, pageLength, pageNumber),
+            count, pageLength, maxWorkers, retries))
+        
+    def _iteratePages(self, getPage, count, pageLength, maxWorkers=1, retries=0):
+        """ Yields the items on all pages of a paged query, in order, where *count* is the
+        total number of items, and getPage(pageNumber) returns the list of items on the
+        given zero-based page. Up to *maxWorkers* pages are requested at once, and at most
+        2 x maxWorkers pages are held in memory at any time. """
+        if pageLength == None or pageLength < 1:
+            raise ValueError("pageLength must be a positive number: " + str(pageLength))
+        pageCount = (count + pageLength - 1) // pageLength
+        for pageNumber, page, exception in self._mapConcurrently(
+                getPage, range(pageCount), maxWorkers, True, retries):
+            if exception != None: raise exception
+            for item in page:
+                yield(item)
+        
     def countAnnotations(self, id, layerId, maxOrdinal=None):
         """ Gets the number of annotations on the given layer of the given transcript. 
         
@@ -707,6 +1353,56 @@ class LabbcatView:
             { "id":id, "layerId":layerId, "maxOrdinal":maxOrdinal,
               "pageLength":pageLength, "pageNumber":pageNumber }))
 
+    def iterateAnnotations(self, id, layerId, maxOrdinal=None, pageLength=1000, maxWorkers=2, retries=2):
+        """ Iterates through the annotations on the given layer of the given transcript,
+        requesting them a page at a time.
+        
+        This is like `getAnnotations() <#labbcat.LabbcatView.getAnnotations>`_, except
+        that the annotations are not all requested at once. Instead,
+        `countAnnotations() <#labbcat.LabbcatView.countAnnotations>`_ is used to work out
+        how many pages there are, and then up to *maxWorkers* pages are requested at once,
+        so the next page is usually ready by the time the current one has been processed.
+        Only a few pages are held in memory at any time, so large layers (e.g. the
+        phones of a long recording) can be processed without all being in memory at once.
+        
+        Example::
+        
+            # word frequencies in a long transcript
+            frequencies = {}
+            for word in corpus.iterateAnnotations("AP511_MikeThorpe.eaf", "orthography"):
+                frequencies[word["label"]] = frequencies.get(word["label"], 0) + 1
+        
+        :param id: The ID of the transcript.
+        :type id: str
+        
+        :param layerId: The ID of the layer.
+        :type layerId: str
+        
+        :param maxOrdinal: The maximum ordinal for the returned annotations.
+           e.g. a maxOrdinal of 1 will ensure that only the first annotation for each
+           parent is returned. If maxOrdinal is None, then all annotations are
+           returned, regardless of their ordinal.
+        :type maxOrdinal: int or None
+        
+        :param pageLength: The number of annotations to request at a time.
+        :type pageLength: int
+        
+        :param maxWorkers: The maximum number of pages to request at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry getting a page after a transient error.
+        :type retries: int
+        
+        :returns: An iterator of annotations, in the same order getAnnotations returns
+         them.
+        :rtype: iterator of dictionaries
+        """
+        count = self.countAnnotations(id, layerId, maxOrdinal)
+        return(self._iteratePages(
+            lambda pageNumber: self.getAnnotations(
+                id, layerId, maxOrdinal, pageLength, pageNumber),
+            count, pageLength, maxWorkers, retries))
+
     def getMatchingAnnotationData(self, expression, dir=None):
         """ Gets binary data for annotations that match a particular pattern.
         
@@ -740,26 +1436,56 @@ class LabbcatView:
          deleted by the caller, or moved to a more permanent location. 
         :rtype: list of str
         """
-        tempFiles = False
         if dir == None:
-            dir = tempfile.mkdtemp("_"+str(threadId), "taskResults_")
-            tempFiles = True
+            dir = tempfile.mkdtemp("_data", "getMatchingAnnotationData_")
         elif not os.path.exists(dir):
             os.mkdir(dir)
-        fileName = self._postRequestToFile(
-            self._labbcatUrl("api/annotation/data"), { "expression":expression }, dir)
-        fileNames = [ fileName ]
-        if fileName.endswith(".zip"):
-            # extract the zip file
-            with ZipFile(fileName, 'r') as zipObj:
-                zipObj.extractall(dir)
-                fileNames = [os.path.join(dir, fileName) for fileName in zipObj.namelist()]
-                
-            # delete the temporary zip file
-            os.remove(fileName)
-        return fileNames
+        # any zip file is extracted as it's downloaded
+        return(self._postRequestToFiles(
+            self._labbcatUrl("api/annotation/data"), { "expression":expression }, dir))
+    
+    def getMatchingAnnotationDataEntries(self, expression):
+        """ Gets binary data for annotations that match a particular pattern, without
+        saving it to files.
+        
+        This is like 
+        `getMatchingAnnotationData() <#labbcat.LabbcatView.getMatchingAnnotationData>`_,
+        except that instead of saving files to disk, it's an iterator that yields the data
+        of each annotation as it's downloaded, which is useful for processing images etc.
+        in memory.
+        
+        The server doesn't send any metadata with each file apart from its name, so the
+        annotation ID is taken from that; this relies on the server naming each file after
+        the ID of its annotation, with an extension for the MIME type (e.g. 
+        ``ew_0_123.png``), as LaBB-CAT does. If the annotations' other attributes are
+        needed, they can be retrieved with 
+        `getMatchingAnnotations() <#labbcat.LabbcatView.getMatchingAnnotations>`_
+        using the same expression.
+        
+        Example::
+        
+            import io
+            from PIL import Image
+            
+            for annotationId, mimeType, data in corpus.getMatchingAnnotationDataEntries(
+                    "graph.id == 'AdaAicheson-01.trs' && layer.id == 'mediapipeFrame'"):
+                image = Image.open(io.BytesIO(data))
+        
+        :param expression: An expression that determines which annotations match.
+        :type expression: str
+        
+        :returns: An iterator of (annotationId, mimeType, data) tuples, where annotationId
+         is the name the server gives the annotation's file, less the extension (i.e. the
+         annotation's ID), mimeType is inferred from the file's extension, and data is bytes.
+        :rtype: iterator
+        """
+        for name, data in self._postRequestEntries(
+                self._labbcatUrl("api/annotation/data"), { "expression":expression }):
+            name = os.path.basename(name)
+            mimeType = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            yield((os.path.splitext(name)[0], mimeType, data))
     
-    def getFragmentAnnotationData(self, layerId, transcriptIds, startOffsets=None, endOffsets=None, dir=None):
+    def getFragmentAnnotationData(self, layerId, transcriptIds, startOffsets=None, endOffsets=None, dir=None, maxWorkers=1, batchSize=100, errors=None, mergeGap=None, perInterval=False):
         """ Gets binary annotation data in fragments.
         
         In some annotation layers, the annotations have not only a textual label, but also
@@ -777,6 +1503,35 @@ class LabbcatView:
             startOffsets and endOffsets are None, in which case the starts/ends are the 
             boundaries of the utterance that matched.
 
+        Intervals in the same transcript are retrieved together, up to *batchSize*
+        intervals per request, and *maxWorkers* requests can be made at once. If a request
+        for a batch of intervals fails, its intervals are requested one at a time, so that
+        errors can be attributed to specific intervals.
+
+        If intervals overlap (e.g. utterances with surrounding context), *mergeGap* can be
+        set to a number of seconds; intervals in the same transcript that overlap or are
+        separated by no more than that are merged into a single span, so that annotations
+        shared by several intervals are only downloaded once. *NB* a merged span also
+        includes annotations between its intervals, and annotations that straddle the
+        boundary of two of them.
+
+        By default, a single list of files is returned. If *perInterval* is True, a list
+        of lists is returned instead, with one list of files for each interval, in the
+        order of the intervals. A file that falls within several intervals is listed for
+        each of them (although it's downloaded only once), and an interval that was
+        skipped or failed has an empty list. Working out which interval each file belongs
+        to requires an extra request per batch for the annotations' offsets.
+
+        Example::
+
+            # get video frames for all matches, 4 transcripts at a time
+            errors = []
+            pngs = corpus.getFragmentAnnotationData(
+                "mediapipeFrame", matches, dir="frames", maxWorkers=4, errors=errors)
+            for match, error in zip(matches, errors):
+                if error != None:
+                    print(match["MatchId"] + ": " + str(error))
+
         :param layerId: The ID of the layer with a MIME type, from which annotation files will
                         be extractied.
         :type transcriptIds: str
@@ -797,26 +1552,38 @@ class LabbcatView:
          folder.  If specified, and the directory doesn't exist, it will be created. 
         :type dir: str
         
+        :param maxWorkers: The maximum number of requests to make at once.
+        :type maxWorkers: int
+        
+        :param batchSize: The maximum number of intervals to request at once.
+        :type batchSize: int
+        
+        :param errors: An optional list, which will be filled with one element per
+         interval; None if the interval's data was retrieved (or the interval was skipped
+         because it was incomplete), or the exception raised if it wasn't.
+        :type errors: list
+        
+        :param mergeGap: If not None, the maximum gap in seconds between intervals that are
+         merged into a single span.
+        :type mergeGap: float
+        
+        :param perInterval: Whether to return a list of files for each interval, rather
+         than a single list of files.
+        :type perInterval: bool
+        
         :returns: A list of files (e.g. PNG images). If *dir* is None, these files will be stored
          under the system's temporary directory, so once processing is finished, they should
          be deleted by the caller, or moved to a more permanent location. 
-        :rtype: list of str
+         Files are listed in the order of the intervals they were retrieved for, although
+         files for intervals retrieved in the same batch may be in any order.
+         If *perInterval* is True, a list with one list of files per interval is returned.
+        :rtype: list of str, or list of list of str
         """
-        # have they passed matches as transcriptIds, instead of strings?
-        if len(transcriptIds) > 0:
-            if isinstance(transcriptIds[0], dict) and startOffsets == None and endOffsets == None:
-                startOffsets = [ m["Line"] for m in transcriptIds ]
-                endOffsets = [ m["LineEnd"] for m in transcriptIds ]
-                transcriptIds = [ m["Transcript"] for m in transcriptIds ]
-        
-        # validate parameters
-        if len(transcriptIds) != len(startOffsets) or len(transcriptIds) != len(endOffsets):
-            raise ResponseException(
-                "transcriptIds ("+str(len(transcriptIds))
-                +"), startOffsets ("+str(len(startOffsets))
-                +"), and endOffsets ("+str(len(endOffsets))+") must be lists of equal size.");
+        transcriptIds, startOffsets, endOffsets, prefixes = self._fragmentIntervals(
+            transcriptIds, startOffsets, endOffsets)
+        if errors != None:
+            errors[:] = [ None ] * len(transcriptIds)
         
-        files = []        
         tempFiles = False
         if dir == None:
             dir = tempfile.mkdtemp("_data", "getFragmentAnnotationData_")
@@ -824,25 +1591,165 @@ class LabbcatView:
         elif not os.path.exists(dir):
             os.mkdir(dir)
 
-        # loop through each triple, getting fragments individually
-        for i in range(len(transcriptIds)):
-            if transcriptIds[i] == None or startOffsets[i] == None or endOffsets[i] == None:
-                continue
-            
-            expression = "layer.id == '"+layerId+"'"\
-                +" && graph.id == '"+transcriptIds[i]+"'"\
-                +" && start.offset >= "+str(startOffsets[i])\
-                +" && end.offset < "+str(endOffsets[i])
-            
-            try:
-                files = files + self.getMatchingAnnotationData(expression, dir)
-            except KeyboardInterrupt:
-                break
-            except:
-                pass
+        # the spans to get data for are either the intervals, or merged intervals
+        if mergeGap == None:
+            spans = [ (transcriptIds[i], startOffsets[i], endOffsets[i], [ i ])
+                      for i in range(len(transcriptIds))
+                      if transcriptIds[i] != None and startOffsets[i] != None
+                      and endOffsets[i] != None ]
+        else:
+            spans = Intervals._coalesce(transcriptIds, startOffsets, endOffsets, mergeGap)
+        
+        # group spans by transcript, in batches of up to batchSize
+        batches = []
+        currentBatch = {} # transcriptId -> the batch being filled
+        for span in spans:
+            batch = currentBatch.get(span[0])
+            if batch == None or len(batch) >= batchSize:
+                batch = []
+                currentBatch[span[0]] = batch
+                batches.append(batch)
+            batch.append(span)
+
+        def expression(batch):
+            expression = "layer.id == '"+layerId.replace("'","\\'")+"'"\
+                +" && graph.id == '"+batch[0][0].replace("'","\\'")+"'"
+            intervals = [ "start.offset >= "+str(start)+" && end.offset < "+str(end)
+                          for transcriptId, start, end, indices in batch ]
+            if len(intervals) == 1:
+                return(expression + " && " + intervals[0])
+            else:
+                return(expression + " && ((" + ") || (".join(intervals) + "))")
+        
+        def getSpans(spans):
+            # returns the files, and if perInterval is set, the files of each interval
+            if not perInterval:
+                return(self.getMatchingAnnotationData(expression(spans), dir), None)
+            elif len(spans) == 1 and len(spans[0][3]) == 1:
+                # all the files belong to the only interval
+                files = self.getMatchingAnnotationData(expression(spans), dir)
+                return(files, { spans[0][3][0] : files })
+            else:
+                return(self._getAnnotationDataByInterval(
+                    layerId, spans[0][0],
+                    [ (i, float(startOffsets[i]), float(endOffsets[i]))
+                      for span in spans for i in span[3] ],
+                    expression(spans), dir))
+        
+        batchingFailed = [ False ] # set if the server can't handle combined expressions
+        def getBatch(batch):
+            if len(batch) > 1 and not batchingFailed[0]:
+                try:
+                    files, byInterval = getSpans(batch)
+                    return(files, byInterval, [ None ] * len(batch))
+                except (ResponseException, requests.exceptions.RequestException,
+                        ValueError) as x:
+                    if self.verbose: print("getFragmentAnnotationData batch failed: " + str(x))
+                    if isinstance(x, requests.exceptions.HTTPError) \
+                       and x.response is not None and x.response.status_code == 400:
+                        # the server can't handle the combined expression
+                        batchingFailed[0] = True
+            # get data for each span individually
+            files = []
+            byInterval = {}
+            batchErrors = []
+            for span in batch:
+                try:
+                    spanFiles, spanByInterval = getSpans([span])
+                    files = files + spanFiles
+                    if spanByInterval != None: byInterval.update(spanByInterval)
+                    batchErrors.append(None)
+                except (ResponseException, requests.exceptions.RequestException,
+                        ValueError) as x:
+                    batchErrors.append(x)
+            return(files, byInterval, batchErrors)
         
+        files = []
+        intervalFiles = [ [] for i in range(len(transcriptIds)) ]
+        try:
+            for b, result, exception in self._mapConcurrently(getBatch, batches, maxWorkers):
+                if exception != None:
+                    batchFiles, byInterval, batchErrors = [], {}, [ exception ] * len(batches[b])
+                else:
+                    batchFiles, byInterval, batchErrors = result
+                files = files + batchFiles
+                if perInterval:
+                    for i, filesForInterval in byInterval.items():
+                        intervalFiles[i] = filesForInterval
+                for span, error in zip(batches[b], batchErrors):
+                    if error != None:
+                        for i in span[3]:
+                            if self.verbose:
+                                print("getFragmentAnnotationData " + str(i) + ": " + str(error))
+                            if errors != None:
+                                errors[i] = error
+        except KeyboardInterrupt:
+            pass
+        
+        if perInterval:
+            return(intervalFiles)
         return(files)
     
+    def _getAnnotationDataByInterval(self, layerId, transcriptId, intervals, expression, dir):
+        """ Gets binary annotation data for several intervals in the same transcript, working
+        out which intervals each file belongs to.
+        
+        The annotations that match *expression* are listed first, and their offsets used to
+        group them by the set of intervals that contain them. The data for each group is
+        then requested by annotation ID, so each file is downloaded once, and its intervals
+        are known without relying on how the server names files.
+        
+        :param layerId: The ID of the MIME-typed layer.
+        :type layerId: str
+        
+        :param transcriptId: The ID of the transcript the intervals are in.
+        :type transcriptId: str
+        
+        :param intervals: A list of (index, startOffset, endOffset) tuples.
+        :type intervals: list of tuple
+        
+        :param expression: An expression that matches all the annotations in the intervals.
+        :type expression: str
+        
+        :param dir: The directory in which the files should be stored.
+        :type dir: str
+        
+        :returns: A tuple: (files, byInterval), where files is a list of all the files, and
+         byInterval is a dictionary of lists of files, keyed by interval index.
+        :rtype: tuple
+        """
+        annotations = self.getMatchingAnnotations(expression)
+        byInterval = dict((i, []) for i, start, end in intervals)
+        if len(annotations) == 0:
+            return([], byInterval)
+        anchorIds = set()
+        for annotation in annotations:
+            anchorIds.add(annotation["startId"])
+            anchorIds.add(annotation["endId"])
+        offsets = dict((anchor["id"], anchor.get("offset"))
+                       for anchor in self.getAnchors(transcriptId, list(anchorIds)))
+        
+        # group annotation IDs by the intervals that contain them, as expression() does
+        groups = {} # tuple of interval indices -> list of annotation IDs
+        for annotation in annotations:
+            start = offsets.get(annotation["startId"])
+            end = offsets.get(annotation["endId"])
+            if start == None or end == None: continue
+            indices = tuple(i for i, intervalStart, intervalEnd in intervals
+                            if start >= intervalStart and end < intervalEnd)
+            if len(indices) > 0:
+                groups.setdefault(indices, []).append(annotation["id"])
+        
+        files = []
+        for indices, ids in groups.items():
+            groupFiles = self.getMatchingAnnotationData(
+                "layer.id == '"+layerId.replace("'","\\'")+"' && "
+                + AGQL.expressionFromIds(ids), dir)
+            files = files + groupFiles
+            for i in indices:
+                byInterval[i] = byInterval[i] + groupFiles
+        return(files, byInterval)
+    
     # TODO getFragmentAnnotations(transcriptIds, participantIds, startOffsets, endOffsets, layerIds, sep, partialContainment)
         
     def getAnchors(self, id, anchorIds):
@@ -901,6 +1808,62 @@ class LabbcatView:
             self._storeQueryUrl("getTranscript"),
             { "id":id, "layerIds":layerIds }))
         
+    def getTranscripts(self, ids, layerIds=None, maxWorkers=4, ordered=True, retries=2):
+        """ Gets many transcripts, making several requests at once.
+        
+        This is like calling `getTranscript() <#labbcat.LabbcatView.getTranscript>`_ for
+        each of the given IDs, except that up to *maxWorkers* transcripts are requested at
+        once, and each transcript is yielded as soon as it's available. IDs are consumed as
+        they're needed, so *ids* can be an arbitrarily long iterator.
+        
+        A failure to get one transcript doesn't prevent the others from being returned;
+        instead, the error is included in the yielded tuple. Transient failures (dropped
+        connections, server errors, etc.) are retried up to *retries* times first.
+        
+        Example::
+        
+            ids = corpus.getTranscriptIdsInCorpus("UC")
+            for id, transcript, error in corpus.getTranscripts(ids, ["word"], maxWorkers=8):
+                if error != None:
+                    print(id + ": " + str(error))
+                else:
+                    wordCount = sum(len(turn["word"]) for participant in transcript["participant"]
+                                    for turn in participant["turn"])
+        
+        :param ids: The IDs of the transcripts to get.
+        :type ids: list or iterator of str
+        
+        :param layerIds: The IDs of the layers to load, or null if only transcript data is
+            required. 
+        :type layerIds: list of str
+        
+        :param maxWorkers: The maximum number of transcripts to request at once.
+        :type maxWorkers: int
+        
+        :param ordered: Whether transcripts are yielded in the same order as *ids* (True),
+         or in the order they arrive (False), which is faster if some transcripts are
+         much larger than others.
+        :type ordered: boolean
+        
+        :param retries: The number of times to retry getting a transcript after a transient
+         error.
+        :type retries: int
+        
+        :returns: An iterator of (id, transcript, error) tuples, where transcript is as
+         returned by getTranscript, or None if it couldn't be retrieved, in which case error
+         is the exception that was raised. 
+        :rtype: iterator
+        """
+        pending = {} # item index -> transcript ID
+        def enumerateIds():
+            for index, id in enumerate(ids):
+                pending[index] = id
+                yield(id)
+        for index, transcript, exception in self._mapConcurrently(
+                lambda id: self.getTranscript(id, layerIds), enumerateIds(),
+                maxWorkers, ordered, retries):
+            yield((pending.pop(index), transcript, exception))
+        
     def getMediaTracks(self):
         """ List the predefined media tracks available for transcripts. 
         
@@ -961,6 +1924,12 @@ class LabbcatView:
     def getMedia(self, id, trackSuffix, mimeType, startOffset=None, endOffset=None, dir=None):
         """ Downloads a given media track URL for a given transcript. 
         
+        Large media files are downloaded resumably; if the connection drops, the download
+        continues from where it stopped (where the server supports this) rather than
+        starting again. If *dir* is specified, a download that was interrupted altogether
+        (e.g. by the process being killed) leaves a ".part" file in *dir*, and calling
+        getMedia again for the same media (with the same offsets and MIME type) resumes it.
+        
         :param id: The transcript ID.
         :type id: str
         
@@ -988,6 +1957,9 @@ class LabbcatView:
          be deleted by the caller, or moved to a more permanent location. 
         :rtype: list of str
         """
+        if self.mediaCache != None:
+            return(self._getCachedMedia(
+                id, trackSuffix, mimeType, startOffset, endOffset, dir))
 
         # get the URL of the media
         url = self.getMediaUrl(id, trackSuffix, mimeType, startOffset, endOffset)
@@ -999,10 +1971,172 @@ class LabbcatView:
                 tempFiles = True
             elif not os.path.exists(dir):
                 os.mkdir(dir)
-            return(self._postRequestToFile(url, None, dir))
+            # the name must be known in advance, so that interrupted downloads can be resumed
+            path = url.split("?")[0]
+            fileName = os.path.join(dir, path[path.rfind("/") + 1:])
+            response = self._getRequestToFile(url, fileName)
+            # but use the name given by the server, if any
+            serverFileName = self._responseFileName(response, path, dir)
+            if serverFileName != fileName:
+                os.replace(fileName, serverFileName)
+            return(serverFileName)
         else:
             return(None)
         
+    def _getCachedMedia(self, id, trackSuffix, mimeType, startOffset, endOffset, dir):
+        """ Implements getMedia when there is a mediaCache. """
+        cache = self.mediaCache
+        key = cache.key(self.labbcatUrl, id, trackSuffix, mimeType, startOffset, endOffset)
+        entry = cache.get(key)
+        
+        def destination(entry):
+            directory = dir
+            if directory == None:
+                directory = tempfile.mkdtemp("_wav", "getMedia_")
+            elif not os.path.exists(directory):
+                os.mkdir(directory)
+            return(os.path.join(directory, entry["fileName"]))
+        
+        if entry != None and not cache.revalidate:
+            fileName = cache.copy(key, destination(entry))
+            if fileName != None: return(fileName)
+            entry = None # evicted since get()
+
+        # get the URL of the media
+        url = self.getMediaUrl(id, trackSuffix, mimeType, startOffset, endOffset)
+        if url == None:
+            if entry != None: cache.remove(key) # the media no longer exists
+            return(None)
+
+        # only download the media if it has changed
+        headers = {}
+        if entry != None:
+            if "etag" in entry: headers["If-None-Match"] = entry["etag"]
+            if "lastModified" in entry: headers["If-Modified-Since"] = entry["lastModified"]
+        download = cache.newFile()
+        try:
+            response = self._getRequestToFile(url, download, headers)
+            if response.status_code == 304: # not modified
+                fileName = cache.copy(key, destination(entry))
+                if fileName != None:
+                    os.remove(download)
+                    return(fileName)
+                # evicted since get(), so download unconditionally
+                response = self._getRequestToFile(url, download)
+        except:
+            # including any partial download, which would otherwise never be evicted
+            for fileName in (download,) + self._partFiles(url, download):
+                if os.path.exists(fileName): os.remove(fileName)
+            raise
+        entry = { "fileName" : os.path.basename(
+            self._responseFileName(response, url.split("?")[0], "")) }
+        if "ETag" in response.headers:
+            entry["etag"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            entry["lastModified"] = response.headers["Last-Modified"]
+        return(cache.put(key, download, entry, destination(entry)))
+        
+    def getMediaBytes(self, id, trackSuffix, mimeType, firstByte=0, lastByte=None):
+        """ Gets a range of bytes from a given media track for a given transcript, without
+        downloading the whole file; e.g. to read the header of a large media file.
+        
+        If the server doesn't support byte ranges for the media, the file is downloaded
+        only as far as *lastByte*.
+        
+        :param id: The transcript ID.
+        :type id: str
+        
+        :param trackSuffix: The track suffix of the media. 
+        :type trackSuffix: str
+        
+        :param mimeType: The MIME type of the media.
+        :type mimeType: str
+        
+        :param firstByte: The position of the first byte to get, counting from 0.
+        :type firstByte: int
+        
+        :param lastByte: The position of the last byte to get (inclusive), or None for the
+         end of the file.
+        :type lastByte: int or None
+        
+        :returns: The bytes, which may be fewer than requested if the file ends before
+         *lastByte*, or None if the transcript has no such media.
+        :rtype: bytes
+        """
+        url = self.getMediaUrl(id, trackSuffix, mimeType)
+        if url == None: return(None)
+        if self.verbose: print("getMediaBytes " + url + " : " + str(firstByte) + "-" + str(lastByte))
+        if self.username == None:
+            auth = None
+        else:
+            auth = (self.username, self.password)
+        with self.session.get(
+                url=url, auth=auth, stream=True, headers={
+                    "Range" : "bytes=" + str(firstByte) + "-"
+                    + ("" if lastByte == None else str(lastByte)),
+                    "Accept-Language":self.language,
+                    "user-agent": "labbcat-py/"+__version__
+                }) as response:
+            if response.status_code == 416: # Range Not Satisfiable
+                return(b"")
+            # ensure status was ok
+            response.raise_for_status();
+            if response.status_code == 206:
+                return(response.content)
+            # the server ignored the range, so skip to it in the whole content
+            content = bytearray()
+            for chunk in response.iter_content(1024*1024):
+                content.extend(chunk)
+                if lastByte != None and len(content) > lastByte: break
+            return(bytes(content[firstByte:None if lastByte == None else lastByte + 1]))
+        
+    def getMediaArray(self, id, trackSuffix="", startOffset=None, endOffset=None, sampleRate=None, normalize=True):
+        """ Gets the WAV audio of a given transcript as a `NumPy <https://numpy.org/>`_ 
+        array, without saving it to a file.
+        
+        This function requires NumPy to be installed.
+        
+        Example:: 
+
+            samples, sampleRate = corpus.getMediaArray("AP511_MikeThorpe.eaf")
+            # samples has one row per channel
+            duration = samples.shape[1] / sampleRate
+        
+        :param id: The transcript ID.
+        :type id: str
+        
+        :param trackSuffix: The track suffix of the media. 
+        :type trackSuffix: str
+        
+        :param startOffset: The start offset of the media sample, or null for the start of
+            the whole recording. 
+        :type startOffset: float or None
+
+        :param endOffset: The end offset of the media sample, or null for the end of the
+            whole recording. 
+        :type endOffset: float or None
+
+        :param sampleRate: The desired sample rate, or null for no preference.
+        :type sampleRate: int
+        
+        :param normalize: Whether to convert samples to floats in the range -1..1 (True),
+         or return the samples in their original integer format (False), in which case
+         the array shares memory with the downloaded content rather than being a copy.
+        :type normalize: boolean
+        
+        :returns: A tuple: (samples, sampleRate), where samples is an array with one row
+         per channel, or None if the transcript has no such media.
+        :rtype: tuple
+        """
+        if Audio.numpy is None:
+            raise ImportError("getMediaArray requires numpy")
+        mimeType = "audio/wav"
+        if sampleRate != None:
+            mimeType = mimeType + "; samplerate=" + str(sampleRate)
+        url = self.getMediaUrl(id, trackSuffix, mimeType, startOffset, endOffset)
+        if url == None: return(None)
+        return(Audio._wavArray(self._postRequestToBytes(url, None), normalize))
+        
     def getEpisodeDocuments(self, id):
         """ Get a list of documents associated with the episode of the given transcript. 
         
@@ -1083,29 +2217,40 @@ class LabbcatView:
         if "resultUrl" in status:
             resultUrl = status["resultUrl"]
             
-            fragments = []        
-            tempFiles = False
             if dir == None:
                 dir = tempfile.mkdtemp("_"+str(threadId), "taskResults_")
-                tempFiles = True
             elif not os.path.exists(dir):
                 os.mkdir(dir)
 
-            # get result
-            fileName = self._postRequestToFile(resultUrl, None, dir)
-            fileNames = [ fileName ]
+            # get result, extracting any zip file as it's downloaded
+            return(self._postRequestToFiles(resultUrl, None, dir))
             
-            if fileName.endswith(".zip"):
-                # extract the zip file
-                with ZipFile(fileName, 'r') as zipObj:
-                    zipObj.extractall(dir)
-                    fileNames = [os.path.join(dir, fileName) for fileName in zipObj.namelist()]
-                
-                # delete the temporary zip file
-                os.remove(fileName)
+        else: # no resultUrl
+            return None
+    
+    def taskResultEntries(self, threadId):
+        """ Gets the results of the given task, without saving them to files.
 
-            return fileNames
-            
+        This is like `taskResults() <#labbcat.LabbcatView.taskResults>`_, except that
+        instead of saving files to disk, it's an iterator of (name, content) tuples, one
+        for each file. If the results are a zip file, the files within it are extracted
+        as it's downloaded.
+
+        Example::
+        
+            for name, content in corpus.taskResultEntries(threadId):
+                print(name + ": " + str(len(content)) + " bytes")
+        
+        :param threadId: The ID of the task.
+        :type threadId: str.
+
+        :returns: An iterator of (name, content) tuples, where content is bytes, or None
+         if the task has no results (yet).
+        :rtype: iterator
+        """
+        status = self.taskStatus(threadId)
+        if "resultUrl" in status:
+            return(self._postRequestEntries(status["resultUrl"], None))
         else: # no resultUrl
             return None
     
@@ -1155,14 +2300,23 @@ class LabbcatView:
             else:
                 raise x
     
-    def getTranscriptAttributes(self, expression, layerIds, csvFileName=None):
+    def getTranscriptAttributes(self, expression, layerIds, csvFileName=None, asColumns=False, chunkSize=1000, maxWorkers=4):
         """ Get transcript attribute values.
         
         Retrieves transcript attribute values for a given transcript expression, saves them to
         a CSV file, and returns the name of the file.
+        
+        Alternatively, if *asColumns* is True, the values are parsed as they're received,
+        without saving a file, and returned as a dictionary of columns, keyed by column
+        name (the first column, "transcript", being transcript IDs). Columns whose values
+        are all integers or all numbers are lists of ints or floats (with None for blank
+        values); other columns are lists of strings. This can be converted to a data frame
+        with, e.g., ``pandas.DataFrame(columns)``.
 
         The expression parameter can be an explicit list of transcript IDs, or a string
-        query expression that identifies which transcripts to return.
+        query expression that identifies which transcripts to return. A long list of IDs
+        is split into chunks of *chunkSize* IDs, which are requested separately (up to
+        *maxWorkers* at once), and the results are merged in ID order.
         
         The expression language is loosely based on JavaScript; expressions such as the
         following can be used: 
@@ -1216,6 +2370,11 @@ class LabbcatView:
 
             # tidily delete CSV files
             os.remove([qbAttributesCsv, spontaneousSpeechRateCsv, languageCsv])
+            
+            # durations in memory
+            durations = corpus.getTranscriptAttributes(
+                labbcat.expressionFromCorpora("QB"), ["transcript_duration"], asColumns=True)
+            totalDuration = sum(d for d in durations["transcript_duration"] if d != None)
         
         :param expression: An expression that determines which transcripts match,
                            or an explicit list of transcript IDs.
@@ -1227,24 +2386,68 @@ class LabbcatView:
         :param csvFileName: The file to save the resulting CSV rows to.
         :type csvFileName: str.
         
-        :returns: The name of a CSV file with one row per transcript, and one column per attribute.
-        :rtype: str
+        :param asColumns: Whether to return the values as a dictionary of columns instead
+         of saving them to a file.
+        :type asColumns: boolean
+        
+        :param chunkSize: The maximum number of transcript IDs to request at once, or None
+         to request them all at once.
+        :type chunkSize: int
+        
+        :param maxWorkers: The maximum number of chunks to request at once.
+        :type maxWorkers: int
+        
+        :returns: The name of a CSV file with one row per transcript, and one column per
+         attribute, or if *asColumns* is True, a dictionary of lists of values, keyed by
+         column name.
+        :rtype: str or dict
         """
+        return(self._getTranscriptAttributes(
+            expression, layerIds, csvFileName, asColumns, chunkSize, maxWorkers))
+    
+    def _getTranscriptAttributes(self, expression, layerIds, csvFileName=None, asColumns=False, chunkSize=1000, maxWorkers=4, useCache=True):
+        """ Implements getTranscriptAttributes. If *useCache* is False, attributeCache
+        isn't used, so that the values are always up to date, e.g. for detecting changes. """
         if isinstance(expression, str):
             params = {
                 "layer" : ["transcript"]+layerIds,
                 "query" : expression }
         else:
+            expression = list(expression)
+            getRows = lambda ids: self._postRequestToRows(
+                self._labbcatUrl("api/attributes"),
+                { "layer" : ["transcript"]+layerIds, "id" : ids })
+            if useCache and self.attributeCache != None:
+                header, rows = self._cachedRows(
+                    "transcriptAttributes", expression, layerIds,
+                    lambda ids: self._chunkedRows(getRows, ids, chunkSize, maxWorkers))
+                return(self._rowsResult(header, rows, asColumns, csvFileName))
+            if chunkSize != None and len(expression) > chunkSize:
+                header, rows = self._chunkedRows(getRows, expression, chunkSize, maxWorkers)
+                return(self._rowsResult(header, rows, asColumns, csvFileName))
             params = {
                 "layer" : ["transcript"]+layerIds,
                 "id" : expression }
+        if asColumns:
+            return (self._postRequestToColumns(self._labbcatUrl("api/attributes"), params))
         return (self._postRequestToFile(self._labbcatUrl("api/attributes"), params, None, csvFileName))
     
-    def getParticipantAttributes(self, participantIds, layerIds):
+    def getParticipantAttributes(self, participantIds, layerIds, asColumns=False, chunkSize=1000, maxWorkers=4):
         """ Gets participant attribute values.
         
         Retrieves participant attribute values for given participant IDs, saves them
         to a CSV file, and returns the name of the file.
+        
+        Alternatively, if *asColumns* is True, the values are parsed as they're received,
+        without saving a file, and returned as a dictionary of columns, keyed by column
+        name (the first column being participant IDs). Columns whose values are all
+        integers or all numbers are lists of ints or floats (with None for blank values);
+        other columns are lists of strings. This can be converted to a data frame with,
+        e.g., ``pandas.DataFrame(columns)``.
+        
+        A long list of participant IDs is split into chunks of *chunkSize* IDs, which are
+        requested separately (up to *maxWorkers* at once), and the results are merged in ID
+        order.
 
         In general, participant attributes are layers whose ID is prefixed 'participant',
         however formally it's any layer where layer.parentId == 'participant' and
@@ -1258,17 +2461,60 @@ class LabbcatView:
         :param layerIds: A list of layer IDs corresponding to participant attributes. 
         :type layerIds: list of str.
         
-        :returns: The name of a CSV file with one row per participant, and one column per attribute.
-        :rtype: str
+        :param asColumns: Whether to return the values as a dictionary of columns instead
+         of saving them to a file.
+        :type asColumns: boolean
+        
+        :param chunkSize: The maximum number of participant IDs to request at once, or None
+         to request them all at once.
+        :type chunkSize: int
+        
+        :param maxWorkers: The maximum number of chunks to request at once.
+        :type maxWorkers: int
+        
+        :returns: The name of a CSV file with one row per participant, and one column per
+         attribute, or if *asColumns* is True, a dictionary of lists of values, keyed by
+         column name.
+        :rtype: str or dict
         """
+        return(self._getParticipantAttributes(
+            participantIds, layerIds, asColumns, chunkSize, maxWorkers))
+    
+    def _getParticipantAttributes(self, participantIds, layerIds, asColumns=False, chunkSize=1000, maxWorkers=4, useCache=True):
+        """ Implements getParticipantAttributes. If *useCache* is False, attributeCache
+        isn't used, so that the values are always up to date, e.g. for detecting changes. """
+        participantIds = list(participantIds)
+        getRows = lambda ids: self._participantAttributes(
+            ids, layerIds, self._postRequestToRows)
+        if useCache and self.attributeCache != None:
+            header, rows = self._cachedRows(
+                "participantAttributes", participantIds, layerIds,
+                lambda ids: self._chunkedRows(getRows, ids, chunkSize, maxWorkers))
+            return(self._rowsResult(header, rows, asColumns))
+        if chunkSize != None and len(participantIds) > chunkSize:
+            header, rows = self._chunkedRows(getRows, participantIds, chunkSize, maxWorkers)
+            return(self._rowsResult(header, rows, asColumns))
+        if asColumns:
+            return(self._participantAttributes(
+                participantIds, layerIds, self._postRequestToColumns))
+        return(self._participantAttributes(
+            participantIds, layerIds, self._postRequestToFile))
+    
+    def _participantAttributes(self, participantIds, layerIds, request):
+        """ Implements getParticipantAttributes, where request(url, params) makes the
+        request and returns the result. """
         try: # fall back to old API
             params = {
                 "csvFieldDelimiter" : ",",
                 "layer" : layerIds,
                 "id" : participantIds }
-            return (self._postRequestToFile(self._labbcatUrl("api/participant/attributes"), params))
-        except ResponseException as x:  
-            if x.response.code == 404: # fall back to old API
+            return (request(self._labbcatUrl("api/participant/attributes"), params))
+        except (ResponseException, requests.exceptions.HTTPError) as x:
+            if isinstance(x, requests.exceptions.HTTPError):
+                status = x.response.status_code
+            else:
+                status = x.response.httpStatus
+            if status == 404: # fall back to old API
                 if self.verbose: print("Falling back to old API")
                 params = {
                     "type" : "participant",
@@ -1276,7 +2522,7 @@ class LabbcatView:
                     "csvFieldDelimiter" : ",",
                     "layer" : layerIds,
                     "participantId" : participantIds }
-                return (self._postRequestToFile(self._labbcatUrl("participantsExport"), params))
+                return (request(self._labbcatUrl("participantsExport"), params))
             else:
                 raise x        
 
@@ -1833,42 +3079,170 @@ class LabbcatView:
         # wait for it to finish
         task = self.waitForTask(threadId)
 
-        # download the file
+        # download the results
+        results = self._praatTaskResults(threadId)
+                    
+        # tidy up
+        self.releaseTask(threadId)
+        
+        return(results)
+
+    def _praatTaskResults(self, threadId):
+        """ Downloads and parses the results CSV of a finished processWithPraat task. """
         fileNames = self.taskResults(threadId)
-        if len(fileNames) == 0:
+        if fileNames == None or len(fileNames) == 0:
             raise Exception("No results returned by task " + threadId)
 
         # load values into an list of dict
         results = []
-        with open(fileNames[0]) as csvDataFile:
-            csvReader = csv.reader(csvDataFile)
-            headers = None
-            for row in csvReader:
-                if headers == None:
-                    headers = row
-                else: # data row
-                    result = {}
-                    for c in range(len(row)):
-                        value = row[c]
-                        # we assume everything other than "Error" is a number!
-                        if headers[c] != "Error":
-                            try:
-                                if "." in value:
-                                    value = float(value)
-                                else:
-                                    value = int(value)
-                            except:
-                                pass
-                        result[headers[c]] = value
-                    results.append(result)
-                    
-        # tidy up
-        self.releaseTask(threadId)
-        for fileName in fileNames:
-            os.remove(fileName)
-        
+        try:
+            with open(fileNames[0]) as csvDataFile:
+                csvReader = csv.reader(csvDataFile)
+                headers = None
+                for row in csvReader:
+                    if headers == None:
+                        headers = row
+                    else: # data row
+                        result = {}
+                        for c in range(len(row)):
+                            value = row[c]
+                            # we assume everything other than "Error" is a number!
+                            if headers[c] != "Error":
+                                try:
+                                    if "." in value:
+                                        value = float(value)
+                                    else:
+                                        value = int(value)
+                                except:
+                                    pass
+                            result[headers[c]] = value
+                        results.append(result)
+        finally:
+            for fileName in fileNames:
+                os.remove(fileName)
         return(results)
         
+    def processWithPraatChunked(self, praatScript, windowOffset, matchIds, offsets, endOffsets=None, 
+                                genderAttribute="participant_gender", attributes=None,
+                                chunkSize=1000, maxTasks=1):
+        """
+        Process a set of intervals with Praat, yielding results as they become available.
+        
+        This function works like
+        `processWithPraat() <#labbcat.LabbcatView.processWithPraat>`_, except that instead
+        of waiting for all intervals to be processed before returning all the results, the
+        intervals are divided into chunks of *chunkSize* intervals, each of which is processed
+        by its own server task. The results of each chunk are yielded as soon as the chunk's
+        task finishes, so that very large batches can be analysed, checkpointed, or checked
+        for errors before the whole batch is finished.
+        
+        Example:: 
+        
+            measures = [None] * len(matches)
+            for first, results in corpus.processWithPraatChunked(
+                    labbcat.praatScriptFormants(), 0.025, matches, segments, chunkSize=500):
+                measures[first:first+len(results)] = results
+                print(str(first+len(results)) + " intervals processed")
+        
+        If the generator is closed before it's exhausted, any tasks still running are
+        cancelled and released.
+        
+        :param praatScript: Script to run on each match.
+        :type praatScript: str
+        
+        :param windowOffset: How much context to include before and after the sample 
+         start/end time - see `processWithPraat() <#labbcat.LabbcatView.processWithPraat>`_
+        :type windowOffset: float
+
+        :param matchIds: A list of MatchId strings, or a list of match dictionaries of the
+                         kind returned by `getMatches() <#labbcat.LabbcatView.getMatches>`_
+        :type matchIds: list of str or list of dict
+        
+        :param offsets: *Either* list of start offsets (in which case endOffsets must also
+         be specified) *or* a list of Annotation dict objects of the kind returned by 
+         `getMatchAnnotations() <#labbcat.LabbcatView.getMatchAnnotations>`_ (in which
+         case endOffsets should be None). Either way, there must be one element for each
+         element in *matchIds*. 
+        :type offsets: list of float or None
+        
+        :param endOffsets: If offsets is a list of *start* offsets, this must be list of
+         end offsets, with one element for each element in *matchtIds*. Otherwise, None
+        :type endOffsets: list of float or None
+        
+        :param genderAttribute: Which participant attribute represents the participant's gender.
+        :type genderAttribute: str
+        
+        :param attributes: A list of participant attribute names to make available to the script.
+        :type attributes: list
+        
+        :param chunkSize: The maximum number of intervals to process in each server task.
+        :type chunkSize: int
+        
+        :param maxTasks: The maximum number of server tasks to run at once. If this is 1, 
+         chunks are processed (and yielded) in order. Otherwise, chunks are yielded in
+         the order they finish.
+        :type maxTasks: int
+        
+        :returns: A generator of tuples, one per chunk, each containing the index of the first
+         interval in the chunk, and a list of dictionaries of acoustic measurements, one for
+         each interval in the chunk.
+        :rtype: generator of (int, list of dict)
+        """
+        # validation
+        if len(matchIds) != len(offsets):
+            raise Exception("matchIds ("+str(len(matchIds))+") and offsets ("
+                            +str(len(offsets))+") must be the same length.")
+        if endOffsets != None and len(matchIds) != len(endOffsets):
+            raise Exception("matchIds ("+str(len(matchIds))+") and endOffsets ("
+                            +str(len(endOffsets))+") must be the same length.")
+        if chunkSize == None or chunkSize < 1:
+            raise ValueError("chunkSize must be a positive number: " + str(chunkSize))
+        if maxTasks == None or maxTasks < 1:
+            raise ValueError("maxTasks must be a positive number: " + str(maxTasks))
+        # the work is done by a separate generator, so that invalid arguments are reported
+        # when this function is called, not when iteration starts
+        return(self._processWithPraatChunks(
+            praatScript, windowOffset, matchIds, offsets, endOffsets, genderAttribute,
+            attributes, chunkSize, maxTasks))
+    
+    def _processWithPraatChunks(self, praatScript, windowOffset, matchIds, offsets, endOffsets, genderAttribute, attributes, chunkSize, maxTasks):
+        """ Implements processWithPraatChunked. """
+        pending = list(range(0, len(matchIds), chunkSize)) # first index of each chunk
+        running = {} # threadId -> first index of chunk
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                # start tasks up to the limit
+                while len(pending) > 0 and len(running) < maxTasks:
+                    first = pending.pop(0)
+                    last = first + chunkSize
+                    threadId = self.processWithPraatAsync(
+                        praatScript, windowOffset, matchIds[first:last], offsets[first:last],
+                        None if endOffsets == None else endOffsets[first:last],
+                        genderAttribute, attributes)
+                    running[threadId] = first
+                    
+                # yield the results of any that have finished
+                finished = [ threadId for threadId in running
+                             if not self.taskStatus(threadId)["running"] ]
+                if len(finished) == 0:
+                    if self.verbose: print("sleeping...")
+                    time.sleep(1)
+                for threadId in finished:
+                    first = running.pop(threadId)
+                    try:
+                        results = self._praatTaskResults(threadId)
+                    finally:
+                        self.releaseTask(threadId)
+                    yield (first, results)
+        finally:
+            # if we've been interrupted, tidy up tasks that are still running
+            for threadId in running:
+                try:
+                    self.cancelTask(threadId)
+                    self.releaseTask(threadId)
+                except:
+                    pass
+        
     def processWithPraatAsync(self, praatScript, windowOffset, matchIds, offsets, endOffsets=None, 
                               genderAttribute="participant_gender", attributes=None):
         """
@@ -2064,7 +3438,44 @@ class LabbcatView:
         threadId = model["threadId"]
         return(threadId)
     
-    def getSoundFragments(self, transcriptIds, startOffsets=None, endOffsets=None, sampleRate=None, dir=None, prefixNames=True):
+    def _fragmentIntervals(self, transcriptIds, startOffsets, endOffsets):
+        """ Normalizes the intervals passed to getSoundFragments and similar functions, which
+        may be a list of matches instead of lists of transcript IDs and offsets. 
+        Returns a tuple: (transcriptIds, startOffsets, endOffsets, prefixes), where
+        prefixes is None unless matches were passed. """
+        prefixes = None
+        # have they passed matches as transcriptIds, instead of strings?
+        if len(transcriptIds) > 0:
+            if isinstance(transcriptIds[0], dict) and startOffsets == None and endOffsets == None:
+                prefixExtractor = re.compile('.*prefix=([^;]+).*')
+                startOffsets = [ m["Line"] for m in transcriptIds ]
+                endOffsets = [ m["LineEnd"] for m in transcriptIds ]
+                prefixes = []
+                for m in transcriptIds:
+                    prefix = None
+                    match = prefixExtractor.match(m["MatchId"])
+                    if match != None:
+                        prefix = match.group(1)
+                    prefixes.append(prefix)
+                transcriptIds = [ m["Transcript"] for m in transcriptIds ]
+        
+        # validate parameters
+        if len(transcriptIds) != len(startOffsets) or len(transcriptIds) != len(endOffsets):
+            raise ResponseException(
+                "transcriptIds ("+str(len(transcriptIds))
+                +"), startOffsets ("+str(len(startOffsets))
+                +"), and endOffsets ("+str(len(endOffsets))+") must be lists of equal size.");
+        return(transcriptIds, startOffsets, endOffsets, prefixes)
+
+    def _soundFragmentUrl(self):
+        """ The URL for extracting sound fragments, which depends on the server version. """
+        if self.labbcatVersion is None: self.getId() # ensure we know the server version
+        if self.labbcatVersion >= "20250716.1022":
+            return(self._labbcatUrl("api/media/fragments"))
+        else:
+            return(self._labbcatUrl("soundfragment"))
+    
+    def getSoundFragments(self, transcriptIds, startOffsets=None, endOffsets=None, sampleRate=None, dir=None, prefixNames=True, maxWorkers=1, progress=None, localSlicing=False, mergeGap=None):
         """
         Downloads WAV sound fragments.
 
@@ -2075,6 +3486,31 @@ class LabbcatView:
          2. transcriptIds is a list of dict objects returned by getMatches(threadId), and
             startOffsets and endOffsets are None
 
+        Fragments are downloaded one at a time by default. For large numbers of fragments,
+        a *maxWorkers* value greater than 1 downloads that many fragments concurrently.
+        Either way, the returned list is in the same order as the given intervals.
+
+        Example:: 
+
+            # download 8 fragments at a time, reporting progress as we go
+            wavs = corpus.getSoundFragments(
+                matches, dir="wav", maxWorkers=8,
+                progress=lambda done, total: print(str(done) + "/" + str(total)))
+
+        By default, the server extracts each fragment from the transcript's media. When there
+        are many fragments from the same transcripts, setting *localSlicing* to True will
+        instead download each transcript's whole WAV recording once, and cut the fragments
+        out of it locally, which saves the server from decoding the recording once for every
+        fragment. In this case, *maxWorkers* is the number of recordings downloaded at once,
+        and converting to a different *sampleRate* requires 
+        `NumPy <https://numpy.org/>`_ to be installed.
+
+        Alternatively, when intervals overlap or are close together (e.g. utterances with
+        surrounding context), *mergeGap* can be set to a number of seconds; intervals in the
+        same transcript that overlap or are separated by no more than that are merged into
+        a single span, which is downloaded once, and the fragments are cut out of it locally.
+        This reduces both the number of requests and the amount of audio transferred.
+
         :param transcriptIds: A list of transcript IDs (transcript names), or a list of
          dictionaries returned by getMatches(threadId).
         :type transcriptIds: list of str or list of dict
@@ -2097,33 +3533,31 @@ class LabbcatView:
         :param prefixNames: Whether to prefix fragment names with a numeric serial number or not.
         :type prefixNames: boolean
         
-        :returns: A list of WAV files. If *dir* is None, these files will be stored
-         under the system's temporary directory, so once processing is finished, they should
-         be deleted by the caller, or moved to a more permanent location. 
+        :param maxWorkers: The maximum number of fragments to download at once.
+        :type maxWorkers: int
+        
+        :param progress: An optional function to call each time a fragment has been
+         downloaded (or failed), which is passed two arguments; the number of fragments
+         finished so far, and the total number of fragments.
+        :type progress: function
+        
+        :param localSlicing: Whether to download each transcript's recording once, and
+         cut fragments out of it locally (True), or have the server extract each fragment
+         (False).
+        :type localSlicing: boolean
+        
+        :param mergeGap: If not None, the maximum gap in seconds between intervals that are
+         downloaded together as a single span, and then cut into fragments locally.
+        :type mergeGap: float
+        
+        :returns: A list of WAV files, one for each interval. If *dir* is None, these files
+         will be stored under the system's temporary directory, so once processing is
+         finished, they should be deleted by the caller, or moved to a more permanent
+         location. Elements for intervals that could not be downloaded are None.
         :rtype: list of str
         """
-        prefixes = None
-        # have they passed matches as transcriptIds, instead of strings?
-        if len(transcriptIds) > 0:
-            if isinstance(transcriptIds[0], dict) and startOffsets == None and endOffsets == None:
-                prefixExtractor = re.compile('.*prefix=([^;]+).*')
-                startOffsets = [ m["Line"] for m in transcriptIds ]
-                endOffsets = [ m["LineEnd"] for m in transcriptIds ]
-                prefixes = []
-                for m in transcriptIds:
-                    prefix = None
-                    match = prefixExtractor.match(m["MatchId"])
-                    if match != None:
-                        prefix = match.group(1)
-                    prefixes.append(prefix)
-                transcriptIds = [ m["Transcript"] for m in transcriptIds ]
-        
-        # validate parameters
-        if len(transcriptIds) != len(startOffsets) or len(transcriptIds) != len(endOffsets):
-            raise ResponseException(
-                "transcriptIds ("+str(len(transcriptIds))
-                +"), startOffsets ("+str(len(startOffsets))
-                +"), and endOffsets ("+str(len(endOffsets))+") must be lists of equal size.");
+        transcriptIds, startOffsets, endOffsets, prefixes = self._fragmentIntervals(
+            transcriptIds, startOffsets, endOffsets)
         
         fragments = []        
         tempFiles = False
@@ -2133,16 +3567,24 @@ class LabbcatView:
         elif not os.path.exists(dir):
             os.mkdir(dir)
 
-        # loop through each triple, getting fragments individually
-        if self.labbcatVersion is None: self.getId() # ensure we know the server version
-        if self.labbcatVersion >= "20250716.1022":
-            url = self._labbcatUrl("api/media/fragments")
-        else:
-            url = self._labbcatUrl("soundfragment")
         prefixChars = len(str(len(transcriptIds)))
-        for i in range(len(transcriptIds)):
+        def prefix(i):
+            if prefixes != None and prefixes[i] != None:
+                return(prefixes[i])
+            else:
+                return(str(i+1).zfill(prefixChars)+"-")
+            
+        if localSlicing or mergeGap != None:
+            return(self._sliceSoundFragments(
+                transcriptIds, startOffsets, endOffsets, sampleRate, dir,
+                prefix if prefixNames else lambda i: "", maxWorkers, progress,
+                None if localSlicing else mergeGap))
+        
+        # loop through each triple, getting fragments individually
+        url = self._soundFragmentUrl()
+        def getFragment(i):
             if transcriptIds[i] == None or startOffsets[i] == None or endOffsets[i] == None:
-                continue
+                return(None)
             
             params = {
                 "id" : transcriptIds[i],
@@ -2152,20 +3594,152 @@ class LabbcatView:
             if sampleRate != None:
                 params["sampleRate"] = sampleRate
             if prefixNames:
-                if prefixes != None and prefixes[i] != None:
-                    params["prefix"] = prefixes[i]
-                else:
-                    params["prefix"] = str(i+1).zfill(prefixChars)+"-"
+                params["prefix"] = prefix(i)
+            return(self._postRequestToFile(url, params, dir))
 
-            try:
-                fileName = self._postRequestToFile(url, params, dir)
+        try:
+            for i, fileName, exception in self._mapConcurrently(
+                    getFragment, range(len(transcriptIds)), maxWorkers):
+                if exception != None and self.verbose:
+                    print("getSoundFragments " + str(i) + ": " + str(exception))
                 fragments.append(fileName)
-            except KeyboardInterrupt:
-                break
-            except:
-                fragments.append(None)
+                if progress != None: progress(len(fragments), len(transcriptIds))
+        except KeyboardInterrupt:
+            pass
         
         return(fragments)
+
+    def _sliceSoundFragments(self, transcriptIds, startOffsets, endOffsets, sampleRate, dir, prefix, maxWorkers, progress, mergeGap=None):
+        """ Implements getSoundFragments(localSlicing=True) and getSoundFragments(mergeGap=...);
+        downloads either the WAV recording of each transcript (if mergeGap is None) or
+        spans of merged intervals, once, and cuts all fragments out of them locally. """
+        if mergeGap == None: # one span for each whole transcript
+            spans = [ (transcriptId, None, None, indices) for transcriptId, start, end, indices
+                      in Intervals._coalesce(
+                          transcriptIds, startOffsets, endOffsets, float("inf")) ]
+        else:
+            spans = Intervals._coalesce(transcriptIds, startOffsets, endOffsets, mergeGap)
+            url = self._soundFragmentUrl()
+        # fragments are named the way the server names them
+        def fragmentName(i):
+            stem = os.path.splitext(transcriptIds[i])[0]
+            return(os.path.join(dir, "%s%s__%.3f-%.3f.wav" % (
+                prefix(i), stem, float(startOffsets[i]), float(endOffsets[i]))))
+            
+        def sliceSpan(span):
+            transcriptId, start, end, indices = span
+            mediaDir = tempfile.mkdtemp("_wav", "getSoundFragments_")
+            try:
+                if start == None: # whole recording, which may need resampling
+                    source = self.getMedia(transcriptId, "", "audio/wav", dir=mediaDir)
+                    if source == None:
+                        raise ResponseException("No audio/wav media for " + transcriptId)
+                    start = 0.0
+                    resampleTo = sampleRate
+                else: # the server extracts the span at the right sample rate
+                    params = { "id" : transcriptId, "start" : start, "end" : end }
+                    if sampleRate != None:
+                        params["sampleRate"] = sampleRate
+                    source = self._postRequestToFile(url, params, mediaDir)
+                    resampleTo = None
+                Audio._sliceWav(source, [
+                    (float(startOffsets[i]) - start, float(endOffsets[i]) - start,
+                     fragmentName(i)) for i in indices ], resampleTo)
+            finally:
+                shutil.rmtree(mediaDir, ignore_errors=True)
+            
+        fragments = [ None ] * len(transcriptIds)
+        finishedCount = len(transcriptIds) - sum(len(span[3]) for span in spans)
+        try:
+            for s, result, exception in self._mapConcurrently(sliceSpan, spans, maxWorkers):
+                indices = spans[s][3]
+                if exception != None:
+                    if self.verbose: print(
+                            "getSoundFragments " + str(spans[s][0:3]) + ": " + str(exception))
+                else:
+                    for i in indices:
+                        fragments[i] = fragmentName(i)
+                finishedCount = finishedCount + len(indices)
+                if progress != None: progress(finishedCount, len(transcriptIds))
+        except KeyboardInterrupt:
+            pass
+        return(fragments)
+
+    def getSoundFragmentArrays(self, transcriptIds, startOffsets=None, endOffsets=None, sampleRate=None, normalize=True, maxWorkers=1, progress=None):
+        """
+        Gets WAV sound fragments as `NumPy <https://numpy.org/>`_ arrays, without saving
+        them to files.
+
+        This is like getSoundFragments, but each fragment is returned in memory, which is
+        useful for feeding audio straight into feature extraction or a model. This function
+        requires NumPy to be installed.
+
+        Example:: 
+
+            for samples, sampleRate in corpus.getSoundFragmentArrays(matches, sampleRate=16000):
+                features = extractFeatures(samples[0], sampleRate)
+
+        :param transcriptIds: A list of transcript IDs (transcript names), or a list of
+         dictionaries returned by getMatches(threadId).
+        :type transcriptIds: list of str or list of dict
+        
+        :param startOffsets: A list of start offsets, with one element for each element in
+         *transcriptIds*. 
+        :type startOffsets: list of float or None
+        
+        :param endOffsets: A list of end offsets, with one element for each element in
+         *transcriptIds*. 
+        :type endOffsets: list of float or None
+        
+        :param sampleRate: The desired sample rate, or null for no preference.
+        :type sampleRate: int
+        
+        :param normalize: Whether to convert samples to floats in the range -1..1 (True),
+         or return the samples in their original integer format (False), in which case
+         each array shares memory with the downloaded content rather than being a copy.
+        :type normalize: boolean
+        
+        :param maxWorkers: The maximum number of fragments to download at once.
+        :type maxWorkers: int
+        
+        :param progress: An optional function to call each time a fragment has been
+         downloaded (or failed), which is passed two arguments; the number of fragments
+         finished so far, and the total number of fragments.
+        :type progress: function
+        
+        :returns: A list of tuples, one for each interval, each being (samples, sampleRate),
+         where samples is an array with one row per channel. Elements for intervals that
+         could not be downloaded are None.
+        :rtype: list of tuple
+        """
+        if Audio.numpy is None:
+            raise ImportError("getSoundFragmentArrays requires numpy")
+        transcriptIds, startOffsets, endOffsets, prefixes = self._fragmentIntervals(
+            transcriptIds, startOffsets, endOffsets)
+        url = self._soundFragmentUrl()
+        def getFragment(i):
+            if transcriptIds[i] == None or startOffsets[i] == None or endOffsets[i] == None:
+                return(None)
+            params = {
+                "id" : transcriptIds[i],
+                "start" : startOffsets[i],
+                "end" : endOffsets[i],
+            }
+            if sampleRate != None:
+                params["sampleRate"] = sampleRate
+            return(Audio._wavArray(self._postRequestToBytes(url, params), normalize))
+        
+        fragments = []
+        try:
+            for i, fragment, exception in self._mapConcurrently(
+                    getFragment, range(len(transcriptIds)), maxWorkers):
+                if exception != None and self.verbose:
+                    print("getSoundFragmentArrays " + str(i) + ": " + str(exception))
+                fragments.append(fragment)
+                if progress != None: progress(len(fragments), len(transcriptIds))
+        except KeyboardInterrupt:
+            pass
+        return(fragments)
     
     def getFragments(self, transcriptIds, layerIds, mimeType, dir=None, startOffsets=None, endOffsets=None, prefixNames=True):
         """
@@ -2246,13 +3820,8 @@ class LabbcatView:
         if prefixNames:
             params["prefix"] = True
         try:
-            zipFileName = self._postRequestToFile(url, params, dir)
-            with ZipFile(zipFileName, 'r') as zipObj:
-                zipObj.extractall(dir)
-                fragments = [os.path.join(dir, fileName) for fileName in zipObj.namelist()]
-                
-            # delete the temporary zip file
-            os.remove(zipFileName)
+            # the zip file is extracted as it's downloaded
+            fragments = self._postRequestToFiles(url, params, dir)
             
         except ResponseException:
             # fall back to looping through each triple, getting fragments individually
@@ -2278,6 +3847,60 @@ class LabbcatView:
         
         return(fragments)
 
+    def getFragmentEntries(self, transcriptIds, layerIds, mimeType, startOffsets=None, endOffsets=None, prefixNames=True):
+        """
+        Get transcript fragments in a specified format, without saving them to files.
+
+        This is like `getFragments() <#labbcat.LabbcatView.getFragments>`_, except that
+        instead of saving files to disk, it's an iterator of (name, content) tuples, one
+        for each file, which are extracted from the server's zip file as it's downloaded.
+
+        Example::
+        
+            for name, content in corpus.getFragmentEntries(
+                    matches, ["utterance", "word"], "text/praat-textgrid"):
+                textGrid = content.decode("utf-8")
+
+        :param transcriptIds: A list of transcript IDs (transcript names), or a list of
+         dictionaries returned by getMatches(threadId).
+        :type transcriptIds: list of str or list of dict
+        
+        :param layerIds: A list of IDs of annotation layers to include in the fragment.
+        :type layerIds: list of str
+        
+        :param mimeType: The desired format, for example "text/praat-textgrid" for Praat
+         TextGrids, "text/plain" for plain text, etc.
+        :type mimeType: list of str
+        
+        :param startOffsets: A list of start offsets, with one element for each element in
+         *transcriptIds*. 
+        :type startOffsets: list of float or None
+        
+        :param endOffsets: A list of end offsets, with one element for each element in
+         *transcriptIds*. 
+        :type endOffsets: list of float or None
+        
+        :param prefixNames: Whether to prefix fragment names with a numeric serial number or not.
+        :type prefixNames: boolean
+        
+        :returns: An iterator of (name, content) tuples, where content is bytes.
+         *NB* Although many formats will generate exactly one file for each interval, this
+         is not guaranteed.
+        :rtype: iterator
+        """
+        transcriptIds, startOffsets, endOffsets, prefixes = self._fragmentIntervals(
+            transcriptIds, startOffsets, endOffsets)
+        params = {
+            "id" : transcriptIds,
+            "start" : startOffsets,
+            "end" : endOffsets,
+            "mimeType" : mimeType,
+            "layerId" : layerIds
+        }
+        if prefixNames:
+            params["prefix"] = True
+        return(self._postRequestEntries(self._labbcatUrl("api/serialize/fragment"), params))
+
     def getFragmentsAsync(self, transcriptIds, layerIds, mimeType, startOffsets=None, endOffsets=None, prefixNames=True):
         """
         Starts a server task for getting transcript fragments in a specified format.
@@ -2379,12 +4002,8 @@ class LabbcatView:
          is not guaranteed; some formats generate a mutiple files per transcript.
         :rtype: list of str
         """
-        files = []
-        
-        tempFiles = False
         if dir == None:
             dir = tempfile.mkdtemp("_transcript", "formatTranscript_")
-            tempFiles = True
         elif not os.path.exists(dir):
             os.mkdir(dir)
 
@@ -2395,19 +4014,170 @@ class LabbcatView:
             "mimeType" : mimeType,
             "layerId" : layerIds
         }
-        fileName = self._postRequestToFile(url, params, dir)
-        files = [ fileName ]
-        
-        if fileName.endswith(".zip"):
-            # extract the zip file
-            with ZipFile(fileName, 'r') as zipObj:
-                zipObj.extractall(dir)
-                files = [os.path.join(dir, fileName) for fileName in zipObj.namelist()]
-            
-            # delete the temporary zip file
-            os.remove(fileName)
-                
-        return(files)
+        # any zip file is extracted as it's downloaded
+        return(self._postRequestToFiles(url, params, dir))
+
+    def formatTranscriptEntries(self, id, layerIds, mimeType):
+        """
+        Get transcript in a specified format, without saving it to a file.
+
+        This is like `formatTranscript() <#labbcat.LabbcatView.formatTranscript>`_, except
+        that instead of saving files to disk, it's an iterator of (name, content) tuples,
+        one for each file the format produces.
+
+        Example::
+        
+            for name, content in corpus.formatTranscriptEntries(
+                    "AP511_MikeThorpe.eaf", ["utterance", "word"], "text/praat-textgrid"):
+                textGrid = content.decode("utf-8")
+
+        :param id: The ID of the transcript to export.
+        :type id: str
+        
+        :param layerIds: A list of IDs of annotation layers to include in the transcript.
+        :type layerIds: list of str
+        
+        :param mimeType: The desired format, for example "text/praat-textgrid" for Praat
+         TextGrids, "text/plain" for plain text, etc.
+        :type mimeType: list of str
+        
+        :returns: An iterator of (name, content) tuples, where content is bytes.
+        :rtype: iterator
+        """
+        return(self._postRequestEntries(
+            self._labbcatUrl("api/serialize/graphs"),
+            { "id" : id, "mimeType" : mimeType, "layerId" : layerIds }))
+
+    def exportTranscripts(self, ids, layerIds, mimeType, dir, manifest=None, maxWorkers=4, retries=2, attributes=None, full=False, progress=None):
+        """
+        Exports many transcripts in a specified format, incrementally.
+        
+        This is like calling `formatTranscript() <#labbcat.LabbcatView.formatTranscript>`_
+        for each transcript, except that:
+        
+        - up to *maxWorkers* transcripts are converted at once,
+        - each completed transcript is recorded in a `Manifest <#labbcat.Manifest>`_, along
+          with the SHA-256 hash of each file it produced, so that an interrupted export can
+          be resumed where it left off, and
+        - files whose content is the same as before aren't rewritten, so repeated exports
+          (e.g. nightly) only save the files that have changed.
+        
+        By default, every transcript is converted, and whether it has changed is decided by
+        comparing the hash of the exported content with the one in the manifest, which
+        detects any change that affects the output.
+        
+        Converting every transcript can be avoided by specifying *attributes* that change
+        whenever a transcript does (e.g. a revision or last-modified attribute maintained
+        on the server). A signature of their values is recorded in the manifest, and
+        transcripts whose signature hasn't changed (and whose files are still there) are
+        skipped without being converted. *NB* the signature only reflects the values of
+        those attributes; any change to a transcript that doesn't also change one of them
+        (e.g. editing its annotations, if none of the attributes records that) isn't
+        detected, and the transcript is skipped with its old files. *full=True* converts
+        all transcripts regardless.
+        
+        Example::
+        
+            corpus.exportTranscripts(
+                corpus.getTranscriptIdsInCorpus("QB"), ["utterance", "word"],
+                "text/praat-textgrid", "textgrids", maxWorkers=8)
+        
+        :param ids: The IDs of the transcripts to export.
+        :type ids: list of str
+        
+        :param layerIds: A list of IDs of annotation layers to include in the transcripts.
+        :type layerIds: list of str
+        
+        :param mimeType: The desired format, for example "text/praat-textgrid" for Praat
+         TextGrids, "text/plain" for plain text, etc.
+        :type mimeType: str
+        
+        :param dir: The directory in which to save the files, which is created if it doesn't
+         exist.
+        :type dir: str
+        
+        :param manifest: The manifest recording exported transcripts, or the name of its
+         file. If None, a file called .manifest.jsonl in *dir* is used.
+        :type manifest: Manifest or str
+        
+        :param maxWorkers: The maximum number of transcripts to convert at once.
+        :type maxWorkers: int
+        
+        :param retries: The number of times to retry a transcript after a transient error.
+        :type retries: int
+        
+        :param attributes: The IDs of transcript attributes whose values change whenever a
+         transcript changes, which are used to skip transcripts that haven't changed
+         without converting them, or None to convert all transcripts.
+        :type attributes: list of str
+        
+        :param full: Whether to convert transcripts even if their *attributes* haven't
+         changed.
+        :type full: boolean
+        
+        :param progress: A function to call after each transcript is exported, with the
+         number exported so far and the number to export.
+        :type progress: function
+        
+        :returns: A dictionary with the following entries:
+        
+         - "exported" : the IDs of transcripts whose files were saved,
+         - "unchanged" : the IDs of transcripts that were converted, but whose files were
+           the same as those already saved,
+         - "skipped" : the IDs of transcripts that weren't converted because their
+           *attributes* hadn't changed, and 
+         - "errors" : a dictionary of errors, keyed by the ID of the transcript that
+           couldn't be exported, which will be tried again next time.
+        :rtype: dict
+        """
+        if not os.path.exists(dir): os.makedirs(dir, exist_ok=True)
+        if not isinstance(manifest, Manifest):
+            manifest = Manifest(manifest or os.path.join(dir, ".manifest.jsonl"))
+        ids = list(ids)
+        signatures = {}
+        if attributes != None and len(attributes) > 0 and len(ids) > 0:
+            values = Attributes._readAttributes(
+                self._getTranscriptAttributes(ids, attributes, useCache=False))
+            signatures = dict((id, Attributes._signature(values.get(id, []))) for id in ids)
+        settings = { "layerIds" : list(layerIds), "mimeType" : mimeType }
+        result = { "exported" : [], "unchanged" : [], "skipped" : [], "errors" : {} }
+
+        toExport = []
+        for id in ids:
+            entry = manifest.get(id)
+            if not full and entry != None and id in signatures \
+               and entry.get("signature") == signatures[id] \
+               and entry.get("settings") == settings \
+               and all(os.path.exists(os.path.join(dir, name)) for name in entry["files"]):
+                result["skipped"].append(id)
+            else:
+                toExport.append(id)
+
+        done = 0
+        for index, entries, exception in self._mapConcurrently(
+                lambda id: list(self.formatTranscriptEntries(id, layerIds, mimeType)),
+                toExport, maxWorkers, False, retries):
+            id = toExport[index]
+            if exception != None:
+                result["errors"][id] = exception
+            else:
+                previousFiles = (manifest.get(id) or {}).get("files", {})
+                files = {}
+                for name, content in entries:
+                    fileName = ZipStream._safePath(dir, name)
+                    name = os.path.relpath(fileName, dir)
+                    files[name] = hashlib.sha256(content).hexdigest()
+                    if previousFiles.get(name) != files[name] or not os.path.exists(fileName):
+                        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+                        with open(fileName + ".part", "wb") as f:
+                            f.write(content)
+                        os.replace(fileName + ".part", fileName)
+                manifest.put(id, { "signature" : signatures.get(id), "settings" : settings,
+                                   "files" : files })
+                result["unchanged" if files == previousFiles else "exported"].append(id)
+            done = done + 1
+            if progress != None: progress(done, len(toExport))
+        return(result)
 
     def getSerializerDescriptors(self):
         """ Lists the descriptors of all registered serializers.        
@@ -2474,9 +4244,21 @@ class LabbcatView:
             else:
                 raise x        
 
-    def getDictionaryEntries(self, managerId, dictionaryId, keys):
+    def getDictionaryEntries(self, managerId, dictionaryId, keys, chunkSize=10000, maxWorkers=4):
         """ Lookup entries in a dictionary.
         
+        A long list of keys is split into chunks of *chunkSize* keys, which are looked up
+        separately (up to *maxWorkers* at once). If the *dictionaryCache* attribute is set
+        to a `Cache <#labbcat.Cache>`_, entries found are kept there, so that keys that
+        have been looked up before needn't be requested again.
+        
+        Example::
+        
+            # cache entries for up to a million keys
+            corpus.dictionaryCache = labbcat.Cache(maxEntries=1000000, ttl=None)
+            pronunciations = corpus.getDictionaryEntries(
+                "CELEX-EN", "Phonology (wordform)", wordTypes)
+        
         :param managerId: The layer manager ID of the dictionary, as returned by 
          `getDictionaries() <#labbcat.LabbcatView.getDictionaries>`_).
         :type managerId: str
@@ -2488,72 +4270,88 @@ class LabbcatView:
         :param keys: A list of keys (words) identifying entries to look up.
         :type keys: list of str or list of dict
         
+        :param chunkSize: The maximum number of keys to look up in one request, or None
+         to look them all up at once.
+        :type chunkSize: int
+        
+        :param maxWorkers: The maximum number of chunks to look up at once.
+        :type maxWorkers: int
+        
         :returns: A dictionary of lists, where keys are given keys, each of which
          containing a list of entries. Keys with no corresponding entry in the given
          dictionary will be present in the returned result, but will have no entries.
         :rtype: dict of lists
         """
+        keys = list(dict.fromkeys(keys)) # without duplicates
         if self.verbose:
-            print("getDictionaryEntries " + managerId + ", " + dictionaryId + ", " + str(keys))
-        # save keys to a CSV file
-        fd, fileName = tempfile.mkstemp(".csv", "labbcat-py-getDictionaryEntries-")
-        if self.verbose: print("keys file: " + fileName)
-        with open(fileName, "w") as file:
-            file.write("Word\n") # header
+            print("getDictionaryEntries " + managerId + ", " + dictionaryId + ", "
+                  + str(len(keys)) + " keys")
+        cache = self.dictionaryCache
+        dictionary = {}
+        missing = keys
+        if cache != None:
+            missing = []
             for key in keys:
-                file.write(key + "\n")
-        os.close(fd)
-        
-        # make request
-        files = {}
-        f = open(fileName, 'r')
-        files["uploadfile"] = (fileName, f)
-        try:
-            # fall back to old API
+                entries = cache.get(("dictionary", managerId, dictionaryId, key))
+                if entries == None:
+                    missing.append(key)
+                else:
+                    dictionary[key] = list(entries)
+        if len(missing) == 0: return(dictionary)
+        
+        if chunkSize == None: chunkSize = len(missing)
+        chunks = [ missing[i:i+chunkSize] for i in range(0, len(missing), chunkSize) ]
+        for index, entriesByKey, exception in self._mapConcurrently(
+                lambda chunk: self._lookupDictionaryEntries(managerId, dictionaryId, chunk),
+                chunks, maxWorkers, False, 2):
+            if exception != None: raise exception
+            for key, entries in entriesByKey.items():
+                if cache != None:
+                    cache.put(("dictionary", managerId, dictionaryId, key), tuple(entries))
+                dictionary[key] = entries
+        return(dictionary)
+    
+    def _lookupDictionaryEntries(self, managerId, dictionaryId, keys):
+        """ Implements getDictionaryEntries for a single chunk of keys, with the request
+        and response bodies held in memory. """
+        # keys are uploaded one per line, with a header, as a CSV file
+        body = ("Word\n" + "".join([ key + "\n" for key in keys ])).encode("utf-8")
+        params = { "managerId" : managerId, "dictionaryId" : dictionaryId }
+        response = self._postMultipartRequestRaw(
+            self._labbcatUrl("api/dictionary"), params,
+            { "uploadfile" : ("keys.csv", io.BytesIO(body)) })
+        if response.status_code == 404: # fall back to old API
             response = self._postMultipartRequestRaw(
-                self._labbcatUrl("api/dictionary"), {
-                    "managerId" : managerId,
-                    "dictionaryId" : dictionaryId
-                }, files)
-            # ensure status was ok
-            response.raise_for_status()
-        except ResponseException as x:
-            if x.response.code == 404: # fall back to old API
-                response = self._postMultipartRequestRaw(
-                    self._labbcatUrl("dictionary"), {
-                        "managerId" : managerId,
-                        "dictionaryId" : dictionaryId
-                    }, files)
-            else:
-                raise x        
-        
-        # tidily remove upload file
-        os.remove(fileName)
+                self._labbcatUrl("dictionary"), params,
+                { "uploadfile" : ("keys.csv", io.BytesIO(body)) })
         
         # ensure status was ok
         response.raise_for_status()
-
-        # save response to file
-        if self.verbose: print("saving result to file: " + fileName)
-        with open(fileName, "wb") as file:
-            file.write(response.content)
         
         # load the returned entries into a dict
         dictionary = {}
-        with open(fileName) as csvDataFile:
-            csvReader = csv.reader(csvDataFile)
-            for row in csvReader:
-                # first column is the key, the rest are entries
-                key = row[0]
-                entries = row[1:]
-                if len(entries) == 1 and entries[0] == "":
-                    entries = []
-                dictionary[key] = entries
-        
-        # tidily remove the downloaded file
-        os.remove(fileName)
-        
-        return(dictionary)    
+        for row in csv.reader(io.StringIO(response.content.decode("utf-8"), newline="")):
+            if len(row) == 0: continue
+            # first column is the key, the rest are entries
+            key = row[0]
+            entries = row[1:]
+            if len(entries) == 1 and entries[0] == "":
+                entries = []
+            dictionary[key] = entries
+        return(dictionary)
+    
+    def _dictionaryChanged(self, managerId=None, dictionaryId=None, key=None):
+        """ Called when dictionary entries are changed, to remove them from
+        dictionaryCache, and notify listeners (e.g. DictionarySnapshots). None matches any
+        manager, dictionary, or key. """
+        if self.dictionaryCache != None:
+            self.dictionaryCache.invalidate(
+                lambda k: k[0] == "dictionary"
+                and (managerId == None or k[1] == managerId)
+                and (dictionaryId == None or k[2] == dictionaryId)
+                and (key == None or k[3] == key))
+        for listener in list(self._dictionaryListeners):
+            listener(managerId, dictionaryId, key)
         
     # TODO getFragment
     # TODO getFragmentSeries
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+
+class Manifest:
+    """ A record of the items a bulk operation has completed, for resuming the operation
+    after a crash, or making later runs incremental.
+
+    Each item (e.g. an exported transcript) has an entry, which is a dictionary of
+    whatever information is needed to decide whether the item needs processing again;
+    e.g. a signature of its attributes, and the hashes of the files produced.
+
+    The manifest is stored in a file with one JSON line per entry. Each entry is appended
+    (and flushed) as soon as it's recorded, so if the process is interrupted, no completed
+    work is lost; if an item is recorded more than once, the last entry wins. The file can
+    be rewritten without superseded entries using *compact*.
+
+    The manifest can be safely updated by several threads at once.
+
+    Constructor arguments:
+
+    :param fileName: The manifest file, which is created if it doesn't exist.
+    :type fileName: str
+
+    Example::
+
+        # download media, picking up where a previous run left off
+        manifest = labbcat.Manifest("media/manifest.jsonl")
+        for id in corpus.getTranscriptIds():
+            if id not in manifest:
+                fileName = corpus.getMedia(id, "", "audio/wav", dir="media")
+                manifest.put(id, { "fileName" : fileName })
+    """
+
+    def __init__(self, fileName):
+        """ Constructor. """
+        self.fileName = fileName
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._partialLine = False # whether the file ends with an incomplete line
+        if os.path.exists(fileName):
+            with open(fileName, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._partialLine = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # a partly written last line
+                        continue
+                    if record.get("removed"):
+                        self._entries.pop(record["id"], None)
+                    else:
+                        self._entries[record["id"]] = record["entry"]
+
+    def __contains__(self, id):
+        return(id in self._entries)
+
+    def __len__(self):
+        return(len(self._entries))
+
+    def ids(self):
+        """ Lists the IDs of recorded items.
+
+        :returns: A list of IDs, in the order they were first recorded.
+        :rtype: list of str
+        """
+        return(list(self._entries.keys()))
+
+    def get(self, id):
+        """ Gets the entry for an item.
+
+        :param id: The item ID.
+        :type id: str
+
+        :returns: The entry, or None if the item hasn't been recorded.
+        :rtype: dict
+        """
+        return(self._entries.get(id))
+
+    def put(self, id, entry):
+        """ Records an item as completed.
+
+        :param id: The item ID.
+        :type id: str
+
+        :param entry: Information about the completed item, which must be serializable as
+         JSON.
+        :type entry: dict
+        """
+        self._append({ "id" : id, "entry" : entry })
+        self._entries[id] = entry
+
+    def remove(self, id):
+        """ Removes the entry for an item, if there is one, so that it will be processed
+        again.
+
+        :param id: The item ID.
+        :type id: str
+        """
+        if id in self._entries:
+            self._append({ "id" : id, "removed" : True })
+            self._entries.pop(id, None)
+
+    def compact(self):
+        """ Rewrites the manifest file with only the current entries. """
+        with self._lock:
+            temporaryFile = self.fileName + ".part"
+            with open(temporaryFile, "w", encoding="utf-8") as f:
+                for id, entry in self._entries.items():
+                    f.write(json.dumps({ "id" : id, "entry" : entry }) + "\n")
+            os.replace(temporaryFile, self.fileName)
+            self._partialLine = False
+
+    def _append(self, record):
+        with self._lock:
+            directory = os.path.dirname(self.fileName)
+            if directory != "" and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            with open(self.fileName, "a", encoding="utf-8") as f:
+                if self._partialLine: # left by an interrupted write
+                    f.write("\n")
+                    self._partialLine = False
+                f.write(json.dumps(record) + "\n")
+                f.flush()
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# file locking is platform-specific
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class MediaCache:
+    """ An on-disk cache of media files, which LabbcatView.getMedia can use to avoid
+    downloading the same media again and again.
+
+    Files are stored under a key computed from the request (transcript ID, track suffix,
+    MIME type, and offsets), so the same request made by any job, in any process, is
+    served from the same file. When the total size of the cache exceeds *maxBytes*,
+    the least recently used files are deleted.
+
+    If *revalidate* is True, each time a cached file is used, the server is asked whether
+    the media has changed since it was downloaded (using the ETag and Last-Modified headers
+    the server returned with it), and it's only downloaded again if it has. Media for which
+    the server returns neither header are always downloaded again. If *revalidate* is False,
+    cached files are used without consulting the server.
+
+    The cache can be safely shared by several threads and processes, as access to it is
+    serialized using a lock file in the cache directory.
+
+    Constructor arguments:
+
+    :param dir: The directory in which to store files, which will be created if it
+     doesn't exist.
+    :type dir: str
+
+    :param maxBytes: The maximum total size of cached files, in bytes.
+    :type maxBytes: int
+
+    :param revalidate: Whether to check with the server that cached media is up to date
+     before using it.
+    :type revalidate: boolean
+
+    Example::
+
+        import labbcat
+
+        corpus = labbcat.LabbcatView("https://labbcat.canterbury.ac.nz", "demo", "demo")
+        # cache up to 50GB of media between jobs
+        corpus.mediaCache = labbcat.MediaCache(
+            os.path.expanduser("~/.labbcat-media"), maxBytes=50*1024**3)
+
+        # the first call downloads the file, later calls (in this or any other job) copy it
+        # from the cache
+        wav = corpus.getMedia("AP511_MikeThorpe.eaf", "", "audio/wav")
+    """
+
+    def __init__(self, dir, maxBytes=10*1024**3, revalidate=True):
+        """ Constructor. """
+        self.dir = dir
+        self.maxBytes = maxBytes
+        self.revalidate = revalidate
+        self._threadLock = threading.RLock()
+        if not os.path.exists(dir):
+            os.makedirs(dir, exist_ok=True)
+
+    def key(self, *parts):
+        """ Generates a cache key from the given parts of a request.
+
+        :returns: The SHA-256 hash of the parts, as a hexadecimal string.
+        :rtype: str
+        """
+        return(hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        """ Gets the metadata of a cached file, marking the file as recently used.
+
+        :param key: The cache key.
+        :type key: str
+
+        :returns: The metadata stored with the file, or None if it's not in the cache.
+        :rtype: dict
+        """
+        with self._lock():
+            dataFile, metadataFile = self._files(key)
+            if not os.path.exists(dataFile) or not os.path.exists(metadataFile):
+                return(None)
+            os.utime(dataFile)
+            with open(metadataFile, "r", encoding="utf-8") as f:
+                return(json.load(f))
+
+    def newFile(self):
+        """ Creates an empty temporary file in the cache directory, for downloading into.
+        Once downloaded, the file can be added to the cache using *put*.
+
+        :returns: The name of the file.
+        :rtype: str
+        """
+        fd, fileName = tempfile.mkstemp(".part", "download-", self.dir)
+        os.close(fd)
+        return(fileName)
+
+    def put(self, key, fileName, metadata, destination=None):
+        """ Adds a file to the cache, evicting least recently used files if the cache is
+        too large.
+
+        :param key: The cache key.
+        :type key: str
+
+        :param fileName: The file to add, which must be in the cache directory (see
+         *newFile*), and which is moved into the cache.
+        :type fileName: str
+
+        :param metadata: Information to store with the file, e.g. validation headers.
+        :type metadata: dict
+
+        :param destination: A file name to also copy the file to, if any.
+        :type destination: str
+
+        :returns: *destination*
+        :rtype: str
+        """
+        with self._lock():
+            dataFile, metadataFile = self._files(key)
+            os.makedirs(os.path.dirname(dataFile), exist_ok=True)
+            metadataTemp = metadataFile + ".part"
+            with open(metadataTemp, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+            os.replace(fileName, dataFile)
+            os.replace(metadataTemp, metadataFile)
+            if destination != None:
+                self._copy(dataFile, destination)
+            self._evict(key)
+        return(destination)
+
+    def copy(self, key, destination):
+        """ Copies a cached file, marking it as recently used. The destination is an
+        independent copy, so it can be changed, and is unaffected if the file is later
+        evicted.
+
+        :param key: The cache key.
+        :type key: str
+
+        :param destination: The file name to copy the file to.
+        :type destination: str
+
+        :returns: *destination*, or None if the file is not in the cache.
+        :rtype: str
+        """
+        with self._lock():
+            dataFile, metadataFile = self._files(key)
+            if not os.path.exists(dataFile):
+                return(None)
+            os.utime(dataFile)
+            self._copy(dataFile, destination)
+        return(destination)
+
+    def remove(self, key):
+        """ Removes a file from the cache, if it's there.
+
+        :param key: The cache key.
+        :type key: str
+        """
+        with self._lock():
+            self._remove(key)
+
+    def clear(self):
+        """ Removes all files from the cache. """
+        with self._lock():
+            for key, size, used in self._entries():
+                self._remove(key)
+
+    def size(self):
+        """ Gets the total size of the files in the cache.
+
+        :returns: The total size in bytes.
+        :rtype: int
+        """
+        with self._lock():
+            return(sum(size for key, size, used in self._entries()))
+
+    def _files(self, key):
+        """ The data and metadata file names for the given key. """
+        dataFile = os.path.join(self.dir, key[:2], key)
+        return(dataFile, dataFile + ".json")
+
+    def _remove(self, key):
+        """ Removes the files for the given key, without locking. """
+        for f in self._files(key):
+            if os.path.exists(f):
+                os.remove(f)
+
+    def _copy(self, dataFile, destination):
+        """ Copies a cached file to the destination. It's not linked, so that changing the
+        destination can't change the cached file. """
+        if os.path.exists(destination):
+            os.remove(destination)
+        shutil.copyfile(dataFile, destination)
+
+    def _entries(self):
+        """ Lists cached files as (key, size, lastUsed) tuples. """
+        entries = []
+        for subdir in os.listdir(self.dir):
+            path = os.path.join(self.dir, subdir)
+            if len(subdir) != 2 or not os.path.isdir(path): continue
+            for name in os.listdir(path):
+                if name.endswith(".json") or name.endswith(".part"): continue
+                stat = os.stat(os.path.join(path, name))
+                entries.append((name, stat.st_size, stat.st_mtime))
+        return(entries)
+
+    def _evict(self, keep):
+        """ Removes least recently used files until the cache is no larger than maxBytes.
+        The file with key *keep* is never removed. Downloads abandoned by processes that
+        were killed are also removed. """
+        self._removeAbandonedDownloads()
+        entries = self._entries()
+        total = sum(size for key, size, used in entries)
+        for key, size, used in sorted(entries, key=lambda e: e[2]):
+            if total <= self.maxBytes: break
+            if key == keep: continue
+            self._remove(key)
+            total = total - size
+
+    def _removeAbandonedDownloads(self, maxAge=24*60*60):
+        """ Removes download files (see *newFile*), including partial downloads, that
+        haven't been modified for *maxAge* seconds. Downloads that fail are removed
+        straight away, but those of processes that are killed are left behind. """
+        threshold = time.time() - maxAge
+        for name in os.listdir(self.dir):
+            path = os.path.join(self.dir, name)
+            if name.startswith("download-") and os.path.isfile(path):
+                try:
+                    if os.path.getmtime(path) < threshold: os.remove(path)
+                except OSError: # removed by another process
+                    pass
+
+    @contextmanager
+    def _lock(self):
+        """ Holds an exclusive lock on the cache, across threads and processes. """
+        with self._threadLock:
+            with open(os.path.join(self.dir, ".lock"), "a+b") as lockFile:
+                if fcntl != None:
+                    fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX)
+                else:
+                    lockFile.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(lockFile.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError: # LK_LOCK gives up after 10 seconds
+                            pass
+                try:
+                    yield
+                finally:
+                    if fcntl != None:
+                        fcntl.flock(lockFile.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lockFile.seek(0)
+                        msvcrt.locking(lockFile.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,366 @@
+import functools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from labbcat.Audio import _readWav
+
+# numpy is an optional dependency, only required for local acoustic measurement
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the 'interpolation depth' Praat uses for each value interpolation option
+_interpolationDepths = { "nearest" : 0, "linear" : 1, "cubic" : 2, "sinc70" : 70, "sinc700" : 700 }
+
+# how Praat prints undefined values
+_undefined = "--undefined--"
+
+def numpyIntensity(minimumPitch = 100.0, timeStep = 0.0, subtractMean = True, getMaximum = True, samplePoints = None, interpolation = 'cubic', skipErrors = True):
+    """
+    Generates a measure for extracting intensity locally, for use with
+    `processWithNumPy() <#labbcat.processWithNumPy>`_
+
+    This is the local equivalent of
+    `praatScriptIntensity() <#labbcat.praatScriptIntensity>`_; it implements Praat's
+    "To Intensity..." algorithm using NumPy, and produces the same output columns, so that
+    simple intensity measurements can be made without using the server's Praat instances.
+
+    :param minimumPitch: Minimum pitch (Hz).
+    :type minimumPitch: float
+
+    :param timeStep: Time step in seconds, or 0.0 for 'auto'.
+    :type timeStep: float
+
+    :param subtractMean: Whether to subtract the mean or not.
+    :type subtractMean: boolean
+
+    :param getMaximum: Extract the maximum intensity for the sample.
+    :type getMaximum: boolean
+
+    :param samplePoints: A list of numbers (0 <= samplePoints <= 1) specifying multiple
+     points at which to take the measurement.  The default is None, meaning no
+     individual measurements will be taken (only the aggregate values identified by
+     getMaximum).
+    :type samplePoints: list of float
+
+    :param interpolation: If samplePoints are specified, this is the interpolation to use
+     when getting individual values. Possible values are 'nearest', 'linear', 'cubic',
+     'sinc70', or 'sinc700'.
+    :type interpolation: str
+
+    :param skipErrors: If the sound is too short for intensity analysis and skipErrors is
+     True, the values for that sound will be returned as "--undefined--". If skipErrors
+     is False, an error message is returned in the Error field instead.
+    :type skipErrors: boolean
+
+    :returns: A measure which can be passed as the *measures* parameter of
+              `processWithNumPy() <#labbcat.processWithNumPy>`_
+    :rtype: callable
+    """
+    if interpolation not in _interpolationDepths:
+        raise ValueError("Invalid interpolation: " + str(interpolation))
+    return functools.partial(
+        _intensity, minimumPitch=minimumPitch, timeStep=timeStep, subtractMean=subtractMean,
+        getMaximum=getMaximum, samplePoints=samplePoints, interpolation=interpolation,
+        skipErrors=skipErrors)
+
+def numpyCentreOfGravity(powers = [2], spectrumFast = True):
+    """ Generates a measure for extracting the CoG locally, for use with
+    `processWithNumPy() <#labbcat.processWithNumPy>`_
+
+    This is the local equivalent of
+    `praatScriptCentreOfGravity() <#labbcat.praatScriptCentreOfGravity>`_; it implements
+    Praat's "To Spectrum" and "Get centre of gravity..." using NumPy, and produces the
+    same output columns.
+
+    :param powers: A list of numbers specifying which powers to query for to extract,
+                   e.g. [1,2].
+    :type powers: list of float
+
+    :param spectrumFast: Whether to use the 'fast' option when creating the spectrum,
+                         i.e. zero-pad the sound to a power of two samples.
+    :type spectrumFast: boolean
+
+    :returns: A measure which can be passed as the *measures* parameter of
+              `processWithNumPy() <#labbcat.processWithNumPy>`_
+    :rtype: callable
+    """
+    return functools.partial(_centreOfGravity, powers=powers, spectrumFast=spectrumFast)
+
+def processWithNumPy(measures, windowOffset, wavFiles, startOffsets=None, maxWorkers=None):
+    """
+    Process a set of WAV files locally, using NumPy.
+
+    This function is a local alternative to
+    `processWithPraat() <#labbcat.LabbcatView.processWithPraat>`_ for measures that
+    don't need Praat itself. The WAV files are typically those returned by
+    `getSoundFragments() <#labbcat.LabbcatView.getSoundFragments>`_, and the measures
+    are generated by
+
+    - `numpyCentreOfGravity() <#labbcat.numpyCentreOfGravity>`_
+    - `numpyIntensity() <#labbcat.numpyIntensity>`_
+
+    The files are processed in parallel by a pool of processes, and the results have the
+    same columns as those returned by processWithPraat for the equivalent Praat scripts.
+
+    Example::
+
+        # get sound fragments for the matches, with 25ms context either side
+        wavs = corpus.getSoundFragments(
+            [ m["Transcript"] for m in matches ],
+            [ s["start"]["offset"] - 0.025 for s in segments ],
+            [ s["end"]["offset"] + 0.025 for s in segments ])
+
+        # measure CoG and max intensity locally
+        measures = labbcat.processWithNumPy(
+            [ labbcat.numpyCentreOfGravity(), labbcat.numpyIntensity() ], 0.025, wavs,
+            [ s["start"]["offset"] for s in segments ])
+
+    :param measures: A measure, or list of measures, to compute for each file.
+    :type measures: callable or list of callable
+
+    :param windowOffset: How much context (in seconds) each WAV file includes before and
+     after the target interval; i.e. the window offset used when extracting the fragments.
+    :type windowOffset: float
+
+    :param wavFiles: A list of WAV files, one for each target interval. Elements may be
+     None (e.g. where getSoundFragments failed to download a fragment), in which case the
+     corresponding result has an Error.
+    :type wavFiles: list of str
+
+    :param startOffsets: Optional list of the start offsets of each target interval in the
+     original recording, which are used to compute absolute time columns. If None, times
+     are relative to the start of the target interval.
+    :type startOffsets: list of float or None
+
+    :param maxWorkers: The maximum number of processes to use, None for the number of
+     processors on the machine, or 1 to process files in the calling process.
+    :type maxWorkers: int or None
+
+    :returns: A list of dictionaries of acoustic measurements, one for each WAV file.
+    :rtype: list of dict
+    """
+    if numpy is None:
+        raise ImportError("processWithNumPy requires numpy - pip install numpy")
+    if callable(measures):
+        measures = [ measures ]
+    if startOffsets != None and len(startOffsets) != len(wavFiles):
+        raise ValueError("wavFiles ("+str(len(wavFiles))+") and startOffsets ("
+                         +str(len(startOffsets))+") must be the same length.")
+    if startOffsets == None:
+        startOffsets = [ 0.0 ] * len(wavFiles)
+    process = functools.partial(_processWav, measures, windowOffset)
+    if maxWorkers == 1 or len(wavFiles) <= 1:
+        return(list(map(process, wavFiles, startOffsets)))
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        return(list(executor.map(process, wavFiles, startOffsets, chunksize=16)))
+
+def _processWav(measures, windowOffset, wavFile, startOffset):
+    """ Computes the given measures for one WAV file. """
+    result = {}
+    try:
+        if wavFile == None:
+            raise Exception("No sound file")
+        samples, sampleRate = _readWav(wavFile)
+        windowDuration = samples.shape[1] / sampleRate
+        # the same variables that LaBB-CAT defines for Praat scripts
+        target = {
+            "windowOffset" : windowOffset,
+            "windowDuration" : windowDuration,
+            "targetStart" : windowOffset,
+            "targetEnd" : windowDuration - windowOffset,
+            "targetDuration" : windowDuration - 2 * windowOffset,
+            "targetAbsoluteStart" : startOffset,
+            "targetAbsoluteEnd" : startOffset + windowDuration - 2 * windowOffset
+        }
+        for measure in measures:
+            result.update(measure(samples, sampleRate, target))
+        result["Error"] = ""
+    except Exception as x:
+        result["Error"] = str(x)
+    return(result)
+
+def _centreOfGravity(samples, sampleRate, target, powers, spectrumFast):
+    """ Implements Praat's "To Spectrum" followed by "Get centre of gravity". """
+    count = samples.shape[1]
+    fftSize = count
+    if spectrumFast:
+        fftSize = 1 << max(0, (count - 1).bit_length())
+    # Praat creates a spectrum of the first channel only
+    spectrum = numpy.fft.rfft(samples[0], fftSize)
+    energy = spectrum.real**2 + spectrum.imag**2
+    frequencies = numpy.arange(len(spectrum)) * (sampleRate / fftSize)
+    result = {}
+    for power in powers:
+        varname = "cog_"+str(power).replace(".","_")
+        weights = energy if power == 2 else energy ** (power / 2)
+        total = weights.sum()
+        if total == 0.0:
+            result[varname] = _undefined
+        else:
+            result[varname] = _praatRound((frequencies * weights).sum() / total)
+    return(result)
+
+def _intensity(samples, sampleRate, target, minimumPitch, timeStep, subtractMean, getMaximum, samplePoints, interpolation, skipErrors):
+    """ Implements Praat's "To Intensity" and the subsequent queries generated by
+    praatScriptIntensity. """
+    contour = None
+    try:
+        contour = _intensityContour(samples, sampleRate, minimumPitch, timeStep, subtractMean)
+    except ValueError:
+        if not skipErrors: raise
+
+    result = {}
+    if getMaximum:
+        if contour is None:
+            result["maxIntensity"] = _undefined
+        else:
+            result["maxIntensity"] = _getMaximum(
+                contour, target["targetStart"], target["targetEnd"])
+    if samplePoints != None:
+        for point in samplePoints:
+            varname = "time_"+str(point).replace(".","_")+"_for_intensity"
+            result[varname] = target["targetAbsoluteStart"] + point * target["targetDuration"]
+            varname = "intensity_time_"+str(point).replace(".","_")
+            if contour is None:
+                result[varname] = _undefined
+            else:
+                value = _getValueAtTime(
+                    contour, target["targetStart"] + point * target["targetDuration"],
+                    _interpolationDepths[interpolation])
+                result[varname] = _undefined if value is None else _praatRound(value)
+    return(result)
+
+def _intensityContour(samples, sampleRate, minimumPitch, timeStep, subtractMean):
+    """ Computes the intensity contour of the given samples the way Praat does.
+    Returns a tuple: (first frame time, time step, array of dB values) """
+    dx = 1.0 / sampleRate
+    if timeStep <= 0.0:
+        timeStep = 0.8 / minimumPitch # Praat's default: four times oversampling
+    windowDuration = 6.4 / minimumPitch
+    halfWindowDuration = 0.5 * windowDuration
+    halfWindowSamples = int(math.floor(halfWindowDuration / dx))
+    channels, count = samples.shape
+    duration = count * dx
+    if windowDuration > duration:
+        raise ValueError(
+            "The duration of the sound in an intensity analysis should be at least 6.4"
+            " divided by the minimum pitch ("+str(minimumPitch)+" Hz), i.e. at least "
+            +str(windowDuration)+" s, instead of "+str(duration)+" s.")
+
+    # Kaiser-like window
+    offsets = numpy.arange(-halfWindowSamples, halfWindowSamples + 1)
+    x = offsets * dx / halfWindowDuration
+    root = 1 - x * x
+    window = numpy.where(
+        root <= 0.0, 0.0,
+        numpy.i0((2 * math.pi * math.pi + 0.5) * numpy.sqrt(numpy.maximum(root, 0.0))))
+
+    # frame timing
+    frameCount = int(math.floor((duration - windowDuration) / timeStep)) + 1
+    firstTime = 0.5 * duration - 0.5 * frameCount * timeStep + 0.5 * timeStep
+    midTimes = firstTime + numpy.arange(frameCount) * timeStep
+    # nearest sample to each frame's mid-time (samples are centred at (i+0.5)*dx)
+    midSamples = numpy.floor(midTimes / dx).astype(numpy.int64)
+
+    # one row of sample indices for each frame, masking those outside the sound
+    indices = midSamples[:,None] + offsets[None,:]
+    valid = (indices >= 0) & (indices < count)
+    indices = numpy.clip(indices, 0, count - 1)
+    weights = window[None,:] * valid
+    sumxw = numpy.zeros(frameCount)
+    sumw = numpy.zeros(frameCount)
+    for channel in range(channels):
+        amplitude = samples[channel][indices] * valid
+        if subtractMean:
+            mean = amplitude.sum(axis=1) / valid.sum(axis=1)
+            amplitude = (amplitude - mean[:,None]) * valid
+        sumxw += (amplitude * amplitude * weights).sum(axis=1)
+        sumw += weights.sum(axis=1)
+    intensity = sumxw / sumw / 4e-10
+    with numpy.errstate(divide="ignore"):
+        decibels = numpy.where(intensity < 1e-30, -300.0, 10.0 * numpy.log10(intensity))
+    return((firstTime, timeStep, decibels))
+
+def _getMaximum(contour, xmin, xmax):
+    """ Implements Praat's Intensity "Get maximum..." with parabolic interpolation. """
+    x1, dx, y = contour
+    n = len(y)
+    # 1-based indices of frames within the window, as Sampled_getWindowSamples
+    imin = max(1, int(math.ceil((xmin - x1) / dx)) + 1)
+    imax = min(n, int(math.floor((xmax - x1) / dx)) + 1)
+    if imax < imin:
+        # no frames in the window, so take the greater of the values at the edges
+        yleft = _getValueAtTime(contour, xmin, 1)
+        yright = _getValueAtTime(contour, xmax, 1)
+        if yleft is None or yright is None:
+            return(_undefined)
+        return(max(yleft, yright))
+    maximum = max(y[imin - 1], y[imax - 1])
+    for i in range(max(imin, 2), min(imax, n - 1) + 1):
+        left, mid, right = y[i - 2], y[i - 1], y[i]
+        if mid > left and mid >= right:
+            dy = 0.5 * (right - left)
+            d2y = 2.0 * mid - left - right
+            localMaximum = mid + 0.5 * dy * dy / d2y
+            if localMaximum > maximum:
+                maximum = localMaximum
+    return(float(maximum))
+
+def _getValueAtTime(contour, time, depth):
+    """ Implements Praat's Vector_getValueAtX, returning None if the value is undefined. """
+    x1, dx, y = contour
+    n = len(y)
+    leftEdge = x1 - 0.5 * dx
+    if time < leftEdge or time > leftEdge + n * dx:
+        return(None)
+    return(_interpolateSinc(y, (time - x1) / dx + 1, depth))
+
+def _interpolateSinc(y, x, maxDepth):
+    """ Implements Praat's NUM_interpolate_sinc, where x is a 1-based real index. """
+    n = len(y)
+    midleft = int(math.floor(x))
+    midright = midleft + 1
+    if x > n: return(float(y[n - 1]))
+    if x < 1: return(float(y[0]))
+    if x == midleft: return(float(y[midleft - 1]))
+    maxDepth = min(maxDepth, midright - 1, n - midleft)
+    if maxDepth <= 0:
+        return(float(y[int(math.floor(x + 0.5)) - 1]))
+    if maxDepth == 1:
+        return(float(y[midleft - 1] + (x - midleft) * (y[midright - 1] - y[midleft - 1])))
+    if maxDepth == 2:
+        yl = y[midleft - 1]
+        yr = y[midright - 1]
+        dyl = 0.5 * (yr - y[midleft - 2])
+        dyr = 0.5 * (y[midright] - yl)
+        fil = x - midleft
+        fir = midright - x
+        return(float(yl * fir + yr * fil - fil * fir
+                     * (0.5 * (dyr - dyl) + (fil - 0.5) * (dyl + dyr - 2 * (yr - yl)))))
+    left = midright - maxDepth
+    right = midleft + maxDepth
+    result = 0.0
+    a = math.pi * (x - midleft)
+    halfsina = 0.5 * math.sin(a)
+    aa = a / (x - left + 1)
+    daa = math.pi / (x - left + 1)
+    for ix in range(midleft, left - 1, -1):
+        result += y[ix - 1] * halfsina / a * (1.0 + math.cos(aa))
+        a += math.pi
+        aa += daa
+        halfsina = -halfsina
+    a = math.pi * (midright - x)
+    halfsina = 0.5 * math.sin(a)
+    aa = a / (right - x + 1)
+    daa = math.pi / (right - x + 1)
+    for ix in range(midright, right + 1):
+        result += y[ix - 1] * halfsina / a * (1.0 + math.cos(aa))
+        a += math.pi
+        aa += daa
+        halfsina = -halfsina
+    return(float(result))
+
+def _praatRound(value):
+    """ Rounds a value the way Praat prints 'variable:0', and processWithPraat parses it. """
+    return(int(round(float(value))))
@@ -0,0 +1,152 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+class TimeIndex:
+    """ An index of the annotations on one layer of a Graph by time, for finding
+    annotations in a given time window without scanning the whole layer.
+
+    Annotations are sorted by start offset, and an interval tree (a balanced tree over the
+    sorted annotations, recording the earliest and latest end offset in each subtree)
+    allows overlap, containment, and nearest-boundary queries to take O(log n + k) time,
+    where n is the number of annotations on the layer, and k is the number found.
+    Annotations without both a start and end offset are not indexed.
+
+    A TimeIndex is usually obtained using Graph.timeIndex(layerId).
+
+    Constructor arguments:
+
+    :param graph: The graph to index.
+    :type graph: Graph
+
+    :param layerId: The ID of the layer to index.
+    :type layerId: str
+
+    Example::
+
+        graph = labbcat.Graph(corpus.getTranscript("AP511_MikeThorpe.eaf", ["word"]))
+        words = graph.layers["word"]
+        # all words spoken between 10s and 20s
+        for row in graph.timeIndex("word").overlapping(10.0, 20.0):
+            print(words.labels[row])
+    """
+
+    def __init__(self, graph, layerId):
+        """ Constructor. """
+        self.layerId = layerId
+        starts = graph.startOffsets(layerId)
+        ends = graph.endOffsets(layerId)
+        # annotations with both offsets, ordered by start then end
+        rows = sorted(
+            (row for row in range(len(starts))
+             if starts[row] == starts[row] and ends[row] == ends[row]), # not NaN
+            key=lambda row: (starts[row], ends[row]))
+        self.rows = array("l", rows)
+        self.starts = array("d", (starts[row] for row in rows))
+        self.ends = array("d", (ends[row] for row in rows))
+        self.boundaries = array("d", sorted(set(self.starts) | set(self.ends)))
+
+        # implicit binary trees over the sorted annotations, where node n has children
+        # 2n and 2n+1, and leaves start at self._size
+        size = 1
+        while size < len(rows): size = size * 2
+        self._size = size
+        self._maxEnds = array("d", [ float("-inf") ]) * (2 * size)
+        self._minEnds = array("d", [ float("inf") ]) * (2 * size)
+        for i in range(len(rows)):
+            self._maxEnds[size + i] = self.ends[i]
+            self._minEnds[size + i] = self.ends[i]
+        for node in range(size - 1, 0, -1):
+            self._maxEnds[node] = max(self._maxEnds[2*node], self._maxEnds[2*node + 1])
+            self._minEnds[node] = min(self._minEnds[2*node], self._minEnds[2*node + 1])
+
+    def __len__(self):
+        return(len(self.rows))
+
+    def _search(self, lo, hi, tree, prune):
+        """ Finds the sorted positions in [lo, hi) whose end offset doesn't satisfy prune,
+        skipping subtrees whose summary end offset satisfies prune. Returns layer rows, in
+        start offset order. """
+        found = []
+        stack = [ (1, 0, self._size) ]
+        while len(stack) > 0:
+            node, nodeLo, nodeHi = stack.pop()
+            if nodeHi <= lo or nodeLo >= hi or prune(tree[node]):
+                continue
+            if nodeHi - nodeLo == 1:
+                found.append(self.rows[nodeLo])
+            else:
+                middle = (nodeLo + nodeHi) // 2
+                # right first, so that left is popped first
+                stack.append((2*node + 1, middle, nodeHi))
+                stack.append((2*node, nodeLo, middle))
+        return(found)
+
+    def overlapping(self, start, end):
+        """ Finds annotations that overlap the given time window, i.e. that start before
+        *end* and end after *start*.
+
+        :param start: The start of the window.
+        :type start: float
+
+        :param end: The end of the window.
+        :type end: float
+
+        :returns: The rows of the annotations in the layer, in start offset order.
+        :rtype: list of int
+        """
+        return(self._search(
+            0, bisect_left(self.starts, end), self._maxEnds, lambda e: e <= start))
+
+    def within(self, start, end):
+        """ Finds annotations that are entirely within the given time window, i.e. that
+        start at or after *start* and end at or before *end*.
+
+        :param start: The start of the window.
+        :type start: float
+
+        :param end: The end of the window.
+        :type end: float
+
+        :returns: The rows of the annotations in the layer, in start offset order.
+        :rtype: list of int
+        """
+        return(self._search(
+            bisect_left(self.starts, start), bisect_right(self.starts, end),
+            self._minEnds, lambda e: e > end))
+
+    def containing(self, start, end=None):
+        """ Finds annotations that contain the given time window, i.e. that start at or
+        before *start* and end at or after *end*, or that contain the given point in time if
+        *end* is None.
+
+        :param start: The start of the window.
+        :type start: float
+
+        :param end: The end of the window, or None to use *start*.
+        :type end: float
+
+        :returns: The rows of the annotations in the layer, in start offset order.
+        :rtype: list of int
+        """
+        if end == None: end = start
+        return(self._search(
+            0, bisect_right(self.starts, start), self._maxEnds, lambda e: e < end))
+
+    def nearestBoundary(self, offset):
+        """ Finds the start or end offset of an annotation that's nearest the given offset;
+        e.g. for snapping a time to the nearest word boundary.
+
+        :param offset: The offset.
+        :type offset: float
+
+        :returns: The nearest boundary offset, or None if there are no annotations.
+        :rtype: float
+        """
+        boundaries = self.boundaries
+        if len(boundaries) == 0: return(None)
+        i = bisect_left(boundaries, offset)
+        if i == 0: return(boundaries[0])
+        if i == len(boundaries): return(boundaries[-1])
+        before = boundaries[i - 1]
+        after = boundaries[i]
+        return(before if offset - before <= after - offset else after)
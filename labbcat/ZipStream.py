@@ -0,0 +1,167 @@
+import os
+import struct
+import zlib
+
+# zip record signatures
+_LOCAL_HEADER = b"PK\x03\x04"
+_DATA_DESCRIPTOR = b"PK\x07\x08"
+_CENTRAL_HEADER = b"PK\x01\x02"
+
+# general purpose flags
+_ENCRYPTED = 0x1
+_HAS_DATA_DESCRIPTOR = 0x8
+_UTF8 = 0x800
+
+# compression methods
+_STORED = 0
+_DEFLATED = 8
+
+class _Reader:
+    """ Reads exact numbers of bytes from a stream, allowing over-read bytes to be
+    pushed back. """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b""
+
+    def read(self, count):
+        """ Reads *count* bytes, or fewer if the stream ends first. """
+        parts = [ self.buffer ]
+        length = len(self.buffer)
+        while length < count:
+            chunk = self.stream.read(max(count - length, 65536))
+            if not chunk: break
+            parts.append(chunk)
+            length = length + len(chunk)
+        data = b"".join(parts)
+        self.buffer = data[count:]
+        return(data[:count])
+
+    def unread(self, data):
+        """ Pushes bytes back, to be read again by the next read. """
+        self.buffer = data + self.buffer
+
+def _readUntilDescriptor(reader, name):
+    """ Reads the data of a stored entry whose size is given only in the data descriptor
+    that follows it, by scanning for the start of the next record and checking that
+    what precedes it is a descriptor matching the data before that.
+
+    Returns a (data, crc) tuple, having also consumed the descriptor. """
+    # possible descriptor layouts: (length, has signature, format of the crc and sizes)
+    layouts = [ (16, True, "<III"), (24, True, "<IQQ"),
+                (12, False, "<III"), (20, False, "<IQQ") ]
+    buffer = bytearray()
+    searched = 0
+    while True:
+        chunk = reader.read(65536)
+        if not chunk:
+            raise ValueError("Truncated zip entry: " + name)
+        buffer.extend(chunk)
+        for signature in [_LOCAL_HEADER, _CENTRAL_HEADER]:
+            position = buffer.find(signature, max(0, searched - 3))
+            while position >= 0:
+                for length, hasSignature, fields in layouts:
+                    end = position - length
+                    if end < 0: continue
+                    start = end
+                    if hasSignature:
+                        if buffer[end:end+4] != _DATA_DESCRIPTOR: continue
+                        start = end + 4
+                    crc, compressedSize, size = struct.unpack(fields, buffer[start:position])
+                    if compressedSize == end and size == end \
+                       and zlib.crc32(buffer[:end]) == crc:
+                        reader.unread(bytes(buffer[position:]))
+                        return(bytes(buffer[:end]), crc)
+                position = buffer.find(signature, position + 1)
+        searched = len(buffer)
+
+def _zipEntries(stream):
+    """ Extracts the files in a zip archive as it's read from a stream (e.g. an HTTP
+    response), without needing the whole archive to be saved first.
+
+    This works by reading the local header that precedes each file in the archive, so the
+    central directory at the end is ignored. Entries for directories are skipped.
+
+    Yields a (name, bytes) tuple for each file. Raises ValueError if the archive can't be
+    read this way. """
+    reader = _Reader(stream)
+    while True:
+        if reader.read(4) != _LOCAL_HEADER:
+            return # reached the central directory, or the end of the stream
+        header = reader.read(26)
+        if len(header) < 26:
+            raise ValueError("Truncated zip entry header")
+        version, flags, method, time, date, crc, compressedSize, size, nameLength, \
+            extraLength = struct.unpack("<HHHHHIIIHH", header)
+        name = reader.read(nameLength).decode("utf-8" if flags & _UTF8 else "cp437")
+        extra = reader.read(extraLength)
+        if flags & _ENCRYPTED:
+            raise ValueError("Encrypted zip entries are not supported: " + name)
+
+        # is there a zip64 extra field?
+        zip64 = False
+        position = 0
+        while position + 4 <= len(extra):
+            fieldId, fieldLength = struct.unpack("<HH", extra[position:position+4])
+            if fieldId == 0x0001:
+                zip64 = True
+                field = extra[position+4:position+4+fieldLength]
+                if size == 0xFFFFFFFF and len(field) >= 8:
+                    size = struct.unpack("<Q", field[0:8])[0]
+                    field = field[8:]
+                if compressedSize == 0xFFFFFFFF and len(field) >= 8:
+                    compressedSize = struct.unpack("<Q", field[0:8])[0]
+            position = position + 4 + fieldLength
+
+        descriptorRead = False
+        if method == _STORED:
+            if flags & _HAS_DATA_DESCRIPTOR and compressedSize == 0 \
+               and not name.endswith("/"): # directories are empty
+                # the size isn't known until the descriptor after the data
+                data, crc = _readUntilDescriptor(reader, name)
+                descriptorRead = True
+            else:
+                data = reader.read(compressedSize)
+            if not descriptorRead and len(data) < compressedSize:
+                raise ValueError("Truncated zip entry: " + name)
+            compressedCount = len(data)
+        elif method == _DEFLATED:
+            # the deflate stream marks its own end, so the size need not be known
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            parts = []
+            compressedCount = 0
+            while not decompressor.eof:
+                chunk = reader.read(65536)
+                if not chunk:
+                    raise ValueError("Truncated zip entry: " + name)
+                parts.append(decompressor.decompress(chunk))
+                compressedCount = compressedCount + len(chunk)
+            reader.unread(decompressor.unused_data)
+            compressedCount = compressedCount - len(decompressor.unused_data)
+            data = b"".join(parts)
+        else:
+            raise ValueError(
+                "Unsupported zip compression method " + str(method) + ": " + name)
+
+        if flags & _HAS_DATA_DESCRIPTOR and not descriptorRead:
+            # the CRC and sizes follow the data, optionally preceded by a signature
+            descriptor = reader.read(4)
+            if descriptor == _DATA_DESCRIPTOR:
+                descriptor = reader.read(4)
+            crc = struct.unpack("<I", descriptor)[0]
+            large = zip64 or len(data) >= 0xFFFFFFFF or compressedCount >= 0xFFFFFFFF
+            reader.read(16 if large else 8)
+        if zlib.crc32(data) != crc:
+            raise ValueError("Zip entry CRC mismatch: " + name)
+
+        if not name.endswith("/"):
+            yield(name, data)
+
+def _safePath(dir, name):
+    """ The path in *dir* at which to save a zip entry, ensuring that names like
+    "../x" or "/x" can't be used to write files outside *dir*. """
+    parts = [ part for part in name.replace("\\", "/").split("/")
+              if part not in ["", ".", ".."] ]
+    if len(parts) > 0:
+        parts[0] = os.path.splitdrive(parts[0])[1] or "_"
+    return(os.path.join(dir, *parts))
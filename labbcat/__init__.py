@@ -4,13 +4,26 @@ from labbcat.LabbcatEdit import LabbcatEdit
 from labbcat.LabbcatAdmin import LabbcatAdmin
 from labbcat.Response import Response
 from labbcat.ResponseException import ResponseException
+from labbcat.MediaCache import MediaCache
+from labbcat.Cache import Cache
+from labbcat.DictionarySnapshot import DictionarySnapshot
+from labbcat.Graph import Graph
+from labbcat.Graph import Layer
+from labbcat.TimeIndex import TimeIndex
+from labbcat.CorpusMirror import CorpusMirror
+from labbcat.Manifest import Manifest
 from labbcat.AGQL import expressionFromAttributeValue
 from labbcat.AGQL import expressionFromAttributeValues
 from labbcat.AGQL import expressionFromIds
 from labbcat.AGQL import expressionFromTranscriptTypes
 from labbcat.AGQL import expressionFromCorpora
+from labbcat.AGQL import compileExpression
+from labbcat.AGQL import filterByExpression
 from labbcat.PraatScript import praatScriptFormants
 from labbcat.PraatScript import praatScriptFastTrack
 from labbcat.PraatScript import praatScriptCentreOfGravity
 from labbcat.PraatScript import praatScriptIntensity
 from labbcat.PraatScript import praatScriptPitch
+from labbcat.NumPyAcoustics import numpyCentreOfGravity
+from labbcat.NumPyAcoustics import numpyIntensity
+from labbcat.NumPyAcoustics import processWithNumPy
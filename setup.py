@@ -28,4 +28,5 @@ setup(
     packages=["labbcat"],
     include_package_data=False,
     install_requires=["requests"],
+    extras_require={"numpy": ["numpy"]},
 )
@@ -227,6 +227,63 @@ class TestAGQL(unittest.TestCase):
             labbcat.expressionFromCorpora(["CC","MU"], True),
             "multiple item list with negation")
 
+    def test_compileExpression(self):
+        attributes = {
+            "AP511_MikeThorpe.eaf" : {
+                "corpus" : [ "MU" ], "transcript_type" : [ "interview" ],
+                "transcript_language" : [ "en", "mi" ] },
+            "BR2044_OllyOhlson.eaf" : {
+                "corpus" : [ "QB" ], "transcript_type" : [ "wordlist" ],
+                "participant_surname" : [ "O'Reilly" ] },
+            "EG112_WJO'Halloran" : { "corpus" : [ "CC" ] } }
+        def check(expected, expression, message):
+            self.assertEqual(
+                expected, labbcat.filterByExpression(expression, attributes), message)
+        # generated expressions, with and without negation
+        check(["BR2044_OllyOhlson.eaf"],
+              labbcat.expressionFromTranscriptTypes("wordlist"), "first == value")
+        check(["AP511_MikeThorpe.eaf", "EG112_WJO'Halloran"],
+              labbcat.expressionFromTranscriptTypes("wordlist", True), "first <> value")
+        check(["AP511_MikeThorpe.eaf", "BR2044_OllyOhlson.eaf"],
+              labbcat.expressionFromTranscriptTypes(["wordlist", "interview"]),
+              "list includes first")
+        check(["EG112_WJO'Halloran"],
+              labbcat.expressionFromTranscriptTypes(["wordlist", "interview"], True),
+              "!list includes first")
+        check(["AP511_MikeThorpe.eaf"],
+              labbcat.expressionFromAttributeValues("transcript_language", "mi"),
+              "labels includes value")
+        check(["BR2044_OllyOhlson.eaf", "EG112_WJO'Halloran"],
+              labbcat.expressionFromAttributeValues("transcript_language", "mi", True),
+              "!labels includes value")
+        check(["AP511_MikeThorpe.eaf", "EG112_WJO'Halloran"],
+              labbcat.expressionFromCorpora(["CC", "MU"]), "list includesAny labels")
+        check(["BR2044_OllyOhlson.eaf"],
+              labbcat.expressionFromCorpora(["CC", "MU"], True), "!list includesAny labels")
+        check(["EG112_WJO'Halloran"],
+              labbcat.expressionFromIds("EG112_WJO'Halloran"), "id == value with quote")
+        check(["AP511_MikeThorpe.eaf", "EG112_WJO'Halloran"],
+              labbcat.expressionFromIds(
+                  ["AP511_MikeThorpe.eaf", "EG112_WJO'Halloran"]), "list includes id")
+        check(["BR2044_OllyOhlson.eaf"],
+              labbcat.expressionFromAttributeValue("participant_surname", "O'Reilly"),
+              "value with quote")
+        # combinations
+        check(["AP511_MikeThorpe.eaf"],
+              labbcat.expressionFromCorpora(["CC", "MU"]) + " && "
+              + labbcat.expressionFromTranscriptTypes("interview"), "&&")
+        check(["AP511_MikeThorpe.eaf", "BR2044_OllyOhlson.eaf"],
+              "!(" + labbcat.expressionFromCorpora("CC") + ")", "! parenthesized")
+        # the compiled function can be used directly
+        match = labbcat.compileExpression(labbcat.expressionFromCorpora("QB"))
+        self.assertTrue(match("x", { "corpus" : [ "QB" ] }))
+        self.assertFalse(match("x", {}), "Missing attribute")
+        # unsupported expressions
+        for expression in [ "/Ada.+/.test(id)", "all('word').length > 100",
+                            "first('corpus')", "labels('corpus').includes('QB'" ]:
+            with self.assertRaises(ValueError, msg=expression):
+                labbcat.compileExpression(expression)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+import shutil
+import struct
+import tempfile
+import wave
+from labbcat import Audio
+
+class TestAudio(unittest.TestCase):
+    """ Unit tests for local WAV slicing, used by getSoundFragments(localSlicing=True). """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_wav", "TestAudio_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def wav(self, name, samples, sampleRate=16000, channels=1):
+        """ Writes a 16-bit WAV file containing the given (interleaved) sample values. """
+        fileName = os.path.join(self.dir, name)
+        with wave.open(fileName, "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(sampleRate)
+            w.writeframes(struct.pack("<" + str(len(samples)) + "h", *samples))
+        return(fileName)
+
+    def read(self, fileName):
+        """ Returns (sampleRate, channels, samples) of a 16-bit WAV file. """
+        with wave.open(fileName, "rb") as w:
+            frames = w.readframes(w.getnframes())
+            return(w.getframerate(), w.getnchannels(),
+                   list(struct.unpack("<" + str(len(frames)//2) + "h", frames)))
+
+    def test_readHeader(self):
+        source = self.wav("source.wav", list(range(100)), 8000, 2)
+        with open(source, "rb") as f:
+            header = Audio._readHeader(f.read())
+        self.assertEqual(Audio._PCM, header["format"])
+        self.assertEqual(2, header["channels"])
+        self.assertEqual(8000, header["sampleRate"])
+        self.assertEqual(16, header["bitsPerSample"])
+        self.assertEqual(4, header["blockAlign"])
+        self.assertEqual(44, header["dataOffset"])
+        self.assertEqual(200, header["dataLength"])
+        with self.assertRaises(ValueError):
+            Audio._readHeader(b"not a wav file")
+
+    def test_sliceWav(self):
+        # sample values are their own index, so slices can be checked exactly
+        source = self.wav("source.wav", list(range(1000)), 1000)
+        first = os.path.join(self.dir, "first.wav")
+        second = os.path.join(self.dir, "second.wav")
+        beyond = os.path.join(self.dir, "beyond.wav")
+        Audio._sliceWav(source, [
+            (0.1, 0.2, first), (0.2504, 0.3006, second), (0.9, 2.0, beyond) ])
+        self.assertEqual((1000, 1, list(range(100, 200))), self.read(first), "exact slice")
+        self.assertEqual((1000, 1, list(range(250, 301))), self.read(second),
+                         "boundaries rounded to nearest sample")
+        self.assertEqual((1000, 1, list(range(900, 1000))), self.read(beyond),
+                         "slice truncated at end of recording")
+
+    def test_sliceWavStereo(self):
+        source = self.wav("source.wav", list(range(2000)), 1000, 2)
+        fragment = os.path.join(self.dir, "fragment.wav")
+        Audio._sliceWav(source, [(0.5, 0.51, fragment)])
+        self.assertEqual((1000, 2, list(range(1000, 1020))), self.read(fragment),
+                         "both channels sliced")
+
+    @unittest.skipIf(Audio.numpy is None, "numpy not installed")
+    def test_sliceWavResample(self):
+        source = self.wav("source.wav", [1000] * 16000, 16000)
+        fragment = os.path.join(self.dir, "fragment.wav")
+        Audio._sliceWav(source, [(0.25, 0.75, fragment)], 8000)
+        sampleRate, channels, samples = self.read(fragment)
+        self.assertEqual(8000, sampleRate, "sample rate converted")
+        self.assertEqual(4000, len(samples), "duration preserved")
+        self.assertEqual([1000] * 4000, samples, "constant signal unchanged")
+
+    @unittest.skipIf(Audio.numpy is None, "numpy not installed")
+    def test_wavArray(self):
+        source = self.wav("source.wav", [0, 16384, -16384, -32768, 1, 2], 8000, 2)
+        with open(source, "rb") as f:
+            content = f.read()
+        samples, sampleRate = Audio._wavArray(content)
+        self.assertEqual(8000, sampleRate)
+        self.assertEqual((2, 3), samples.shape, "one row per channel")
+        self.assertEqual([0, -0.5, 1/32768], list(samples[0]), "left channel normalized")
+        self.assertEqual([0.5, -1, 2/32768], list(samples[1]), "right channel normalized")
+        
+        samples, sampleRate = Audio._wavArray(content, normalize=False)
+        self.assertEqual([[0, -16384, 1], [16384, -32768, 2]], samples.tolist(),
+                         "samples in stored format")
+        self.assertTrue(
+            Audio.numpy.shares_memory(
+                samples, Audio.numpy.frombuffer(content, dtype=Audio.numpy.uint8)),
+            "samples are a view of the buffer")
+
+    @unittest.skipIf(Audio.numpy is None, "numpy not installed")
+    def test_wavArray24Bit(self):
+        fileName = os.path.join(self.dir, "24bit.wav")
+        with wave.open(fileName, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(3)
+            w.setframerate(16000)
+            w.writeframes(b"".join(v.to_bytes(3, "little", signed=True)
+                                   for v in [0, 4194304, -8388608, -1]))
+        with open(fileName, "rb") as f:
+            content = f.read()
+        samples, sampleRate = Audio._wavArray(content, normalize=False)
+        self.assertEqual([[0, 4194304, -8388608, -1]], samples.tolist(), "unpacked")
+        samples, sampleRate = Audio._wavArray(content)
+        self.assertEqual([[0, 0.5, -1, -1/8388608]], samples.tolist(), "normalized")
+
+if __name__ == '__main__':
+    unittest.main()
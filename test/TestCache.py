@@ -0,0 +1,58 @@
+import unittest
+import time
+import labbcat
+
+class TestCache(unittest.TestCase):
+    """ Unit tests for Cache. """
+
+    def test_getPut(self):
+        cache = labbcat.Cache()
+        self.assertIsNone(cache.get("a"), "missing key")
+        self.assertEqual(cache.get("a", "default"), "default", "default")
+        cache.put("a", 1)
+        cache.put("b", None)
+        self.assertEqual(cache.get("a"), 1, "value")
+        self.assertIsNone(cache.get("b", "default"), "None is a valid value")
+        self.assertEqual(len(cache), 2, "size")
+        self.assertEqual(cache.hits, 2, "hits")
+        self.assertEqual(cache.misses, 2, "misses")
+        cache.remove("a")
+        cache.remove("c")
+        self.assertIsNone(cache.get("a"), "removed")
+        cache.clear()
+        self.assertEqual(len(cache), 0, "cleared")
+
+    def test_leastRecentlyUsedEvicted(self):
+        cache = labbcat.Cache(maxEntries=3)
+        for key in ["a", "b", "c"]:
+            cache.put(key, key)
+        cache.get("a") # a is now more recent than b
+        cache.put("d", "d")
+        self.assertEqual(len(cache), 3, "size limited")
+        self.assertIsNone(cache.get("b"), "least recently used evicted")
+        for key in ["a", "c", "d"]:
+            self.assertEqual(cache.get(key), key, "kept: " + key)
+
+    def test_ttl(self):
+        cache = labbcat.Cache(ttl=0.05)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1, "not expired yet")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"), "expired")
+        self.assertEqual(len(cache), 0, "expired entry discarded")
+        cache = labbcat.Cache(ttl=None)
+        cache.put("a", 1)
+        time.sleep(0.1)
+        self.assertEqual(cache.get("a"), 1, "no ttl")
+
+    def test_invalidate(self):
+        cache = labbcat.Cache()
+        cache.put(("participant", "p1"), 1)
+        cache.put(("participantAttributes", "p1", ("participant_gender",)), 2)
+        cache.put(("participant", "p2"), 3)
+        self.assertEqual(cache.invalidate(lambda key: key[1] == "p1"), 2, "count")
+        self.assertIsNone(cache.get(("participant", "p1")), "invalidated")
+        self.assertEqual(cache.get(("participant", "p2")), 3, "not invalidated")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import os
+import shutil
+import tempfile
+import labbcat
+
+class Corpus:
+    """ A minimal stand-in for LabbcatView, serving a corpus held in memory. """
+
+    def __init__(self, dir):
+        self.dir = dir
+        self.requested = []
+        self.attributes = { "t1.eaf" : "CC", "t2.eaf" : "CC" }
+        self.participants = { "p1" : "F", "p2" : "M" }
+
+    def getLayers(self):
+        return([ { "id" : "transcript", "parentId" : None, "alignment" : 0 },
+                 { "id" : "corpus", "parentId" : "graph", "alignment" : 0 },
+                 { "id" : "participant", "parentId" : "graph", "alignment" : 0 },
+                 { "id" : "participant_gender", "parentId" : "participant",
+                   "alignment" : 0 },
+                 { "id" : "word", "parentId" : "turn", "alignment" : 2 } ])
+
+    def getTranscriptIds(self):
+        return(list(self.attributes.keys()))
+
+    def getParticipantIds(self):
+        return(list(self.participants.keys()))
+
+    def csv(self, header, values):
+        fd, fileName = tempfile.mkstemp(".csv", "TestCorpusMirror_", self.dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(header + "\n")
+            for id, value in values.items():
+                f.write(id + "," + value + "\n")
+        return(fileName)
+
+    def _getTranscriptAttributes(self, ids, layerIds, useCache=True):
+        return(self.csv("transcript,corpus", self.attributes))
+
+    def _getParticipantAttributes(self, ids, layerIds, useCache=True):
+        return(self.csv("participant,participant_gender", self.participants))
+
+    def getTranscripts(self, ids, layerIds=None, maxWorkers=4, ordered=True, retries=2):
+        for id in ids:
+            self.requested.append(id)
+            yield((id, {
+                "id" : id,
+                "anchors" : { "a0" : { "offset" : 0.0 }, "a1" : { "offset" : 1.5 } },
+                "participant" : [ {
+                    "id" : "p1", "label" : "p1", "startId" : "a0", "endId" : "a1",
+                    "word" : [ { "id" : id + "w1", "label" : self.attributes[id],
+                                 "startId" : "a0", "endId" : "a1", "confidence" : 50 } ]
+                } ] }, None))
+
+    def _getParticipant(self, id, useCache=True):
+        self.requested.append(id)
+        return({ "id" : id, "label" : id })
+
+    def _mapConcurrently(self, function, items, maxWorkers=1, ordered=True, retries=0):
+        for index, item in enumerate(items):
+            try:
+                yield((index, function(item), None))
+            except Exception as x:
+                yield((index, None, x))
+
+class TestCorpusMirror(unittest.TestCase):
+    """ Unit tests for CorpusMirror. """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_mirror", "TestCorpusMirror_")
+        self.corpus = Corpus(self.dir)
+        self.fileName = os.path.join(self.dir, "mirror.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_sync(self):
+        with labbcat.CorpusMirror(self.corpus, self.fileName, ["word"]) as mirror:
+            result = mirror.sync()
+            self.assertEqual(["t1.eaf", "t2.eaf", "p1", "p2"], result["added"], "All added")
+            self.assertEqual(0, result["unchanged"])
+            self.assertEqual(["t1.eaf", "t2.eaf"], mirror.getTranscriptIds())
+            self.assertEqual({ "corpus" : [ "CC" ] },
+                             mirror.getTranscriptAttributes("t1.eaf"))
+            self.assertEqual("t1.eaf", mirror.getTranscript("t1.eaf")["id"])
+            self.assertEqual(
+                [ { "id" : "t1.eafw1", "label" : "CC", "parentId" : "p1", "start" : 0.0,
+                    "end" : 1.5, "confidence" : 50 } ],
+                mirror.getAnnotations("t1.eaf", "word"))
+            self.assertEqual([], mirror.getAnnotations("t1.eaf", "participant"),
+                             "Only given layers are mirrored")
+            self.assertEqual(["p1", "p2"], mirror.getParticipantIds())
+            self.assertEqual({ "id" : "p2", "label" : "p2" }, mirror.getParticipant("p2"))
+            self.assertEqual({ "participant_gender" : [ "M" ] },
+                             mirror.getParticipantAttributes("p2"))
+            self.assertEqual(0, len(os.listdir(self.dir)) - 1, "CSV files deleted")
+            self.assertEqual(["t1.eaf", "t2.eaf"], mirror.getMatchingTranscriptIds(
+                labbcat.expressionFromCorpora("CC")), "Local expression evaluation")
+            self.assertEqual(["p1"], mirror.getMatchingParticipantIds(
+                labbcat.expressionFromAttributeValue("participant_gender", "F")))
+
+        # change one transcript, delete the other, and add a new one
+        self.corpus.requested = []
+        self.corpus.attributes = { "t1.eaf" : "QB", "t3.eaf" : "CC" }
+        with labbcat.CorpusMirror(self.corpus, self.fileName, ["word"]) as mirror:
+            result = mirror.sync()
+            self.assertEqual(["t1.eaf", "t3.eaf"], self.corpus.requested,
+                             "Only changed transcripts are requested")
+            self.assertEqual(["t3.eaf"], result["added"])
+            self.assertEqual(["t1.eaf"], result["updated"])
+            self.assertEqual(["t2.eaf"], result["removed"])
+            self.assertEqual(2, result["unchanged"], "Participants unchanged")
+            self.assertEqual(["t1.eaf", "t3.eaf"], mirror.getTranscriptIds())
+            self.assertEqual("QB", mirror.getAnnotations("t1.eaf", "word")[0]["label"])
+            self.assertEqual([], mirror.getAnnotations("t2.eaf", "word"), "Removed")
+            self.assertEqual(1, mirror.connection.execute(
+                "SELECT COUNT(*) FROM annotation WHERE transcript_id = 't1.eaf'"
+            ).fetchone()[0], "Old annotations replaced")
+
+        # changing the mirrored layers refreshes everything
+        self.corpus.requested = []
+        with labbcat.CorpusMirror(self.corpus, self.fileName, ["word", "turn"]) as mirror:
+            result = mirror.sync()
+            self.assertEqual(["t1.eaf", "t3.eaf", "p1", "p2"], result["updated"])
+
+        # full sync refreshes everything
+        with labbcat.CorpusMirror(self.corpus, self.fileName, ["word", "turn"]) as mirror:
+            self.assertEqual(4, mirror.sync()["unchanged"])
+            self.assertEqual(4, len(mirror.sync(full=True)["updated"]))
+
+if __name__ == '__main__':
+    unittest.main()
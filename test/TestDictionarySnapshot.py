@@ -0,0 +1,149 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import labbcat
+
+class Corpus:
+    """ A minimal stand-in for LabbcatView, serving a dictionary held in memory. """
+
+    def __init__(self):
+        self._dictionaryListeners = []
+        self.looked = []
+        self.entries = { "the" : [ "D@", "Di:" ], "cat" : [ "k{t" ], "a,b\n\"c\"" : [ "x\ny" ],
+                         "café" : [ "k{feI" ] }
+
+    def getDictionaryEntries(self, managerId, dictionaryId, keys, chunkSize=10000, maxWorkers=4):
+        self.looked.extend(keys)
+        return(dict((key, list(self.entries.get(key, []))) for key in keys))
+
+    def change(self, key, entries):
+        """ Changes an entry, notifying listeners like LabbcatEdit.addDictionaryEntry. """
+        self.entries[key] = entries
+        for listener in self._dictionaryListeners:
+            listener("M", "D", key)
+
+class TestDictionarySnapshot(unittest.TestCase):
+    """ Unit tests for DictionarySnapshot. """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_snapshot", "TestDictionarySnapshot_")
+        self.fileName = os.path.join(self.dir, "dictionary.snapshot")
+        self.corpus = Corpus()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_build(self):
+        with labbcat.DictionarySnapshot(self.corpus, "M", "D", self.fileName) as snapshot:
+            self.assertEqual(len(snapshot), 0, "Empty before build")
+            self.assertIsNone(snapshot.get("the"), "Nothing before build")
+            snapshot.build(list(self.corpus.entries.keys()) + [ "dog" ])
+            self.assertEqual(len(snapshot), 5, "All keys")
+            for key, entries in self.corpus.entries.items():
+                self.assertEqual(snapshot.get(key), entries, "Entries: " + key)
+            self.assertEqual(snapshot.get("dog"), [], "Key with no entries")
+            self.assertIsNone(snapshot.get("mouse"), "Key not in snapshot")
+            self.assertEqual(snapshot.get("mouse", []), [], "Default")
+            self.assertIn("dog", snapshot, "Contains key with no entries")
+            self.assertNotIn("mouse", snapshot, "Doesn't contain key not in snapshot")
+            self.assertEqual(snapshot.lookup([ "the", "mouse" ]), { "the" : [ "D@", "Di:" ] },
+                             "Lookup")
+            self.assertEqual(sorted(snapshot.keys()),
+                             sorted(list(self.corpus.entries.keys()) + [ "dog" ]), "Keys")
+
+        # can be reopened without a corpus
+        with labbcat.DictionarySnapshot(None, "M", "D", self.fileName) as snapshot:
+            self.assertEqual(len(snapshot), 5, "Reopened")
+            self.assertEqual(snapshot.get("café"), [ "k{feI" ], "Reopened entries")
+
+        with self.assertRaises(ValueError):
+            labbcat.DictionarySnapshot(None, "M", "other", self.fileName)
+
+    def test_manyKeys(self):
+        for i in range(5000):
+            self.corpus.entries["w" + str(i)] = [ "e" + str(e) for e in range(i % 4) ]
+        with labbcat.DictionarySnapshot(self.corpus, "M", "D", self.fileName) as snapshot:
+            snapshot.build(self.corpus.entries.keys())
+            for key, entries in self.corpus.entries.items():
+                self.assertEqual(snapshot.get(key), entries, "Entries: " + key)
+            self.assertIsNone(snapshot.get("w5000"), "Key not in snapshot")
+
+    def test_incrementalRefresh(self):
+        for i in range(100):
+            self.corpus.entries["w" + str(i)] = [ str(i) ]
+        with labbcat.DictionarySnapshot(self.corpus, "M", "D", self.fileName) as snapshot:
+            snapshot.build(self.corpus.entries.keys())
+            size = len(snapshot)
+
+            # changes through the corpus are looked up the next time the snapshot is used
+            self.corpus.looked = []
+            self.corpus.change("cat", [ "k{t", "kat" ])
+            self.corpus.change("dog", [ "dQg" ])
+            self.assertEqual(self.corpus.looked, [], "Not looked up until needed")
+            self.assertEqual(snapshot.get("cat"), [ "k{t", "kat" ], "Changed key")
+            self.assertEqual(snapshot.get("dog"), [ "dQg" ], "New key")
+            self.assertEqual(sorted(self.corpus.looked), [ "cat", "dog" ],
+                             "Only changed keys looked up")
+            self.assertEqual(len(snapshot), size + 1, "Key count")
+            self.assertEqual(snapshot.get("w1"), [ "1" ], "Other keys unchanged")
+
+            # other dictionaries are ignored
+            snapshot._dictionaryChanged("M", "other", "w1")
+            self.corpus.looked = []
+            snapshot.get("w1")
+            self.assertEqual(self.corpus.looked, [], "Other dictionary ignored")
+
+            # explicit refresh
+            self.corpus.entries["w2"] = [ "two" ]
+            snapshot.refresh([ "w2" ])
+            self.assertEqual(snapshot.get("w2"), [ "two" ], "Refreshed key")
+
+        # updates are saved
+        with labbcat.DictionarySnapshot(None, "M", "D", self.fileName) as snapshot:
+            self.assertEqual(len(snapshot), size + 1, "Reopened key count")
+            self.assertEqual(snapshot.get("cat"), [ "k{t", "kat" ], "Reopened changed key")
+            self.assertEqual(snapshot.get("dog"), [ "dQg" ], "Reopened new key")
+
+    def test_refreshWhileLookingUp(self):
+        for i in range(1000):
+            self.corpus.entries["w" + str(i)] = [ str(i) ]
+        with labbcat.DictionarySnapshot(self.corpus, "M", "D", self.fileName) as snapshot:
+            snapshot.build(self.corpus.entries.keys())
+            size = os.path.getsize(self.fileName)
+            oldMap = weakref.ref(snapshot._view[0])
+            wrong = []
+            finished = threading.Event()
+            def lookUp():
+                while not finished.is_set():
+                    for i in range(0, 1000, 7):
+                        if snapshot.get("w" + str(i)) != [ str(i) ]:
+                            wrong.append(i)
+            reader = threading.Thread(target=lookUp)
+            reader.start()
+            try:
+                for n in range(200):
+                    self.corpus.entries["cat"] = [ "k{t" + str(n) ]
+                    snapshot.refresh([ "cat" ])
+            finally:
+                finished.set()
+                reader.join()
+            self.assertEqual(wrong, [], "Lookups during refreshes are never wrong")
+            self.assertEqual(snapshot.get("cat"), [ "k{t199" ], "Refreshed")
+            self.assertIsNone(oldMap(), "Superseded maps are released")
+            self.assertLess(os.path.getsize(self.fileName), size * 3,
+                            "Superseded tables are eventually discarded")
+
+    def test_wholeDictionaryChanged(self):
+        with labbcat.DictionarySnapshot(self.corpus, "M", "D", self.fileName) as snapshot:
+            snapshot.build(self.corpus.entries.keys())
+            self.corpus.entries["the"] = [ "D@" ]
+            snapshot._dictionaryChanged(None, None, None) # e.g. loadLexicon
+            self.assertEqual(snapshot.get("the"), [ "D@" ], "All keys looked up again")
+            self.assertEqual(snapshot.get("cat"), [ "k{t" ], "Unchanged key")
+        self.assertEqual(self.corpus._dictionaryListeners, [], "Closing stops listening")
+
+if __name__ == '__main__':
+    unittest.main()
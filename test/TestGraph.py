@@ -0,0 +1,85 @@
+import unittest
+import math
+import labbcat
+
+class TestGraph(unittest.TestCase):
+    """ Unit tests for Graph, using a transcript structured like getTranscript output. """
+
+    transcript = {
+        "id" : "test.eaf",
+        "schema" : { "participantLayerId" : "participant", "wordLayerId" : "word" },
+        "anchors" : {
+            "n_0" : { "offset" : 0.0, "confidence" : 50 },
+            "n_1" : { "offset" : 1.0, "confidence" : 50 },
+            "n_2" : { "offset" : 2.0, "confidence" : 50 },
+            "n_3" : { "offset" : None },
+            "n_4" : { "offset" : 4.0, "confidence" : 50 }
+        },
+        "transcript_language" : [ { "id" : "t_1", "label" : "en" } ],
+        "participant" : [
+            { "id" : "m_-2_1", "label" : "A", "turn" : [
+                { "id" : "em_11_1", "label" : "A", "startId" : "n_0", "endId" : "n_2",
+                  "word" : [
+                      { "id" : "ew_0_1", "label" : "the", "startId" : "n_0", "endId" : "n_1",
+                        "confidence" : 100 },
+                      { "id" : "ew_0_2", "label" : "quick", "startId" : "n_1", "endId" : "n_2" } ] },
+                { "id" : "em_11_2", "label" : "A", "startId" : "n_2", "endId" : "n_4",
+                  "word" : [
+                      { "id" : "ew_0_3", "label" : "brown", "startId" : "n_2", "endId" : "n_3" } ] } ] },
+            { "id" : "m_-2_2", "label" : "B", "turn" : [
+                { "id" : "em_11_3", "label" : "B", "startId" : "n_3", "endId" : "n_4",
+                  "word" : [
+                      { "id" : "ew_0_4", "label" : "fox", "startId" : "n_3", "endId" : "n_4" } ] } ] }
+        ]
+    }
+
+    def setUp(self):
+        self.graph = labbcat.Graph(self.transcript)
+
+    def test_structure(self):
+        graph = self.graph
+        self.assertEqual("test.eaf", graph.id)
+        self.assertEqual(["n_0", "n_1", "n_2", "n_3", "n_4"], graph.anchorIds)
+        self.assertEqual(
+            ["transcript_language", "participant", "turn", "word"], list(graph.layers.keys()))
+        self.assertIsNone(graph.layers["participant"].parentId, "Top-level layer")
+        self.assertEqual("participant", graph.layers["turn"].parentId)
+        self.assertEqual(["word"], graph.layers["turn"].childIds)
+        words = graph.layers["word"]
+        self.assertEqual(4, len(words))
+        self.assertEqual(["the", "quick", "brown", "fox"], words.labels, "Transcript order")
+        self.assertEqual([0, 0, 1, 2], list(words.parents), "Parent rows")
+        self.assertEqual([100, -1, -1, -1], list(words.confidences))
+
+    def test_offsets(self):
+        graph = self.graph
+        self.assertEqual(1.0, graph.startOffset("word", 1))
+        self.assertEqual(2.0, graph.endOffset("word", 1))
+        self.assertIsNone(graph.endOffset("word", 2), "Anchor with no offset")
+        self.assertIsNone(graph.startOffset("participant", 0), "Annotation with no anchor")
+        starts = graph.startOffsets("word")
+        self.assertEqual([0.0, 1.0, 2.0], list(starts[0:3]))
+        self.assertTrue(math.isnan(starts[3]), "NaN for no offset")
+
+    def test_navigation(self):
+        graph = self.graph
+        self.assertEqual(("word", 2), graph.find("ew_0_3"))
+        self.assertIsNone(graph.find("nonexistent"))
+        self.assertEqual(("turn", 1), graph.parent("word", 2))
+        self.assertEqual(("participant", 0), graph.parent("turn", 1))
+        self.assertIsNone(graph.parent("participant", 0))
+        self.assertEqual([0, 1], list(graph.children("turn", 0, "word")))
+        self.assertEqual([2], list(graph.children("turn", 1, "word")))
+        self.assertEqual([3], list(graph.children("turn", 2, "word")))
+        self.assertEqual([0, 1], list(graph.children("participant", 0, "turn")))
+        with self.assertRaises(KeyError):
+            graph.children("participant", 0, "word") # not a direct child layer
+
+    def test_annotation(self):
+        self.assertEqual(
+            { "id" : "ew_0_1", "label" : "the", "startId" : "n_0", "endId" : "n_1",
+              "confidence" : 100, "start" : 0.0, "end" : 1.0 },
+            self.graph.annotation("word", 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from labbcat import Intervals
+
+class TestIntervals(unittest.TestCase):
+    """ Unit tests for planning the retrieval of fragment intervals. """
+
+    def test_overlapping(self):
+        self.assertEqual(
+            [ ("a", 1.0, 4.0, [0, 1, 2]) ],
+            Intervals._coalesce(["a", "a", "a"], [1.0, 2.0, 1.5], [3.0, 4.0, 2.0]),
+            "Overlapping and contained intervals merged")
+
+    def test_gap(self):
+        transcriptIds = ["a", "a", "a"]
+        startOffsets = [1.0, 3.5, 10.0]
+        endOffsets = [3.0, 5.0, 11.0]
+        self.assertEqual(
+            [ ("a", 1.0, 3.0, [0]), ("a", 3.5, 5.0, [1]), ("a", 10.0, 11.0, [2]) ],
+            Intervals._coalesce(transcriptIds, startOffsets, endOffsets),
+            "Separate intervals not merged")
+        self.assertEqual(
+            [ ("a", 1.0, 5.0, [0, 1]), ("a", 10.0, 11.0, [2]) ],
+            Intervals._coalesce(transcriptIds, startOffsets, endOffsets, 0.5),
+            "Nearby intervals merged")
+        self.assertEqual(
+            [ ("a", 1.0, 3.0, [0]), ("a", 3.0, 4.0, [1]) ],
+            Intervals._coalesce(["a", "a"], [1.0, 3.0], [3.0, 4.0], -0.001),
+            "Negative gap only merges strictly overlapping intervals")
+
+    def test_transcripts(self):
+        self.assertEqual(
+            [ ("b", 2.0, 4.0, [0, 3]), ("a", 1.0, 3.0, [1]), ("c", 0.0, 1.0, [4]) ],
+            Intervals._coalesce(
+                ["b", "a", None, "b", "c", "c"],
+                ["3.0", 1.0, 2.0, "2.0", 0.0, None],
+                ["4.0", 3.0, 3.0, "3.5", 1.0, 2.0]),
+            "Only intervals in the same transcript merged, incomplete intervals omitted,"
+            + " string offsets accepted, spans in order of first interval")
+
+if __name__ == '__main__':
+    unittest.main()
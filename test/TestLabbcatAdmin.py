@@ -636,6 +636,11 @@ class TestLabbcatAdmin(unittest.TestCase):
             self.assertEqual(len(entries["LayerDictionaryEntry"]), 0,
                              "LayerDictionaryEntry has no entries "
                              + str(entries["LayerDictionaryEntry"]))
+            chunked = self.store.getDictionaryEntries(
+                "FlatFileDictionary", "unit-test:word->definition",
+                ["test-word", "DictionaryEntry", "LayerDictionaryEntry"],
+                chunkSize=1, maxWorkers=2)
+            self.assertEqual(entries, chunked, "Chunked lookup gets the same entries")
             
             # get annotator descriptor
             descriptor = self.store.getAnnotatorDescriptor("FlatLexiconTagger")
@@ -731,6 +736,11 @@ class TestLabbcatAdmin(unittest.TestCase):
                 self.store.deleteLayer("unit-test")
             except:
                 pass
+    
+    def test_layerDictionaryManagementWithCache(self):
+        # changes to dictionaries must invalidate cached entries
+        self.store.dictionaryCache = labbcat.Cache()
+        self.test_layerDictionaryManagement()
         
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import os
+import shutil
+import tempfile
 import labbcat
 
 # YOU MUST ENSURE THE FOLLOWING SETTINGS ARE VALID FOR YOU TEST LABB-CAT SERVER:
@@ -57,6 +59,32 @@ class TestLabbcatEdit(unittest.TestCase):
         participant = self.store.getParticipant(changedId)
         self.assertIsNone(participant, "Deleted participant isn't there")
 
+    def test_participantCRUDWithAttributeCache(self):
+        self.store.attributeCache = labbcat.Cache()
+        participantId = "TestLabbcatEdit-cached-participant";
+        self.assertTrue(
+            self.store.saveParticipant(participantId, participantId, {"participant_gender":"X"}),
+            "Participant created")
+        try:
+            columns = self.store.getParticipantAttributes(
+                [participantId], ["participant_gender"], asColumns=True)
+            self.assertEqual(["X"], columns["participant_gender"], "Original attribute")
+            
+            # update it - the cached attributes are invalidated
+            self.assertTrue(
+                self.store.saveParticipant(participantId, participantId, {"participant_gender":"Y"}),
+                "Participant updated")
+            columns = self.store.getParticipantAttributes(
+                [participantId], ["participant_gender"], asColumns=True)
+            self.assertEqual(["Y"], columns["participant_gender"], "Updated attribute")
+            self.assertIsNotNone(self.store.getParticipant(participantId), "Participant cached")
+        finally:
+            self.store.deleteParticipant(participantId)
+            
+        # the cached participant is invalidated
+        self.assertIsNone(self.store.getParticipant(participantId),
+                          "Deleted participant isn't there")
+
     
     def test_uploadTranscriptAPI(self):
         transcriptName = "labbcat-py.test.txt"
@@ -139,6 +167,46 @@ class TestLabbcatEdit(unittest.TestCase):
         count = self.store.countMatchingParticipantIds("id = '"+participantName+"'")
         self.assertEqual(0, count, "Participant is in the store")
 
+    def test_uploadTranscripts(self):
+        transcriptName = "labbcat-py.test.txt"
+        transcriptPath = "/home/robert/nzilbb/labbcat-py/test/" + transcriptName
+        corpusId = self.store.getCorpusIds()[0]
+        typeLayer = self.store.getLayer("transcript_type")
+        transcriptType = next(iter(typeLayer["validLabels"]))
+        dir = tempfile.mkdtemp("_upload", "TestLabbcatEdit_")
+        manifest = os.path.join(dir, "manifest.jsonl")
+        try:
+            result = self.store.uploadTranscripts(
+                [transcriptPath, "nonexistent.txt"], transcriptType, corpusId,
+                manifest=manifest, waitForTasks=True)
+            self.assertIn(transcriptPath, result["uploaded"], "Transcript uploaded")
+            self.assertIn(transcriptName, result["uploaded"][transcriptPath],
+                          "Transcript ID returned")
+            self.assertIn("nonexistent.txt", result["errors"], "Missing file reported")
+            self.assertEqual(1, self.store.countMatchingTranscriptIds(
+                "id == '" + transcriptName + "'"), "Transcript is in the store")
+            
+            # again - nothing has changed
+            result = self.store.uploadTranscripts(
+                [transcriptPath], transcriptType, corpusId, manifest=manifest)
+            self.assertEqual([transcriptPath], result["skipped"], "Unchanged transcript skipped")
+            self.assertEqual({}, result["uploaded"], "Nothing uploaded")
+            
+            # again, forcing upload - the existing version is updated in place
+            result = self.store.uploadTranscripts(
+                [transcriptPath], transcriptType, corpusId, manifest=manifest,
+                waitForTasks=True, full=True)
+            self.assertIn(transcriptPath, result["uploaded"], "Transcript updated")
+            self.assertEqual({}, result["errors"], "No errors")
+            self.assertEqual(1, self.store.countMatchingTranscriptIds(
+                "id == '" + transcriptName + "'"), "Transcript is still in the store")
+        finally:
+            shutil.rmtree(dir)
+            try:
+                self.store.deleteTranscript(transcriptName)
+            except labbcat.ResponseException as x:
+                pass
+
     def test_transcriptParticipantAndMediaCRUD(self):
         transcriptName = "labbcat-py.test.txt"
         transcriptPath = "/home/robert/nzilbb/labbcat-py/test/" + transcriptName
@@ -1,5 +1,7 @@
 import unittest
 import os
+import shutil
+import tempfile
 import labbcat
 
 # YOU MUST ENSURE THE FOLLOWING SETTINGS ARE VALID FOR YOU TEST LABB-CAT SERVER:
@@ -82,6 +84,12 @@ class TestLabbcatView(unittest.TestCase):
          ids = self.store.getMatchingParticipantIds("/.+/.test(id)", 2, 0)
          self.assertEqual(2, len(ids), "Two IDs are returned")
 
+    def test_iterateMatchingParticipantIds(self):
+        ids = self.store.getMatchingParticipantIds("/.+/.test(id)")
+        self.assertEqual(
+            ids, list(self.store.iterateMatchingParticipantIds("/.+/.test(id)", pageLength=3)),
+            "Same IDs in the same order")
+
     def test_getTranscriptIdsInCorpus(self):
         ids = self.store.getCorpusIds()
         self.assertTrue(len(ids) > 0, "There's at least one corpus")
@@ -109,6 +117,13 @@ class TestLabbcatView(unittest.TestCase):
             ids = self.store.getMatchingTranscriptIds("/.+/.test(id)", 2, 0, "id DESC")
             self.assertEqual(2, len(ids), "Two IDs are returned")   
 
+    def test_iterateMatchingTranscriptIds(self):
+        ids = self.store.getMatchingTranscriptIds("/.+/.test(id)", order="id DESC")
+        self.assertEqual(
+            ids, list(self.store.iterateMatchingTranscriptIds(
+                "/.+/.test(id)", "id DESC", pageLength=3, maxWorkers=3)),
+            "Same IDs in the same order")
+
     def test_countAnnotations(self):
         ids = self.store.getMatchingTranscriptIds("/.+/.test(id)", 1, 0)
         self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
@@ -121,6 +136,19 @@ class TestLabbcatView(unittest.TestCase):
             "All phonemes ("+str(countAll)
             +") are not more numerous than maxOrdinal = 1 ("+str(countFirsts)+")")   
 
+    def test_iterateAnnotations(self):
+        ids = self.store.getMatchingTranscriptIds("/.+/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        graphId = ids[0]
+        allAnnotations = self.store.getAnnotations(graphId, "orthography")
+        iterated = list(self.store.iterateAnnotations(graphId, "orthography", pageLength=7))
+        self.assertEqual([a["id"] for a in allAnnotations], [a["id"] for a in iterated],
+                         "Same annotations in the same order")
+        firstAnnotations = self.store.getAnnotations(graphId, "phonemes", maxOrdinal=1)
+        iterated = list(self.store.iterateAnnotations(
+            graphId, "phonemes", maxOrdinal=1, pageLength=5, maxWorkers=1))
+        self.assertEqual(len(firstAnnotations), len(iterated), "maxOrdinal")
+        
     def test_getAnnotations(self):
         ids = self.store.getMatchingTranscriptIds("/.+/.test(id)", 1, 0)
         self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
@@ -173,6 +201,20 @@ class TestLabbcatView(unittest.TestCase):
                     with self.subTest(key=key):
                         self.assertIn(key, anchor, "Has " + key)
    
+    def test_getTranscripts(self):
+        ids = self.store.getMatchingTranscriptIds("/AP51.+/.test(id)", 3, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        ids = ids + [ "nonexistent-transcript" ]
+        results = list(self.store.getTranscripts(iter(ids), ["word"], maxWorkers=2))
+        self.assertEqual(ids, [ id for id, transcript, error in results ],
+                         "Transcripts yielded in order")
+        for id, transcript, error in results[:-1]:
+            self.assertIsNone(error, "No error: " + id)
+            self.assertEqual(id, transcript["id"], "Correct transcript: " + id)
+        id, transcript, error = results[-1]
+        self.assertIsNone(transcript, "Nonexistent transcript not returned")
+        self.assertIsNotNone(error, "Nonexistent transcript error returned")
+        
     def test_getMediaUrl(self):
         ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
         self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
@@ -193,6 +235,47 @@ class TestLabbcatView(unittest.TestCase):
         self.assertTrue(fileName.endswith(".wav"), "File name correct")
         os.remove(fileName)
     
+    def test_getMediaBytes(self):
+        ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        graphId = ids[0]
+        header = self.store.getMediaBytes(graphId, "", "audio/wav", 0, 11)
+        self.assertEqual(12, len(header), "Only the requested bytes are returned")
+        self.assertEqual(b"RIFF", header[0:4], "WAV header")
+        self.assertEqual(b"WAVE", header[8:12], "WAV header")
+        self.assertEqual(b"WAVE", self.store.getMediaBytes(graphId, "", "audio/wav", 8, 11),
+                         "Byte range not at the start")
+    
+    def test_getMediaCached(self):
+        ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        graphId = ids[0]
+        cacheDir = tempfile.mkdtemp("_cache", "test_getMediaCached_")
+        self.store.mediaCache = labbcat.MediaCache(cacheDir)
+        try:
+            downloaded = self.store.getMedia(graphId, "", "audio/wav")
+            self.assertIsNotNone(downloaded, "There is some media")
+            self.assertTrue(self.store.mediaCache.size() > 0, "Media cached")
+            cached = self.store.getMedia(graphId, "", "audio/wav")
+            self.assertEqual(os.path.basename(downloaded), os.path.basename(cached),
+                             "Same file name")
+            self.assertEqual(os.path.getsize(downloaded), os.path.getsize(cached),
+                             "Same file size")
+            os.remove(downloaded)
+            os.remove(cached)
+        finally:
+            self.store.mediaCache = None
+            shutil.rmtree(cacheDir)
+    
+    def test_getMediaArray(self):
+        ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        graphId = ids[0]
+        samples, sampleRate = self.store.getMediaArray(graphId, "", 1.0, 2.0, 16000)
+        self.assertEqual(16000, sampleRate, "Sample rate converted")
+        self.assertAlmostEqual(16000, samples.shape[1], delta=16, msg="Duration correct")
+        self.assertTrue(samples.min() >= -1 and samples.max() <= 1, "Samples normalized")
+    
     def test_formatTranscript(self):
         ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
         self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
@@ -206,6 +289,44 @@ class TestLabbcatView(unittest.TestCase):
         self.assertTrue(fileNames[0].endswith(".txt"), "File name correct")
         os.remove(fileNames[0])
     
+    def test_formatTranscriptEntries(self):
+        ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        graphId = ids[0]
+        entries = list(self.store.formatTranscriptEntries(graphId, ["utterance"], "text/plain"))
+        self.assertEqual(1, len(entries), "One entry")
+        name, content = entries[0]
+        self.assertTrue(name.endswith(".txt"), "Name correct: " + name)
+        self.assertTrue(len(content) > 0, "There is some content")
+    
+    def test_exportTranscripts(self):
+        ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+        self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+        dir = tempfile.mkdtemp("_export", "test_exportTranscripts_")
+        try:
+            result = self.store.exportTranscripts(ids, ["utterance"], "text/plain", dir)
+            self.assertEqual(ids, result["exported"], "Exported: " + str(result))
+            self.assertEqual({}, result["errors"], "No errors")
+            self.assertTrue(any(name.endswith(".txt") for name in os.listdir(dir)),
+                            "File saved")
+            # nothing has changed, so the next export gets the same content
+            result = self.store.exportTranscripts(ids, ["utterance"], "text/plain", dir)
+            self.assertEqual(ids, result["unchanged"], "Unchanged: " + str(result))
+            # with attributes, transcripts are skipped once their signature is recorded
+            result = self.store.exportTranscripts(
+                ids, ["utterance"], "text/plain", dir, attributes=["transcript_type"])
+            self.assertEqual(ids, result["unchanged"], "Signature recorded: " + str(result))
+            result = self.store.exportTranscripts(
+                ids, ["utterance"], "text/plain", dir, attributes=["transcript_type"])
+            self.assertEqual(ids, result["skipped"], "Skipped: " + str(result))
+            # a full export gets the same content
+            result = self.store.exportTranscripts(
+                ids, ["utterance"], "text/plain", dir, attributes=["transcript_type"],
+                full=True)
+            self.assertEqual(ids, result["unchanged"], "Unchanged: " + str(result))
+        finally:
+            shutil.rmtree(dir)
+    
     def test_getMediaFragment(self):
       ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
       self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
@@ -213,6 +334,30 @@ class TestLabbcatView(unittest.TestCase):
       url = self.store.getMedia(graphId, "", "audio/wav", 1.0, 2.0)
       self.assertIsNotNone(url, "There is some media")   
 
+    def test_getMediaFragmentsDontShareDownloads(self):
+      ids = self.store.getMatchingTranscriptIds("/AP511.+\\.eaf/.test(id)", 1, 0)
+      self.assertTrue(len(ids) > 0, "Some graph IDs are returned")
+      graphId = ids[0]
+      dir = tempfile.mkdtemp("_fragments", "TestLabbcatView_")
+      try:
+          first = self.store.getMedia(graphId, "", "audio/wav", 1.0, 2.0, dir)
+          with open(first, "rb") as f: firstContent = f.read()
+          os.remove(first)
+          
+          # leave an interrupted download of a different fragment, with the same file name
+          url = self.store.getMediaUrl(graphId, "", "audio/wav", 3.0, 5.0)
+          partFile, stateFile = self.store._partFiles(
+              url, os.path.join(dir, url.split("?")[0].split("/")[-1]))
+          with open(partFile, "wb") as f: f.write(b"x" * 100)
+          with open(stateFile, "w") as f: f.write('{"validator":"x","url":"' + url + '"}')
+          
+          # the first fragment isn't spliced onto it
+          second = self.store.getMedia(graphId, "", "audio/wav", 1.0, 2.0, dir)
+          with open(second, "rb") as f:
+              self.assertEqual(firstContent, f.read(), "Fragment downloaded intact")
+      finally:
+          shutil.rmtree(dir)
+
     def test_getLayer(self):
         layer = self.store.getLayer("orthography")
         self.assertEqual("orthography", layer["id"], "Correct layer")   
@@ -251,6 +396,13 @@ class TestLabbcatView(unittest.TestCase):
           with self.subTest(key=key):
               self.assertIn(key, annotation, "Has " + key)
 
+    def test_iterateMatchingAnnotations(self):
+      expression = "layer.id == 'orthography' && label == 'and'"
+      annotations = self.store.getMatchingAnnotations(expression)
+      iterated = list(self.store.iterateMatchingAnnotations(expression, pageLength=10))
+      self.assertEqual([a["id"] for a in annotations], [a["id"] for a in iterated],
+                       "Same annotations in the same order")
+
     def test_getMatchingAnnotationData(self):
       layerIds = self.store.getLayerIds()
       if not "mediapipeFrame" in layerIds:
@@ -269,6 +421,36 @@ class TestLabbcatView(unittest.TestCase):
               for f in files:
                   os.remove(f)
 
+    def test_getMatchingAnnotationDataTempDir(self):
+      layerIds = self.store.getLayerIds()
+      if not "mediapipeFrame" in layerIds:
+          print("\nThere is no mediapipeFrame layer, can't test getMatchingAnnotationData.")
+      else:
+          files = self.store.getMatchingAnnotationData(
+              "layer.id == 'mediapipeFrame' && graph.id == 'AP513_Steve.eaf' && start.offset < 10.58")
+          try:
+              self.assertTrue(1 <= len(files), "Files are returned")
+              self.assertTrue(os.path.exists(files[0]), "Files are saved")
+          finally:
+              for f in files:
+                  os.remove(f)
+
+    def test_getMatchingAnnotationDataEntries(self):
+      layerIds = self.store.getLayerIds()
+      if not "mediapipeFrame" in layerIds:
+          print("\nThere is no mediapipeFrame layer, can't test getMatchingAnnotationDataEntries.")
+      else:
+          expression = "layer.id == 'mediapipeFrame' && graph.id == 'AP513_Steve.eaf' && start.offset < 10.58"
+          entries = list(self.store.getMatchingAnnotationDataEntries(expression))
+          self.assertTrue(1 <= len(entries), "Entries are returned")
+          annotationId, mimeType, data = entries[0]
+          # file names are assumed to be annotation IDs
+          ids = [ annotation["id"] for annotation in self.store.getMatchingAnnotations(expression) ]
+          self.assertEqual(sorted(ids), sorted(entry[0] for entry in entries),
+                           "Annotation IDs are those of the matching annotations")
+          self.assertEqual("image/png", mimeType, "Entries are images")
+          self.assertEqual(b"\x89PNG", data[0:4], "Data is PNG")
+
     def test_getMediaTracks(self):
         tracks = self.store.getMediaTracks()
         #for (String track : tracks) print("track " + track)
@@ -344,6 +526,16 @@ class TestLabbcatView(unittest.TestCase):
         self.assertEqual("test.csv", fileName, "Query expression: Given CSV file returned")
         self.assertTrue(os.path.isfile(fileName), "Query expression: CSV file exists")
         os.remove(fileName)
+        
+        columns = self.store.getTranscriptAttributes(ids, layerIds, asColumns=True)
+        self.assertEqual(ids, columns["transcript"], "Columns: one row per transcript")
+        for layerId in layerIds:
+            self.assertIn(layerId, columns, "Columns: has " + layerId)
+            self.assertEqual(len(ids), len(columns[layerId]), "Columns: length " + layerId)
+        
+        chunked = self.store.getTranscriptAttributes(
+            ids, layerIds, asColumns=True, chunkSize=2, maxWorkers=2)
+        self.assertEqual(columns, chunked, "Chunked: same result")
             
     def test_getParticipantAttributes(self):
         ids = self.store.getParticipantIds()
@@ -354,7 +546,53 @@ class TestLabbcatView(unittest.TestCase):
         self.assertTrue(fileName.endswith(".csv"), "CSV file returned: " + fileName)
         self.assertTrue(os.path.isfile(fileName), "CSV file exists: " + fileName)
         os.remove(fileName)            
+        
+        columns = self.store.getParticipantAttributes(ids, layerIds, asColumns=True)
+        self.assertEqual(len(ids), len(list(columns.values())[0]),
+                         "Columns: one row per participant")
+        for layerId in layerIds:
+            self.assertIn(layerId, columns, "Columns: has " + layerId)
+        
+        chunked = self.store.getParticipantAttributes(
+            ids, layerIds, asColumns=True, chunkSize=1, maxWorkers=2)
+        self.assertEqual(columns, chunked, "Chunked: same result")
+        fileName = self.store.getParticipantAttributes(ids, layerIds, chunkSize=2)
+        self.assertTrue(os.path.isfile(fileName), "Chunked: CSV file exists: " + fileName)
+        os.remove(fileName)
     
+    def test_attributeCache(self):
+        ids = self.store.getParticipantIds()[:3]
+        layerIds = ["participant_gender", "participant_notes"]
+        uncached = self.store.getParticipantAttributes(ids, layerIds, asColumns=True)
+        self.store.attributeCache = labbcat.Cache()
+        cached = self.store.getParticipantAttributes(ids, layerIds, asColumns=True)
+        self.assertEqual(uncached, cached, "Same attributes")
+        misses = self.store.attributeCache.misses
+        cached = self.store.getParticipantAttributes(ids, layerIds, asColumns=True)
+        self.assertEqual(uncached, cached, "Same attributes from cache")
+        self.assertEqual(misses, self.store.attributeCache.misses, "No more misses")
+        
+        # change detection bypasses the cache
+        hits = self.store.attributeCache.hits
+        fresh = self.store._getParticipantAttributes(ids, layerIds, True, useCache=False)
+        self.assertEqual(uncached, fresh, "Same attributes without cache")
+        self.assertEqual(hits, self.store.attributeCache.hits, "Cache not used")
+        
+        participant = self.store.getParticipant(ids[0])
+        participant["label"] = "changed"
+        self.assertEqual(ids[0], self.store.getParticipant(ids[0])["label"],
+                         "Cached participant can't be changed by caller")
+        
+        transcriptIds = self.store.getTranscriptIds()[:3]
+        self.store.attributeCache = None
+        uncached = self.store.getTranscriptAttributes(
+            transcriptIds, ["transcript_type"], asColumns=True)
+        self.store.attributeCache = labbcat.Cache()
+        self.store.getTranscriptAttributes(transcriptIds[:1], ["transcript_type"], asColumns=True)
+        cached = self.store.getTranscriptAttributes(
+            transcriptIds, ["transcript_type"], asColumns=True)
+        self.assertEqual(uncached, cached, "Same transcript attributes, partly cached")
+        
     def test_searchInvalidPattern(self):
         try:
             threadId = self.store.search({})
@@ -572,6 +810,59 @@ class TestLabbcatView(unittest.TestCase):
         finally:
             self.store.releaseTask(threadId)
 
+    def test_processWithPraatChunkedInvalidChunkSize(self):
+        # invalid arguments are reported before any iteration
+        with self.assertRaises(ValueError):
+            self.store.processWithPraatChunked(
+                labbcat.praatScriptFormants(), 0.025, ["m1"], [0.0], [1.0], chunkSize=0)
+        with self.assertRaises(ValueError):
+            self.store.processWithPraatChunked(
+                labbcat.praatScriptFormants(), 0.025, ["m1"], [0.0], [1.0], maxTasks=0)
+    
+    def test_processWithPraatChunked(self):
+        # get a participant ID to use
+        ids = self.store.getParticipantIds()
+        self.assertTrue(len(ids) > 0, "getParticipantIds: Some IDs are returned")
+        participantId = [ ids[0] ]
+        
+        # all instances of the "e" segment
+        threadId = self.store.search({ "segment" : "e" }, participantId)
+        try:
+            task = self.store.waitForTask(threadId, 30)
+            # if the task is still running, it's taking too long, so cancel it
+            if task["running"]:
+                try:
+                    self.store.cancelTask(threadId)
+                except:
+                    pass
+            self.assertFalse(task["running"], "Search task finished in a timely manner")
+            
+            matches = self.store.getMatches(threadId, 0)
+            if len(matches) == 0:
+                print("getMatches: No matches were returned, cannot test processWithPraatChunked")
+            else:
+                upTo = min(5, len(matches))
+                subset = matches[:upTo]
+                segments = self.store.getMatchAnnotations(subset, "segment", 0, 1, 0)
+                measures = [ None ] * upTo
+                chunks = 0
+                for first, results in self.store.processWithPraatChunked(
+                        labbcat.praatScriptFormants(), 0.025, subset, segments, chunkSize=2):
+                    chunks = chunks + 1
+                    self.assertTrue(len(results) <= 2, "Chunk is no larger than chunkSize")
+                    measures[first:first+len(results)] = results
+                self.assertEqual((upTo + 1) // 2, chunks, "Results are returned in chunks")
+                # they look like praat results
+                for m in range(upTo):
+                    results = measures[m]
+                    self.assertIsNotNone(results, "Result returned for match " + str(m))
+                    for key in ["time_0_5", "f1_time_0_5", "f2_time_0_5", "Error"]:
+                        with self.subTest(key=key):
+                            self.assertIn(key, results, "Has " + key)
+            
+        finally:
+            self.store.releaseTask(threadId)
+
     def test_searchExcludingOverlappingSpeech(self):
         # all instances of "mmm", which is common in overlapping speech
         pattern = {"orthography" : "mmm" }
@@ -633,6 +924,110 @@ class TestLabbcatView(unittest.TestCase):
         finally:
             self.store.releaseTask(threadId)
 
+    def test_getSoundFragmentsConcurrently(self):
+        # all instances of "and"
+        matches = self.store.getMatches({ "orthography" : "and" }, 2)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getSoundFragments")
+        else:
+            upTo = min(10, len(matches))
+            subset = matches[:upTo]
+            progress = []
+            
+            wavs = self.store.getSoundFragments(
+                subset, maxWorkers=4, progress=lambda done, total: progress.append(done))
+            try:
+                self.assertEqual(len(subset), len(wavs))
+                self.assertEqual(list(range(1, upTo + 1)), progress, "Progress reported")
+                for m in range(upTo):
+                    self.assertIsNotNone(wavs[m], "Non-None file: " + str(subset[m]))
+                    self.assertTrue(os.path.exists(wavs[m]), "File exists: " + str(subset[m]))
+                # results are in order, so file names are prefixed in order
+                self.assertEqual(wavs, sorted(wavs), "Files are in order")
+            finally:
+                for wav in wavs:
+                    if wav != None:
+                        # duplicate names can exist, so the file may have already been deleted
+                        if os.path.exists(wav): 
+                            os.remove(wav)
+
+    def test_getSoundFragmentsLocalSlicing(self):
+        # all instances of "and"
+        matches = self.store.getMatches({ "orthography" : "and" }, 2)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getSoundFragments")
+        else:
+            upTo = min(5, len(matches))
+            subset = matches[:upTo]
+            
+            remote = self.store.getSoundFragments(subset)
+            local = self.store.getSoundFragments(subset, localSlicing=True, maxWorkers=2)
+            try:
+                self.assertEqual(len(subset), len(local))
+                for m in range(upTo):
+                    self.assertIsNotNone(local[m], "Non-None file: " + str(subset[m]))
+                    self.assertTrue(os.path.exists(local[m]), "File exists: " + str(subset[m]))
+                    self.assertEqual(os.path.basename(remote[m]), os.path.basename(local[m]),
+                                     "Same name as server fragment: " + str(subset[m]))
+                    # the server may round boundaries differently, so allow a few samples
+                    self.assertAlmostEqual(
+                        os.path.getsize(remote[m]), os.path.getsize(local[m]), delta=64,
+                        msg="Same size as server fragment: " + str(subset[m]))
+            finally:
+                for wav in remote + local:
+                    if wav != None and os.path.exists(wav):
+                        os.remove(wav)
+
+    def test_getSoundFragmentsMerged(self):
+        # all instances of "and"
+        matches = self.store.getMatches({ "orthography" : "and" }, 2)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getSoundFragments")
+        else:
+            # the same utterance twice, and a window overlapping it
+            match = matches[0]
+            start = float(match["Line"])
+            end = float(match["LineEnd"])
+            transcriptIds = [ match["Transcript"] ] * 3
+            startOffsets = [ start, start, start + (end - start) / 2 ]
+            endOffsets = [ end, end, end + 1.0 ]
+            
+            remote = self.store.getSoundFragments(
+                transcriptIds, startOffsets, endOffsets, dir="remote")
+            merged = self.store.getSoundFragments(
+                transcriptIds, startOffsets, endOffsets, dir="merged", mergeGap=0.0)
+            try:
+                self.assertEqual(3, len(merged))
+                for m in range(3):
+                    self.assertIsNotNone(merged[m], "Non-None file: " + str(m))
+                    self.assertEqual(os.path.basename(remote[m]), os.path.basename(merged[m]),
+                                     "Same name as server fragment: " + str(m))
+                    self.assertAlmostEqual(
+                        os.path.getsize(remote[m]), os.path.getsize(merged[m]), delta=64,
+                        msg="Same size as server fragment: " + str(m))
+            finally:
+                shutil.rmtree("remote")
+                shutil.rmtree("merged")
+
+    def test_getSoundFragmentArrays(self):
+        # all instances of "and"
+        matches = self.store.getMatches({ "orthography" : "and" }, 2)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getSoundFragmentArrays")
+        else:
+            upTo = min(5, len(matches))
+            subset = matches[:upTo]
+            
+            fragments = self.store.getSoundFragmentArrays(subset, sampleRate=8000, maxWorkers=2)
+            self.assertEqual(len(subset), len(fragments))
+            for m in range(upTo):
+                self.assertIsNotNone(fragments[m], "Non-None fragment: " + str(subset[m]))
+                samples, sampleRate = fragments[m]
+                self.assertEqual(8000, sampleRate, "Sample rate converted")
+                duration = float(subset[m]["LineEnd"]) - float(subset[m]["Line"])
+                self.assertAlmostEqual(duration, samples.shape[1] / sampleRate, delta=0.01,
+                                       msg="Duration correct: " + str(subset[m]))
+
     def test_getFragmentAnnotationData(self):        
       # all instances of "and" that incompass a 'mediapipeFrame' PNG annotation
       layerIds = self.store.getLayerIds()
@@ -658,6 +1053,78 @@ class TestLabbcatView(unittest.TestCase):
                 for png in pngs:
                     os.remove(png)
 
+    def test_getFragmentAnnotationDataBatched(self):        
+      layerIds = self.store.getLayerIds()
+      if not "mediapipeFrame" in layerIds:
+          print("\nThere is no mediapipeFrame layer, can't test getFragmentAnnotationData.")
+      else:
+        pattern = { "orthography" : "and", "mediapipeFrame": ".*" }
+        matches = self.store.getMatches(pattern)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getFragmentAnnotationData")
+        else:
+            upTo = min(4, len(matches))
+            subset = matches[:upTo]
+            
+            oneByOne = self.store.getFragmentAnnotationData("mediapipeFrame", subset, batchSize=1)
+            errors = []
+            batched = self.store.getFragmentAnnotationData(
+                "mediapipeFrame", subset, maxWorkers=2, errors=errors)
+            try:
+                self.assertEqual([None] * upTo, errors, "No errors")
+                self.assertEqual(
+                    sorted(set(os.path.basename(f) for f in oneByOne)),
+                    sorted(set(os.path.basename(f) for f in batched)),
+                    "Batched requests return the same files")
+            finally:
+                for png in set(oneByOne + batched):
+                    if os.path.exists(png): os.remove(png)
+
+    def test_getFragmentAnnotationDataPerInterval(self):        
+      layerIds = self.store.getLayerIds()
+      if not "mediapipeFrame" in layerIds:
+          print("\nThere is no mediapipeFrame layer, can't test getFragmentAnnotationData.")
+      else:
+        pattern = { "orthography" : "and", "mediapipeFrame": ".*" }
+        matches = self.store.getMatches(pattern)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getFragmentAnnotationData")
+        else:
+            upTo = min(4, len(matches))
+            subset = matches[:upTo]
+            
+            oneByOne = [ self.store.getFragmentAnnotationData("mediapipeFrame", [ match ])
+                         for match in subset ]
+            # the same intervals twice, so every file is shared by two intervals
+            perInterval = self.store.getFragmentAnnotationData(
+                "mediapipeFrame", subset + subset, perInterval=True, mergeGap=0)
+            try:
+                self.assertEqual(upTo * 2, len(perInterval), "One list per interval")
+                for i in range(upTo * 2):
+                    self.assertEqual(
+                        sorted(os.path.basename(f) for f in oneByOne[i % upTo]),
+                        sorted(os.path.basename(f) for f in perInterval[i]),
+                        "Files for interval " + str(i))
+            finally:
+                for png in set(sum(oneByOne, []) + sum(perInterval, [])):
+                    if os.path.exists(png): os.remove(png)
+
+    def test_getFragmentEntries(self):
+        # all instances of "and"
+        matches = self.store.getMatches({ "orthography" : "and" }, 2)
+        if len(matches) == 0:
+            print("getMatches: No matches were returned, cannot test getFragmentEntries")
+        else:
+            upTo = min(5, len(matches))
+            subset = matches[:upTo]
+            entries = list(self.store.getFragmentEntries(
+                subset, [ "orthography" ], "text/praat-textgrid"))
+            self.assertEqual(len(subset), len(entries), "One entry per match")
+            for name, content in entries:
+                self.assertTrue(name.endswith(".TextGrid"), "Name correct: " + name)
+                self.assertTrue(content.decode("utf-8").startswith("File type = \"ooTextFile\""),
+                                "Content is a TextGrid: " + name)
+    
     def test_getFragments(self):
         # get a participant ID to use
         ids = self.store.getParticipantIds()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import shutil
+import tempfile
+import labbcat
+
+class TestManifest(unittest.TestCase):
+    """ Unit tests for Manifest. """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_manifest", "TestManifest_")
+        self.fileName = os.path.join(self.dir, "export", "manifest.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_putGetRemove(self):
+        manifest = labbcat.Manifest(self.fileName)
+        self.assertEqual(0, len(manifest), "Empty to start with")
+        manifest.put("a.eaf", { "files" : { "a.TextGrid" : "1" } })
+        manifest.put("b.eaf", { "files" : { "b.TextGrid" : "2" } })
+        manifest.put("a.eaf", { "files" : { "a.TextGrid" : "3" } })
+        manifest.remove("b.eaf")
+        manifest.remove("c.eaf")
+        self.assertIn("a.eaf", manifest)
+        self.assertNotIn("b.eaf", manifest)
+        self.assertEqual({ "files" : { "a.TextGrid" : "3" } }, manifest.get("a.eaf"))
+        self.assertIsNone(manifest.get("b.eaf"))
+
+        # entries are persisted as they're recorded
+        reloaded = labbcat.Manifest(self.fileName)
+        self.assertEqual(["a.eaf"], reloaded.ids(), "Removal persisted")
+        self.assertEqual({ "files" : { "a.TextGrid" : "3" } }, reloaded.get("a.eaf"),
+                         "Last entry wins")
+
+        reloaded.compact()
+        with open(self.fileName, encoding="utf-8") as f:
+            self.assertEqual(1, len(f.readlines()), "Compacted")
+        self.assertEqual(["a.eaf"], labbcat.Manifest(self.fileName).ids())
+
+    def test_interruptedWrite(self):
+        manifest = labbcat.Manifest(self.fileName)
+        manifest.put("a.eaf", { "n" : 1 })
+        with open(self.fileName, "a", encoding="utf-8") as f:
+            f.write('{"id": "b.eaf", "ent') # interrupted mid-line
+        manifest = labbcat.Manifest(self.fileName)
+        self.assertEqual(["a.eaf"], manifest.ids(), "Partial line ignored")
+        manifest.put("c.eaf", { "n" : 3 })
+        self.assertEqual(["a.eaf", "c.eaf"], labbcat.Manifest(self.fileName).ids(),
+                         "Entries after the partial line are readable")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import labbcat
+
+class DroppingServer(BaseHTTPRequestHandler):
+    """ A minimal stand-in for a LaBB-CAT server, whose media downloads always drop part
+    way through. """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/media/"):
+            self.send_response(200)
+            self.send_header("ETag", '"media"')
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            self.wfile.write(b"x" * 100) # ... and the connection drops
+            return
+        model = "test"
+        if self.path.startswith("/api/store/getMedia"):
+            model = "http://127.0.0.1:" + str(self.server.server_port) + "/media/test.wav"
+        body = json.dumps({ "model" : model, "code" : 0, "errors" : [], "messages" : [] })
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+def putEntries(dir, prefix, count):
+    """ Adds entries to a cache, for testing access from several processes. """
+    cache = labbcat.MediaCache(dir, maxBytes=1000)
+    for i in range(count):
+        fileName = cache.newFile()
+        with open(fileName, "wb") as f:
+            f.write(b"x" * 100)
+        cache.put(cache.key(prefix, i), fileName, { "fileName" : "media.wav" })
+
+class TestMediaCache(unittest.TestCase):
+    """ Unit tests for MediaCache. """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_cache", "TestMediaCache_")
+        self.cache = labbcat.MediaCache(os.path.join(self.dir, "cache"), maxBytes=250)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def add(self, key, content):
+        fileName = self.cache.newFile()
+        with open(fileName, "wb") as f:
+            f.write(content)
+        return(self.cache.put(key, fileName, { "fileName" : key + ".wav", "etag" : key }))
+
+    def test_key(self):
+        self.assertEqual(self.cache.key("a.eaf", "", "audio/wav", None, None),
+                         self.cache.key("a.eaf", "", "audio/wav", None, None), "Stable")
+        self.assertNotEqual(self.cache.key("a.eaf", "", "audio/wav", None, None),
+                            self.cache.key("a.eaf", "", "audio/wav", 1.0, None), "Offsets")
+        self.assertEqual(64, len(self.cache.key("a.eaf")), "SHA-256 hex digest")
+
+    def test_putGetCopy(self):
+        self.assertIsNone(self.cache.get("one"), "Not cached yet")
+        self.add("one", b"1" * 100)
+        self.assertEqual({ "fileName" : "one.wav", "etag" : "one" }, self.cache.get("one"))
+        copy = os.path.join(self.dir, "one.wav")
+        self.assertEqual(copy, self.cache.copy("one", copy))
+        with open(copy, "rb") as f:
+            self.assertEqual(b"1" * 100, f.read(), "Copy has content")
+        with open(copy, "ab") as f:
+            f.write(b"changed")
+        other = os.path.join(self.dir, "other.wav")
+        self.cache.copy("one", other)
+        with open(other, "rb") as f:
+            self.assertEqual(b"1" * 100, f.read(), "Changing a copy doesn't change the cache")
+        self.cache.remove("one")
+        self.assertIsNone(self.cache.get("one"), "Removed")
+        self.assertIsNone(self.cache.copy("one", copy), "Can't copy removed file")
+        self.assertTrue(os.path.exists(copy), "Copy survives removal")
+
+    def test_leastRecentlyUsedEviction(self):
+        self.add("one", b"1" * 100)
+        time.sleep(0.05)
+        self.add("two", b"2" * 100)
+        time.sleep(0.05)
+        self.cache.get("one") # one is now more recently used than two
+        time.sleep(0.05)
+        self.add("three", b"3" * 100)
+        self.assertIsNotNone(self.cache.get("one"), "Recently used file kept")
+        self.assertIsNone(self.cache.get("two"), "Least recently used file evicted")
+        self.assertIsNotNone(self.cache.get("three"), "New file kept")
+        self.assertEqual(200, self.cache.size())
+        self.add("big", b"4" * 500)
+        self.assertIsNotNone(self.cache.get("big"), "New file kept even if too big")
+        self.assertEqual(500, self.cache.size(), "All other files evicted")
+        self.cache.clear()
+        self.assertEqual(0, self.cache.size(), "Cleared")
+
+    def test_failedDownload(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), DroppingServer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            corpus = labbcat.LabbcatView("http://127.0.0.1:" + str(server.server_port))
+            corpus.mediaCache = self.cache
+            with self.assertRaises(Exception):
+                corpus.getMedia("test.eaf", "", "audio/wav", dir=self.dir)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual([], [ name for name in os.listdir(self.cache.dir)
+                               if name.startswith("download-") ],
+                         "Partial download removed")
+        self.assertEqual(0, self.cache.size(), "Nothing cached")
+
+    def test_abandonedDownloadsRemoved(self):
+        abandoned = self.cache.newFile()
+        for fileName in [ abandoned, abandoned + ".1234.part", abandoned + ".1234.part.json" ]:
+            with open(fileName, "wb") as f:
+                f.write(b"x")
+            os.utime(fileName, (time.time() - 2*24*60*60, time.time() - 2*24*60*60))
+        recent = self.cache.newFile() # e.g. being downloaded by another process
+        self.add("one", b"1" * 100)
+        self.assertFalse(os.path.exists(abandoned), "Abandoned download removed")
+        self.assertFalse(os.path.exists(abandoned + ".1234.part"), "Partial download removed")
+        self.assertFalse(os.path.exists(abandoned + ".1234.part.json"), "State removed")
+        self.assertTrue(os.path.exists(recent), "Recent download kept")
+
+    def test_multipleProcesses(self):
+        dir = os.path.join(self.dir, "shared")
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            for result in [ pool.submit(putEntries, dir, p, 20) for p in range(4) ]:
+                result.result()
+        cache = labbcat.MediaCache(dir, maxBytes=1000)
+        self.assertEqual(1000, cache.size(), "Cache is full, but not over full")
+
+if __name__ == '__main__':
+    unittest.main()
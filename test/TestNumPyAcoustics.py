@@ -0,0 +1,122 @@
+import unittest
+import math
+import os
+import shutil
+import struct
+import tempfile
+import wave
+import labbcat
+
+class TestNumPyAcoustics(unittest.TestCase):
+    """ Unit tests for NumPyAcoustics.
+
+    These tests ensure that local acoustic measurements match reference values. The
+    reference values are those Praat produces for signals whose measures are known
+    analytically (e.g. the CoG of a pure tone is its frequency, and the intensity of a
+    sine wave of amplitude A is 10*log10((A*A/2)/4e-10) dB).
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp("_wav", "TestNumPyAcoustics_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def wav(self, name, duration, tones, sampleRate=16000, sampleWidth=2):
+        """ Writes a WAV file containing the sum of the given (frequency, amplitude) tones. """
+        fileName = os.path.join(self.dir, name)
+        count = int(round(duration * sampleRate))
+        scale = 2**(8*sampleWidth-1) - 1
+        with wave.open(fileName, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(sampleWidth)
+            w.setframerate(sampleRate)
+            frames = bytearray()
+            for i in range(count):
+                value = sum(a * math.sin(2 * math.pi * f * i / sampleRate) for f, a in tones)
+                frames += struct.pack("<h", int(round(value * scale)))
+            w.writeframes(bytes(frames))
+        return(fileName)
+
+    def test_numpyCentreOfGravity(self):
+        # pure tone exactly on an FFT bin (16384 samples at 16kHz => 0.9765625Hz bins)
+        tone = self.wav("tone.wav", 16384/16000, [(1000, 0.5)])
+        # two equal tones either side of 1000Hz
+        pair = self.wav("pair.wav", 16384/16000, [(500, 0.25), (1500, 0.25)])
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyCentreOfGravity([1, 2]), 0.0, [tone, pair], maxWorkers=1)
+        self.assertEqual(2, len(measures), "one result per file")
+        self.assertEqual(["cog_1", "cog_2", "Error"], list(measures[0].keys()),
+                         "same columns as praatScriptCentreOfGravity")
+        self.assertEqual(1000, measures[0]["cog_1"], "pure tone power 1")
+        self.assertEqual(1000, measures[0]["cog_2"], "pure tone power 2")
+        self.assertEqual(1000, measures[1]["cog_2"], "balanced tones power 2")
+        self.assertEqual("", measures[0]["Error"], "no error")
+
+    def test_numpyCentreOfGravitySlow(self):
+        # with spectrumFast False, the FFT size is the number of samples
+        tone = self.wav("tone.wav", 0.5, [(1000, 0.5)])
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyCentreOfGravity([2], False), 0.0, [tone], maxWorkers=1)
+        self.assertEqual(1000, measures[0]["cog_2"], "bin-aligned without padding")
+
+    def test_numpyIntensity(self):
+        amplitude = 0.1
+        reference = 10 * math.log10((amplitude * amplitude / 2) / 4e-10) # 70.969dB
+        tone = self.wav("tone.wav", 1.0, [(1000, amplitude)])
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyIntensity(samplePoints=[0.5], interpolation="linear"),
+            0.1, [tone], [12.0], maxWorkers=1)
+        result = measures[0]
+        self.assertEqual(
+            ["maxIntensity", "time_0_5_for_intensity", "intensity_time_0_5", "Error"],
+            list(result.keys()), "same columns as praatScriptIntensity")
+        self.assertAlmostEqual(reference, result["maxIntensity"], 1, "maximum intensity")
+        self.assertAlmostEqual(12.4, result["time_0_5_for_intensity"], 6, "absolute time")
+        self.assertEqual(round(reference), result["intensity_time_0_5"], "midpoint intensity")
+
+    def test_numpyIntensityInterpolation(self):
+        tone = self.wav("tone.wav", 0.5, [(440, 0.3)])
+        reference = round(10 * math.log10((0.3 * 0.3 / 2) / 4e-10))
+        for interpolation in ["nearest", "linear", "cubic", "sinc70"]:
+            with self.subTest(interpolation=interpolation):
+                measures = labbcat.processWithNumPy(
+                    labbcat.numpyIntensity(
+                        getMaximum=False, samplePoints=[0.25, 0.75],
+                        interpolation=interpolation),
+                    0.0, [tone], maxWorkers=1)
+                self.assertEqual(reference, measures[0]["intensity_time_0_25"])
+                self.assertEqual(reference, measures[0]["intensity_time_0_75"])
+
+    def test_numpyIntensitySilence(self):
+        silence = self.wav("silence.wav", 0.5, [])
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyIntensity(), 0.0, [silence], maxWorkers=1)
+        self.assertEqual(-300.0, measures[0]["maxIntensity"], "Praat's floor for silence")
+
+    def test_numpyIntensityTooShort(self):
+        # 6.4 / 100Hz = 64ms minimum
+        short = self.wav("short.wav", 0.05, [(1000, 0.1)])
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyIntensity(), 0.0, [short], maxWorkers=1)
+        self.assertEqual("--undefined--", measures[0]["maxIntensity"], "skipErrors")
+        self.assertEqual("", measures[0]["Error"], "skipErrors: no error")
+        measures = labbcat.processWithNumPy(
+            labbcat.numpyIntensity(skipErrors=False), 0.0, [short], maxWorkers=1)
+        self.assertNotIn("maxIntensity", measures[0], "no skipErrors: no value")
+        self.assertTrue(len(measures[0]["Error"]) > 0, "no skipErrors: error")
+
+    def test_processWithNumPy(self):
+        wavs = [ self.wav(str(f)+".wav", 0.25, [(f, 0.2)]) for f in [500, 1000, 2000] ]
+        wavs.insert(1, None) # a failed download
+        measures = [ labbcat.numpyCentreOfGravity(), labbcat.numpyIntensity() ]
+        inline = labbcat.processWithNumPy(measures, 0.025, wavs, maxWorkers=1)
+        pooled = labbcat.processWithNumPy(measures, 0.025, wavs, maxWorkers=2)
+        self.assertEqual(inline, pooled, "pooled results are the same, in the same order")
+        self.assertEqual(4, len(pooled), "one result per file")
+        self.assertTrue(len(pooled[1]["Error"]) > 0, "missing file has an error")
+        self.assertEqual(["cog_2", "maxIntensity", "Error"], list(pooled[0].keys()),
+                         "columns in script order")
+
+if __name__ == '__main__':
+    unittest.main()
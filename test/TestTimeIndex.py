@@ -0,0 +1,67 @@
+import unittest
+import random
+import labbcat
+
+class TestTimeIndex(unittest.TestCase):
+    """ Unit tests for TimeIndex, checking queries against linear scans. """
+
+    def graph(self, count, seed):
+        """ A graph with a layer of randomly placed annotations of random durations. """
+        generator = random.Random(seed)
+        anchors = {}
+        annotations = []
+        for i in range(count):
+            start = round(generator.uniform(0, 100), 2)
+            end = start + round(generator.choice([0, generator.uniform(0, 5)]), 2)
+            anchors["s" + str(i)] = { "offset" : start }
+            anchors["e" + str(i)] = { "offset" : end }
+            annotations.append({ "id" : "a" + str(i), "label" : str(i),
+                                 "startId" : "s" + str(i), "endId" : "e" + str(i) })
+        # an annotation with no end offset isn't indexed
+        anchors["x"] = { "offset" : None }
+        annotations.append({ "id" : "x", "label" : "x", "startId" : "s0", "endId" : "x" })
+        return(labbcat.Graph({ "id" : "test", "anchors" : anchors, "frame" : annotations }))
+
+    def test_queries(self):
+        for count in [0, 1, 2, 7, 500]:
+            graph = self.graph(count, count)
+            index = graph.timeIndex("frame")
+            self.assertIs(index, graph.timeIndex("frame"), "Index is cached")
+            self.assertEqual(count, len(index), "Annotations without offsets not indexed")
+            starts = graph.startOffsets("frame")
+            ends = graph.endOffsets("frame")
+            rows = [ row for row in range(count) ]
+            def ordered(found):
+                return(sorted(found, key=lambda row: (starts[row], ends[row], row)))
+            generator = random.Random(count)
+            for q in range(50):
+                start = round(generator.uniform(-5, 105), 2)
+                end = start + round(generator.uniform(0, 10), 2)
+                with self.subTest(count=count, start=start, end=end):
+                    self.assertEqual(
+                        ordered(r for r in rows if starts[r] < end and ends[r] > start),
+                        ordered(index.overlapping(start, end)), "overlapping")
+                    self.assertEqual(
+                        ordered(r for r in rows if starts[r] >= start and ends[r] <= end),
+                        ordered(index.within(start, end)), "within")
+                    self.assertEqual(
+                        ordered(r for r in rows if starts[r] <= start and ends[r] >= end),
+                        ordered(index.containing(start, end)), "containing")
+                    self.assertEqual(
+                        ordered(r for r in rows if starts[r] <= start and ends[r] >= start),
+                        ordered(index.containing(start)), "containing point")
+                    found = index.overlapping(start, end)
+                    self.assertEqual(sorted(found, key=lambda row: (starts[row], ends[row])),
+                                     found, "Results in start order")
+                    if count > 0:
+                        nearest = min(
+                            [ starts[r] for r in rows ] + [ ends[r] for r in rows ],
+                            key=lambda offset: abs(offset - start))
+                        self.assertAlmostEqual(
+                            abs(nearest - start), abs(index.nearestBoundary(start) - start),
+                            msg="nearestBoundary")
+                    else:
+                        self.assertIsNone(index.nearestBoundary(start))
+
+if __name__ == '__main__':
+    unittest.main()
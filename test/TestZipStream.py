@@ -0,0 +1,96 @@
+import unittest
+import io
+import os
+import zipfile
+from labbcat import ZipStream
+
+class Unseekable(io.RawIOBase):
+    """ A write-only stream that can't seek, so zipfile writes data descriptors, as a
+    server streaming a zip file does. """
+    def __init__(self):
+        self.buffer = bytearray()
+    def writable(self):
+        return(True)
+    def write(self, data):
+        self.buffer.extend(data)
+        return(len(data))
+
+class Trickle(io.RawIOBase):
+    """ A stream that returns a few bytes at a time, like a slow network connection. """
+    def __init__(self, data, chunkSize=7):
+        self.data = data
+        self.position = 0
+        self.chunkSize = chunkSize
+    def readable(self):
+        return(True)
+    def read(self, size=-1):
+        chunk = self.data[self.position:self.position + min(size, self.chunkSize)]
+        self.position = self.position + len(chunk)
+        return(chunk)
+
+class TestZipStream(unittest.TestCase):
+    """ Unit tests for streaming zip extraction. """
+
+    files = [
+        ("a.txt", b"hello " * 1000),
+        ("dir/b.TextGrid", "ḁ unicode content".encode("utf-8")),
+        ("empty.txt", b""),
+        ("ünïcode.bin", os.urandom(100000)) ]
+
+    def zipped(self, compression, seekable=True):
+        stream = io.BytesIO() if seekable else Unseekable()
+        with zipfile.ZipFile(stream, "w", compression) as z:
+            z.writestr(zipfile.ZipInfo("dir/"), b"")
+            for name, content in self.files:
+                z.writestr(name, content)
+        return(stream.getvalue() if seekable else bytes(stream.buffer))
+
+    def test_stored(self):
+        data = self.zipped(zipfile.ZIP_STORED)
+        self.assertEqual(self.files, list(ZipStream._zipEntries(io.BytesIO(data))),
+                         "Stored entries, directory skipped")
+
+    def test_deflated(self):
+        data = self.zipped(zipfile.ZIP_DEFLATED)
+        self.assertEqual(self.files, list(ZipStream._zipEntries(Trickle(data))),
+                         "Deflated entries, read a few bytes at a time")
+
+    def test_dataDescriptors(self):
+        data = self.zipped(zipfile.ZIP_DEFLATED, seekable=False)
+        self.assertEqual(self.files, list(ZipStream._zipEntries(Trickle(data, 1000))),
+                         "Entries with sizes after the data")
+
+    def test_storedDataDescriptors(self):
+        data = self.zipped(zipfile.ZIP_STORED, seekable=False)
+        self.assertEqual(self.files, list(ZipStream._zipEntries(Trickle(data, 1000))),
+                         "Stored entries with sizes after the data")
+        # without descriptor signatures, and with content that looks like a zip record
+        files = [ ("a.txt", b"PK\x03\x04 not a header"), ("b.txt", b"PK\x01\x02 nor this") ]
+        stream = Unseekable()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as z:
+            for name, content in files:
+                z.writestr(name, content)
+        data = bytes(stream.buffer).replace(b"PK\x07\x08", b"")
+        self.assertEqual(files, list(ZipStream._zipEntries(io.BytesIO(data))),
+                         "Descriptors without signatures")
+
+    def test_corrupt(self):
+        data = bytearray(self.zipped(zipfile.ZIP_STORED))
+        data[data.find(b"hello") + 1] = ord("a")
+        with self.assertRaises(ValueError, msg="CRC checked"):
+            list(ZipStream._zipEntries(io.BytesIO(bytes(data))))
+        data = self.zipped(zipfile.ZIP_DEFLATED)
+        with self.assertRaises(ValueError, msg="Truncation detected"):
+            list(ZipStream._zipEntries(io.BytesIO(data[:len(data)//2])))
+
+    def test_notZip(self):
+        self.assertEqual([], list(ZipStream._zipEntries(io.BytesIO(b"not a zip file"))))
+
+    def test_safePath(self):
+        self.assertEqual(os.path.join("out", "a", "b.txt"), ZipStream._safePath("out", "a/b.txt"))
+        self.assertEqual(os.path.join("out", "x.txt"), ZipStream._safePath("out", "../x.txt"))
+        self.assertEqual(os.path.join("out", "etc", "x"), ZipStream._safePath("out", "/etc/x"))
+        self.assertEqual(os.path.join("out", "a", "x"), ZipStream._safePath("out", "a\\..\\x"))
+
+if __name__ == '__main__':
+    unittest.main()